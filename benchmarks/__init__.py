@@ -0,0 +1,4 @@
+"""The MAL Haystack benchmark suite.
+
+Run with ``python -m benchmarks --help`` from the repository root.
+"""
@@ -0,0 +1,351 @@
+"""Benchmarks MAL Haystack ingestion, conversion and extraction stages.
+
+Each stage is timed on synthetic MAL-style datasets of several sizes and
+reported as wall time, throughput and peak resident memory growth. Results
+can be saved as a baseline and later runs compared against it, failing when
+any stage regresses by more than a tolerance.
+"""
+
+import argparse
+import functools
+import gc
+import json
+import logging
+import pathlib
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from mal_haystack.profiling import PeakRSS
+
+from .models import EMBEDDING_DIM, build_tiny_models
+from .synthetic import QUERIES, REVIEWS_CSV, write_dataset
+
+#: Metadata columns extracted in benchmarks
+META_COLUMNS = ['Anime Title', 'Anime URL', 'Overall Rating']
+
+#: Peak memory growth below this many MiB is regarded as noise
+MEMORY_SLACK_MB = 16.0
+
+
+def measure(
+    results: Dict[str, Dict[str, float]],
+    stage: str,
+    func: Callable[[], Any],
+    items: int,
+) -> Any:
+    """Runs and measures a benchmark stage.
+
+    Arguments:
+        results: Mapping to add the stage's measurements to.
+        stage: The stage name.
+        func: The stage to run.
+        items: The number of items the stage processes.
+
+    Returns:
+        The stage's return value.
+    """
+
+    gc.collect()
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+
+    results[stage] = {
+        'items': items,
+        'seconds': seconds,
+        'items_per_second': items / seconds if seconds else float('inf'),
+        'peak_rss_mb': rss.growth_mb,
+    }
+    return result
+
+
+def run_size(num_rows: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmarks every stage on a synthetic dataset of `num_rows` reviews.
+
+    Arguments:
+        num_rows: The number of synthetic reviews.
+        args: The benchmark arguments.
+
+    Returns:
+        The measurements of each stage.
+    """
+
+    # Deferred so that argument errors are reported without heavy imports
+    from mal_haystack.extraction import read_directly, retrieve_and_read
+    from mal_haystack.document_stores import IndexedInMemoryDocumentStore
+    from mal_haystack.nodes import (
+        DataFrameConverter,
+        EmbeddingRetriever,
+        ZipDataFramer,
+        ZipLister,
+    )
+
+    zip_path = write_dataset(args.data_dir, num_rows)
+    results = {}
+
+    lister = ZipLister()
+    listed, _ = measure(results, 'ZipLister', lambda: lister.run(
+        file_paths=[str(zip_path)],
+        valid_names=[REVIEWS_CSV],
+    ), items=1)
+
+    framer = ZipDataFramer()
+    dataframes = measure(results, 'ZipDataFramer', lambda: framer.convert(
+        listed['file_paths'],
+        listed['meta'],
+    ), items=num_rows)
+
+    converter = DataFrameConverter(progress_bar=False)
+    # The dataframes are bound rather than closed over, so they can be
+    # released once converted
+    converted, _ = measure(
+        results,
+        'DataFrameConverter',
+        functools.partial(
+            converter.run,
+            dataframes=dataframes,
+            document_column='Review',
+            meta_columns=META_COLUMNS,
+        ),
+        items=num_rows,
+    )
+    documents = converted['documents']
+    del dataframes, converted
+
+    document_store = IndexedInMemoryDocumentStore(
+        embedding_dim=EMBEDDING_DIM,
+        similarity='cosine',
+        indexed_fields=['index'],
+    )
+    measure(
+        results,
+        'DocumentStore',
+        lambda: document_store.write_documents(documents),
+        items=num_rows,
+    )
+
+    if args.skip_models:
+        return results
+
+    from haystack.nodes.reader import FARMReader
+    from haystack.pipelines import ExtractiveQAPipeline
+
+    models = build_tiny_models(args.model_dir)
+    retriever = EmbeddingRetriever(
+        document_store=document_store,
+        embedding_model=models.retriever,
+        model_format='sentence_transformers',
+        use_gpu=False,
+        progress_bar=False,
+    )
+    measure(
+        results,
+        'EmbeddingRetriever',
+        lambda: document_store.update_embeddings(retriever),
+        items=num_rows,
+    )
+
+    reader = FARMReader(
+        models.reader,
+        num_processes=1,
+        use_gpu=False,
+        progress_bar=False,
+    )
+    logger = logging.getLogger('mal-haystack')
+    sample = documents[:args.extract_limit]
+    query_pipeline = ExtractiveQAPipeline(reader, retriever)
+    measure(results, 'Extraction', lambda: list(retrieve_and_read(
+        query_pipeline,
+        sample,
+        QUERIES,
+        logger,
+    )), items=len(sample))
+    measure(results, 'Extraction (direct read)', lambda: list(read_directly(
+        reader,
+        sample,
+        QUERIES,
+        args.batch_size,
+        logger,
+    )), items=len(sample))
+
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float,
+) -> List[str]:
+    """Compares benchmark results against a baseline.
+
+    Arguments:
+        results: The benchmark results, by size and stage.
+        baseline: The baseline results, by size and stage.
+        tolerance: The allowed fractional throughput drop or memory growth.
+
+    Returns:
+        A description of each regression.
+    """
+
+    regressions = []
+    for size, stages in results.items():
+        for stage, current in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if base is None:
+                continue
+            min_rate = base['items_per_second'] * (1 - tolerance)
+            if current['items_per_second'] < min_rate:
+                regressions.append(
+                    f'{stage} @ {size} rows: '
+                    f'{current["items_per_second"]:.1f} items/s < '
+                    f'baseline {base["items_per_second"]:.1f} items/s')
+            max_memory = base['peak_rss_mb'] * (1 + tolerance)
+            if current['peak_rss_mb'] > max_memory + MEMORY_SLACK_MB:
+                regressions.append(
+                    f'{stage} @ {size} rows: '
+                    f'{current["peak_rss_mb"]:.1f} MiB > '
+                    f'baseline {base["peak_rss_mb"]:.1f} MiB')
+
+    return regressions
+
+
+def report(results: Dict[str, Dict[str, Any]]) -> str:
+    """Formats benchmark results as a table.
+
+    Arguments:
+        results: The benchmark results, by size and stage.
+
+    Returns:
+        The formatted table.
+    """
+
+    header = ('Rows', 'Stage', 'Items', 'Seconds', 'Items/s', 'Peak MiB')
+    rows: List[Tuple[str, ...]] = [header]
+    for size, stages in results.items():
+        for stage, record in stages.items():
+            rows.append((
+                size,
+                stage,
+                str(record['items']),
+                f'{record["seconds"]:.3f}',
+                f'{record["items_per_second"]:.1f}',
+                f'{record["peak_rss_mb"]:.1f}',
+            ))
+
+    widths = [max(len(row[col]) for row in rows) for col in range(len(header))]
+    lines = [
+        '  '.join(cell.ljust(width) for cell, width in zip(row, widths))
+        for row in rows
+    ]
+    return '\n'.join(line.rstrip() for line in lines)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """Gets the benchmark CLI argument parser.
+
+    Returns:
+        The benchmark argument parser.
+    """
+
+    cache_dir = pathlib.Path(tempfile.gettempdir()) / 'mal-haystack-bench'
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmarks MAL Haystack pipeline stages',
+    )
+    parser.add_argument(
+        '-s', '--size',
+        type=int,
+        action='append',
+        help='number of synthetic reviews to benchmark with (usable '
+             'multiple times, default: 1000, 10000 and 100000)',
+    )
+    parser.add_argument(
+        '--skip-models',
+        action='store_true',
+        help='skip the embedding and extraction stages',
+    )
+    parser.add_argument(
+        '--extract-limit',
+        type=int,
+        default=100,
+        help='number of documents to benchmark extraction with '
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=16,
+        help='number of documents per direct read reader call '
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--data-dir',
+        default=cache_dir / 'data',
+        help='directory to cache synthetic datasets in '
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--model-dir',
+        default=cache_dir / 'models',
+        help='directory to cache tiny models in (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--output',
+        help='path of JSON file to save results to, e.g. as a new baseline',
+    )
+    parser.add_argument(
+        '--baseline',
+        help='path of JSON results file to compare results against',
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.2,
+        help='fractional throughput drop or memory growth over the '
+             'baseline regarded as a regression (default: %(default)s)',
+    )
+    return parser
+
+
+def main(argv: List[str] = sys.argv[1:]) -> int:
+    """Runs the benchmarks.
+
+    Arguments:
+        argv: The list of command line arguments.
+
+    Returns:
+        Zero, or one if any stage regressed against the baseline.
+    """
+
+    args = get_parser().parse_args(argv)
+    sizes = args.size or [1_000, 10_000, 100_000]
+
+    results = {}
+    for size in sizes:
+        results[str(size)] = run_size(size, args)
+        print(f'Finished {size} rows', file=sys.stderr)
+
+    print(report(results))
+
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(results, outfile, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as infile:
+            baseline = json.load(infile)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION: {regression}')
+        if regressions:
+            return 1
+        print(f'No regressions against {args.baseline}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
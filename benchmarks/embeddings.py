@@ -0,0 +1,212 @@
+"""Compares embedding matrix search against per-document scoring.
+
+Clustered synthetic embeddings, shaped like those of the retriever, are
+searched once as the in-memory document store does, stacking one embedding
+array per document and scoring each query on its own, and once per
+precision with an :class:`~mal_haystack.embedding_matrix.EmbeddingMatrix`,
+scoring all queries with batched matrix products, and once with an
+:class:`~mal_haystack.ann.IVFIndex` per number of probed clusters. For each
+the memory the embeddings take, the time to search every query and the
+recall@k against exact float32 search are reported.
+
+Run as ``python -m benchmarks.embeddings``. Exits non-zero if a precision
+recalls fewer results than ``--min-recall``; approximate indexes trade
+recall for latency, and are only reported.
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from mal_haystack.ann import IVFIndex
+from mal_haystack.embedding_matrix import (
+    DTYPES,
+    EmbeddingMatrix,
+    normalize,
+    recall_at_k,
+)
+
+
+def clustered_embeddings(
+    rng: np.random.Generator,
+    count: int,
+    dim: int,
+    clusters: int = 256,
+    spread: float = 0.7,
+) -> np.ndarray:
+    """Generates embeddings scattered around random cluster centers.
+
+    Arguments:
+        rng: The random number generator to use.
+        count: The number of embeddings.
+        dim: The embedding dimension.
+        clusters: The number of cluster centers.
+        spread: The scale of the noise around centers, relative to them.
+
+    Returns:
+        The float32 embeddings, one per row.
+    """
+
+    centers = rng.standard_normal((clusters, dim))
+    labels = rng.integers(clusters, size=count)
+    noise = spread * rng.standard_normal((count, dim))
+    return (centers[labels] + noise).astype(np.float32)
+
+
+def per_document_search(
+    embeddings: List[np.ndarray],
+    queries: np.ndarray,
+    top_k: int,
+) -> np.ndarray:
+    """Searches as the in-memory document store does, one query at a time.
+
+    Arguments:
+        embeddings: One embedding array per document.
+        queries: The query embeddings, one per row.
+        top_k: The number of documents to find per query.
+
+    Returns:
+        The top-k documents found for each query, most similar first.
+    """
+
+    found = []
+    for query in queries:
+        matrix = np.array(embeddings)
+        scores = matrix @ query / (
+            np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+        found.append(np.argsort(-scores)[:top_k])
+    return np.array(found)
+
+
+def main(argv: List[str] = sys.argv[1:]) -> int:
+    """Runs the embedding search benchmark.
+
+    Arguments:
+        argv: The list of command line arguments.
+
+    Returns:
+        Zero, or one if any precision recalls less than ``--min-recall``.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.embeddings',
+        description='Compares embedding matrix search against per-document '
+                    'scoring',
+    )
+    parser.add_argument(
+        '-n', '--documents',
+        type=int,
+        action='append',
+        help='number of document embeddings to search (usable multiple '
+             'times, default: 10000 and 100000)',
+    )
+    parser.add_argument(
+        '--queries',
+        type=int,
+        default=64,
+        help='number of queries to search (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--dim',
+        type=int,
+        default=384,
+        help='embedding dimension (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--top-k',
+        type=int,
+        default=10,
+        help='number of documents to find per query (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--nprobe',
+        type=int,
+        action='append',
+        help='number of clusters an approximate index probes per query '
+             '(usable multiple times, default: 1, 8 and 32)',
+    )
+    parser.add_argument(
+        '--min-recall',
+        type=float,
+        default=0.95,
+        help='lowest acceptable recall@k of any precision '
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--output',
+        help='path of JSON file to save results to',
+    )
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    results: Dict[int, Dict[str, Dict[str, Any]]] = {}
+    failed = False
+    for count in args.documents or [10_000, 100_000]:
+        # Queries are drawn around the same centers as documents
+        embeddings = clustered_embeddings(
+            rng, count + args.queries, args.dim)
+        embeddings, queries = embeddings[:count], embeddings[count:]
+
+        # Exact float32 search is the reference results are recalled from
+        scores = normalize(queries) @ normalize(embeddings).T
+        expected = np.argsort(-scores, axis=1)[:, :args.top_k]
+
+        arrays = list(embeddings)
+        start = time.perf_counter()
+        found = per_document_search(arrays, queries, args.top_k)
+        results[count] = {'per-document': {
+            'mb': sum(array.nbytes for array in arrays) / 2 ** 20,
+            'seconds': time.perf_counter() - start,
+            'recall': recall_at_k(found, expected),
+        }}
+
+        ids = [str(num) for num in range(count)]
+        for dtype in DTYPES:
+            matrix = EmbeddingMatrix(args.dim, dtype=dtype)
+            matrix.put(ids, embeddings)
+            start = time.perf_counter()
+            found, _ = matrix.search(queries, args.top_k)
+            results[count][dtype] = {
+                'mb': matrix.nbytes / 2 ** 20,
+                'seconds': time.perf_counter() - start,
+                'recall': recall_at_k(found, expected),
+            }
+
+        index = IVFIndex(args.dim)
+        start = time.perf_counter()
+        index.build(ids, embeddings)
+        build_seconds = time.perf_counter() - start
+        for nprobe in args.nprobe or [1, 8, 32]:
+            start = time.perf_counter()
+            found, _ = index.search(queries, args.top_k, nprobe=nprobe)
+            results[count][f'ivf-{nprobe}'] = {
+                'mb': index.nbytes / 2 ** 20,
+                'seconds': time.perf_counter() - start,
+                'build_seconds': build_seconds,
+                'recall': recall_at_k(
+                    [np.array(row, dtype=np.int64) for row in found],
+                    expected),
+            }
+
+        print(f'{count} documents, {args.queries} queries')
+        for name, result in results[count].items():
+            if name in DTYPES:
+                failed |= result['recall'] < args.min_recall
+            print(f'  {name:<13}'
+                  f'{result["mb"]:8.1f} MiB  '
+                  f'{result["seconds"]:8.3f}s  '
+                  f'recall@{args.top_k} {result["recall"]:.3f}')
+
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(results, outfile, indent=2)
+
+    return int(failed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Compares the memory of the compact document store against the default.
+
+Synthetic reviews are indexed as the entry point does, once into the
+default in-memory document store from a single DataFrame, and once into the
+compact document store streaming DataFrame chunks, each in a fresh process.
+For each path the peak and retained resident memory growth and the time to
+index and to iterate every document are reported.
+
+Run as ``python -m benchmarks.memory``.
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+from mal_haystack.profiling import PeakRSS
+
+from .synthetic import REVIEWS_CSV, write_dataset
+
+#: Metadata columns extracted in the benchmark
+META_COLUMNS = ['Anime Title', 'Anime URL', 'Overall Rating']
+
+#: The benchmarked indexing paths
+PATHS = ('default', 'compact')
+
+
+def index_reviews(
+    path: str,
+    zip_path: str,
+    chunksize: Optional[int],
+) -> Dict[str, Any]:
+    """Indexes and iterates reviews along one path, measuring memory.
+
+    Arguments:
+        path: The indexing path, one of :data:`PATHS`.
+        zip_path: The synthetic dataset zip file.
+        chunksize: The number of CSV rows to index at a time on the compact
+            path, or all rows at once if not specified.
+
+    Returns:
+        The ``documents`` indexed, the ``index_seconds`` and
+        ``iterate_seconds`` taken, and the ``peak_mb`` and ``retained_mb``
+        resident memory growth.
+    """
+
+    from mal_haystack.document_stores import (
+        CompactDocumentStore,
+        IndexedInMemoryDocumentStore,
+    )
+    from mal_haystack.nodes import DataFrameConverter, ZipLister
+    from mal_haystack.pipelines import ZippedReviewIndexer
+
+    if path == 'compact':
+        document_store = CompactDocumentStore()
+    else:
+        document_store = IndexedInMemoryDocumentStore(
+            similarity='cosine',
+            indexed_fields=['index', *META_COLUMNS],
+        )
+    pipeline = ZippedReviewIndexer(
+        ZipLister(),
+        document_store,
+        DataFrameConverter(progress_bar=False),
+    )
+    params = {
+        'ZipLister': {'valid_names': [REVIEWS_CSV]},
+        'ZipDataFramer': {'columns': ['Review', *META_COLUMNS]},
+        'DataFrameConverter': {
+            'document_column': 'Review',
+            'meta_columns': META_COLUMNS,
+        },
+    }
+
+    process = psutil.Process()
+    gc.collect()
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        if path == 'compact' and chunksize:
+            pipeline.run_streaming(
+                file_paths=[zip_path],
+                chunksize=chunksize,
+                params=params,
+            )
+        else:
+            pipeline.run(file_paths=[zip_path], params=params)
+        index_seconds = time.perf_counter() - start
+        gc.collect()
+        retained = process.memory_info().rss - rss.start
+
+    start = time.perf_counter()
+    count = sum(1 for _ in document_store.get_all_documents_generator())
+    iterate_seconds = time.perf_counter() - start
+
+    return {
+        'documents': count,
+        'index_seconds': index_seconds,
+        'iterate_seconds': iterate_seconds,
+        'peak_mb': rss.growth_mb,
+        'retained_mb': retained / 2 ** 20,
+    }
+
+
+def main(argv: List[str] = sys.argv[1:]) -> int:
+    """Runs the memory benchmark.
+
+    Arguments:
+        argv: The list of command line arguments.
+
+    Returns:
+        Zero.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.memory',
+        description='Compares the memory of the compact document store '
+                    'against the default document store',
+    )
+    parser.add_argument(
+        '-n', '--rows',
+        type=int,
+        action='append',
+        help='number of synthetic reviews to index (usable multiple times, '
+             'default: 10000 and 100000)',
+    )
+    parser.add_argument(
+        '--chunksize',
+        type=int,
+        default=10_000,
+        help='number of CSV rows the compact path indexes at a time '
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--data-dir',
+        default=tempfile.gettempdir(),
+        help='directory to write synthetic datasets to '
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--output',
+        help='path of JSON file to save results to',
+    )
+    args = parser.parse_args(argv)
+
+    # Each path runs in a fresh process, so neither reuses the other's heap
+    context = multiprocessing.get_context('spawn')
+    results: Dict[int, Dict[str, Dict[str, Any]]] = {}
+    for num_rows in args.rows or [10_000, 100_000]:
+        zip_path = str(write_dataset(args.data_dir, num_rows))
+        results[num_rows] = {}
+        for path in PATHS:
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                results[num_rows][path] = executor.submit(
+                    index_reviews, path, zip_path, args.chunksize).result()
+
+        print(f'{num_rows} reviews')
+        default = results[num_rows]['default']
+        for path, result in results[num_rows].items():
+            print(f'  {path:<8}'
+                  f'peak {result["peak_mb"]:8.1f} MiB  '
+                  f'retained {result["retained_mb"]:8.1f} MiB '
+                  f'({result["retained_mb"] / default["retained_mb"]:4.0%})  '
+                  f'index {result["index_seconds"]:6.2f}s  '
+                  f'iterate {result["iterate_seconds"]:6.2f}s')
+
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(results, outfile, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Builds tiny local models so that benchmarks run offline."""
+
+import pathlib
+import string
+from typing import NamedTuple
+
+from .synthetic import vocabulary
+
+#: Hidden size of the tiny models, and so their embedding dimension
+EMBEDDING_DIM = 32
+
+
+class TinyModels(NamedTuple):
+    """Paths of locally constructed tiny models.
+
+    Attributes:
+        retriever: Path of the sentence-transformers embedding model.
+        reader: Path of the extractive QA model.
+    """
+
+    retriever: str
+    reader: str
+
+
+def build_tiny_models(directory: str | pathlib.Path) -> TinyModels:
+    """Builds randomly initialized tiny BERT models, reusing existing ones.
+
+    The models are far too small to give meaningful answers, but exercise
+    the same tokenization, embedding and reader code paths as the real
+    models without downloading anything.
+
+    Arguments:
+        directory: The directory to save the models in.
+
+    Returns:
+        The paths of the saved models.
+    """
+
+    directory = pathlib.Path(directory)
+    models = TinyModels(
+        retriever=str(directory / 'tiny-retriever'),
+        reader=str(directory / 'tiny-reader'),
+    )
+    if pathlib.Path(models.retriever).exists():
+        return models
+
+    # Heavy imports are deferred until models are actually needed
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers import models as st_models
+    from transformers import (
+        BertConfig,
+        BertForQuestionAnswering,
+        BertModel,
+        BertTokenizerFast,
+    )
+
+    directory.mkdir(parents=True, exist_ok=True)
+    vocab_path = directory / 'vocab.txt'
+    tokens = [
+        '[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]',
+        *string.punctuation,
+        *vocabulary(),
+    ]
+    vocab_path.write_text('\n'.join(tokens) + '\n')
+
+    torch.manual_seed(0)
+    tokenizer = BertTokenizerFast(vocab_file=str(vocab_path))
+    config = BertConfig(
+        vocab_size=len(tokens),
+        hidden_size=EMBEDDING_DIM,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=2 * EMBEDDING_DIM,
+        max_position_embeddings=512,
+    )
+
+    BertForQuestionAnswering(config).save_pretrained(models.reader)
+    tokenizer.save_pretrained(models.reader)
+
+    encoder_path = directory / 'tiny-encoder'
+    BertModel(config).save_pretrained(encoder_path)
+    tokenizer.save_pretrained(encoder_path)
+    embedder = SentenceTransformer(modules=[
+        st_models.Transformer(str(encoder_path), max_seq_length=256),
+        st_models.Pooling(EMBEDDING_DIM),
+    ])
+    embedder.save(models.retriever)
+
+    return models
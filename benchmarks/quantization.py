@@ -0,0 +1,350 @@
+"""Compares quantized CPU inference against full precision.
+
+The reader and retriever are run in full fp32 precision and dynamically
+quantized to int8 on a sample of reviews, as is the reader exported to ONNX
+with ``--onnx``. Each variant's speed is reported alongside how closely it
+agrees with fp32: the fraction of identical top answers, their mean token F1
+and score difference for the reader, and the mean embedding cosine
+similarity and top-k retrieval overlap for the retriever.
+
+Run as ``python -m benchmarks.quantization``. Exits non-zero if a variant
+agrees with fp32 on fewer top answers than ``--min-agreement``.
+"""
+
+import argparse
+import collections
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .synthetic import QUERIES, generate_reviews
+
+#: The default reader and retriever models, as used by mal_haystack
+READER_MODEL = 'deepset/roberta-base-squad2'
+RETRIEVER_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+
+def _f1(prediction: str, truth: str) -> float:
+    """Gets the token F1 score of a predicted answer against another.
+
+    Arguments:
+        prediction: The predicted answer.
+        truth: The reference answer.
+
+    Returns:
+        The token F1 score, one if both answers are empty.
+    """
+
+    predicted, expected = prediction.split(), truth.split()
+    if not predicted or not expected:
+        return float(predicted == expected)
+
+    common = sum(
+        (collections.Counter(predicted) & collections.Counter(expected))
+        .values())
+    if common == 0:
+        return 0.0
+    precision, recall = common / len(predicted), common / len(expected)
+    return 2 * precision * recall / (precision + recall)
+
+
+def _top_answers(reader: Any, documents: List, queries: List[str]) -> List:
+    """Reads every query against every document, returning top answers.
+
+    Arguments:
+        reader: The reader to read with.
+        documents: The documents to read.
+        queries: The queries to answer.
+
+    Returns:
+        The top answer of each (document, query) pair, or None.
+    """
+
+    result = reader.predict_batch(
+        queries=[query for _ in documents for query in queries],
+        documents=[[document] for document in documents for _ in queries],
+        top_k=1,
+    )
+    return [answers[0] if answers else None for answers in result['answers']]
+
+
+def compare_readers(
+    readers: Dict[str, Any],
+    documents: List,
+    queries: List[str],
+) -> Dict[str, Dict[str, float]]:
+    """Compares reader variants against the ``'fp32'`` reader.
+
+    Arguments:
+        readers: The readers to compare, by variant name.
+        documents: The documents to read.
+        queries: The queries to answer.
+
+    Returns:
+        The seconds taken, speedup, top answer agreement, mean token F1 and
+        mean absolute score difference of each variant.
+    """
+
+    results, answers = {}, {}
+    for name, reader in readers.items():
+        start = time.perf_counter()
+        answers[name] = _top_answers(reader, documents, queries)
+        results[name] = {'seconds': time.perf_counter() - start}
+
+    reference = answers['fp32']
+    for name, result in results.items():
+        texts = [
+            (answer.answer if answer else '', truth.answer if truth else '')
+            for answer, truth in zip(answers[name], reference)
+        ]
+        scores = [
+            abs((answer.score if answer else 0.0)
+                - (truth.score if truth else 0.0))
+            for answer, truth in zip(answers[name], reference)
+        ]
+        result['speedup'] = results['fp32']['seconds'] / result['seconds']
+        result['agreement'] = float(np.mean([a == b for a, b in texts]))
+        result['f1'] = float(np.mean([_f1(a, b) for a, b in texts]))
+        result['score_mae'] = float(np.mean(scores))
+
+    return results
+
+
+def compare_retrievers(
+    retrievers: Dict[str, Any],
+    documents: List,
+    queries: List[str],
+    top_k: int = 10,
+) -> Dict[str, Dict[str, float]]:
+    """Compares retriever variants against the ``'fp32'`` retriever.
+
+    Arguments:
+        retrievers: The retrievers to compare, by variant name.
+        documents: The documents to embed.
+        queries: The queries to retrieve documents for.
+        top_k: The number of documents retrieved per query.
+
+    Returns:
+        The seconds taken, speedup, mean cosine similarity to the fp32
+        document embeddings and top-k overlap of each variant.
+    """
+
+    results, embeddings = {}, {}
+    for name, retriever in retrievers.items():
+        start = time.perf_counter()
+        docs = np.asarray(retriever.embed_documents(documents))
+        query_embeddings = np.asarray(retriever.embed_queries(queries))
+        results[name] = {'seconds': time.perf_counter() - start}
+
+        docs = docs / np.linalg.norm(docs, axis=1, keepdims=True)
+        query_embeddings = query_embeddings / np.linalg.norm(
+            query_embeddings, axis=1, keepdims=True)
+        top = np.argsort(-query_embeddings @ docs.T, axis=1)[:, :top_k]
+        embeddings[name] = (docs, top)
+
+    reference_docs, reference_top = embeddings['fp32']
+    for name, result in results.items():
+        docs, top = embeddings[name]
+        overlap = [
+            len(set(row) & set(reference_row)) / len(reference_row)
+            for row, reference_row in zip(top, reference_top)
+        ]
+        result['speedup'] = results['fp32']['seconds'] / result['seconds']
+        result['cosine'] = float(np.mean(np.sum(docs * reference_docs, 1)))
+        result['top_k_overlap'] = float(np.mean(overlap))
+
+    return results
+
+
+def load_texts(
+    csv_path: Optional[str],
+    document_column: str,
+    sample: int,
+) -> List[str]:
+    """Loads a sample of review texts.
+
+    Arguments:
+        csv_path: If specified, the CSV file to sample reviews from.
+            Otherwise synthetic reviews are generated.
+        document_column: The CSV column holding reviews.
+        sample: The number of reviews to sample.
+
+    Returns:
+        The review texts.
+    """
+
+    if csv_path is None:
+        return generate_reviews(sample)['Review'].to_list()
+
+    reviews = pd.read_csv(csv_path, usecols=[document_column])
+    reviews = reviews[document_column].dropna()
+    return reviews.sample(min(sample, len(reviews)), random_state=0).to_list()
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """Gets the quantization comparison CLI argument parser.
+
+    Returns:
+        The argument parser.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.quantization',
+        description='Compares quantized CPU inference against fp32',
+    )
+    parser.add_argument(
+        '--csv',
+        help='CSV file to sample reviews from (default: synthetic reviews)',
+    )
+    parser.add_argument(
+        '--document-column',
+        default='Review',
+        help='name of the CSV review column (default: %(default)s)',
+    )
+    parser.add_argument(
+        '-n', '--sample',
+        type=int,
+        default=50,
+        help='number of reviews to compare on (default: %(default)s)',
+    )
+    parser.add_argument(
+        '-q', '--query',
+        action='append',
+        help='query to answer per review (usable multiple times, default: '
+             'the synthetic benchmark queries)',
+    )
+    parser.add_argument(
+        '--reader',
+        default=READER_MODEL,
+        help='reader model name or path (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--retriever',
+        default=RETRIEVER_MODEL,
+        help='retriever model name or path (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--onnx',
+        help='directory to export ONNX reader models to; ONNX variants are '
+             'skipped if not given',
+    )
+    parser.add_argument(
+        '--threads',
+        type=int,
+        help='number of torch threads to use (default: torch default)',
+    )
+    parser.add_argument(
+        '--min-agreement',
+        type=float,
+        default=0.9,
+        help='minimum fraction of top answers each variant must share with '
+             'fp32 (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--output',
+        help='path of JSON file to save results to',
+    )
+    return parser
+
+
+def main(argv: List[str] = sys.argv[1:]) -> int:
+    """Runs the quantization comparison.
+
+    Arguments:
+        argv: The list of command line arguments.
+
+    Returns:
+        Zero, or one if any variant's agreement is below the minimum.
+    """
+
+    args = get_parser().parse_args(argv)
+
+    # Deferred so that argument errors are reported without heavy imports
+    import torch
+    from haystack import Document
+    from haystack.document_stores import InMemoryDocumentStore
+    from haystack.nodes import EmbeddingRetriever
+    from haystack.nodes.reader import FARMReader
+
+    from mal_haystack.quantization import (
+        export_onnx_reader,
+        quantize_reader,
+        quantize_retriever,
+    )
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    queries = args.query or QUERIES
+    documents = [
+        Document(content=text)
+        for text in load_texts(args.csv, args.document_column, args.sample)
+    ]
+
+    def reader(model: str = args.reader) -> FARMReader:
+        """Loads a CPU reader."""
+
+        return FARMReader(
+            model, num_processes=1, use_gpu=False, progress_bar=False)
+
+    readers = {'fp32': reader(), 'int8': quantize_reader(reader())}
+    if args.onnx:
+        for name, quantize in (('onnx', False), ('onnx-int8', True)):
+            path = export_onnx_reader(args.reader, args.onnx, quantize)
+            readers[name] = reader(str(path))
+
+    def retriever() -> EmbeddingRetriever:
+        """Loads a CPU retriever."""
+
+        return EmbeddingRetriever(
+            document_store=InMemoryDocumentStore(),
+            embedding_model=args.retriever,
+            use_gpu=False,
+            progress_bar=False,
+        )
+
+    retrievers = {
+        'fp32': retriever(),
+        'int8': quantize_retriever(retriever()),
+    }
+
+    results = {
+        'reader': compare_readers(readers, documents, queries),
+        'retriever': compare_retrievers(retrievers, documents, queries),
+    }
+
+    print(f'Reader ({len(documents)} reviews x {len(queries)} queries)')
+    for name, result in results['reader'].items():
+        print(f'  {name:<10}{result["seconds"]:8.2f}s '
+              f'{result["speedup"]:5.2f}x  '
+              f'agreement {result["agreement"]:.3f}  '
+              f'F1 {result["f1"]:.3f}  '
+              f'score MAE {result["score_mae"]:.4f}')
+    print(f'Retriever ({len(documents)} reviews)')
+    for name, result in results['retriever'].items():
+        print(f'  {name:<10}{result["seconds"]:8.2f}s '
+              f'{result["speedup"]:5.2f}x  '
+              f'cosine {result["cosine"]:.4f}  '
+              f'top-k overlap {result["top_k_overlap"]:.3f}')
+
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(results, outfile, indent=2)
+
+    failed = [
+        name for name, result in results['reader'].items()
+        if result['agreement'] < args.min_agreement
+    ]
+    for name in failed:
+        print(f'FAILED: {name} agrees with fp32 on fewer than '
+              f'{args.min_agreement:.0%} of top answers')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Benchmarks MAL Haystack command line startup time.
+
+Each command is run in a fresh interpreter several times and its median wall
+time reported, comparing the lazily importing entry point against importing
+every dependency up front as the entry point used to.
+
+Run as ``python -m benchmarks.startup``. Exits non-zero if any command
+exits with another status than expected, as its timing would be
+meaningless.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+#: Modules the entry point used to import before parsing arguments
+EAGER_MODULES = [
+    'haystack',
+    'haystack.nodes.reader',
+    'haystack.pipelines',
+    'tqdm.auto',
+    'mal_haystack.document_stores',
+    'mal_haystack.embedding_cache',
+    'mal_haystack.nodes.dataframe_converter',
+    'mal_haystack.nodes.dataframer',
+    'mal_haystack.nodes.embedding_retriever',
+    'mal_haystack.nodes.qa_extractor',
+    'mal_haystack.nodes.zip_dataframer',
+    'mal_haystack.nodes.zip_lister',
+    'mal_haystack.pipelines',
+    'mal_haystack.writers',
+]
+
+#: Commands to time, by name, with their expected exit status
+COMMANDS: Dict[str, Tuple[List[str], int]] = {
+    'mal_haystack --help': (['-m', 'mal_haystack', '--help'], 0),
+    # Rejected with a ValueError, before haystack is imported
+    'mal_haystack argument error': (
+        ['-m', 'mal_haystack', 'Review', 'a.csv'], 1),
+    'import mal_haystack.nodes': (['-c', 'import mal_haystack.nodes'], 0),
+    'eager imports (before)': (
+        ['-c', f'import {", ".join(EAGER_MODULES)}'], 0),
+}
+
+
+def time_command(
+    args: List[str],
+    repeat: int,
+    returncode: int = 0,
+) -> float:
+    """Times a Python command in fresh interpreters.
+
+    Arguments:
+        args: The interpreter arguments.
+        repeat: The number of times to run the command.
+        returncode: The exit status the command is expected to exit with.
+
+    Returns:
+        The median wall time in seconds.
+
+    Raises:
+        subprocess.CalledProcessError: If a run exits with another status.
+    """
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, *args],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        timings.append(time.perf_counter() - start)
+        if process.returncode != returncode:
+            raise subprocess.CalledProcessError(
+                process.returncode, process.args, stderr=process.stderr)
+
+    return statistics.median(timings)
+
+
+def main(argv: List[str] = sys.argv[1:]) -> int:
+    """Runs the startup benchmarks.
+
+    Arguments:
+        argv: The list of command line arguments.
+
+    Returns:
+        Zero, or one if any command failed.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.startup',
+        description='Benchmarks MAL Haystack command line startup time',
+    )
+    parser.add_argument(
+        '-r', '--repeat',
+        type=int,
+        default=5,
+        help='number of times to run each command (default: %(default)s)',
+    )
+    args = parser.parse_args(argv)
+
+    results: Dict[str, float] = {}
+    failed = False
+    width = max(map(len, COMMANDS))
+    for name, (command, returncode) in COMMANDS.items():
+        try:
+            results[name] = time_command(command, args.repeat, returncode)
+        except subprocess.CalledProcessError as error:
+            failed = True
+            lines = error.stderr.strip().splitlines() or ['']
+            print(f'{name.ljust(width)}  failed with exit status '
+                  f'{error.returncode}: {lines[-1]}')
+
+    eager = results.get('eager imports (before)')
+    for name, seconds in results.items():
+        comparison = ''
+        if eager is not None:
+            comparison = f'  {eager / seconds:6.1f}x faster than eager imports'
+        print(f'{name.ljust(width)}  {seconds:7.3f}s{comparison}')
+
+    return int(failed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Generates synthetic MAL-style review datasets."""
+
+import pathlib
+import zipfile
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+#: Name of the reviews CSV file in the Kaggle dataset zip
+REVIEWS_CSV = 'MAL Anime Reviews 85k.csv'
+
+#: Words reviews are generated from
+VOCABULARY = [
+    'anime', 'story', 'character', 'characters', 'animation', 'sound',
+    'music', 'opening', 'ending', 'episode', 'episodes', 'season', 'plot',
+    'protagonist', 'villain', 'friend', 'battle', 'world', 'magic', 'school',
+    'the', 'a', 'an', 'and', 'but', 'or', 'is', 'was', 'were', 'are', 'this',
+    'that', 'it', 'with', 'of', 'in', 'on', 'to', 'for', 'very', 'really',
+    'good', 'great', 'bad', 'boring', 'amazing', 'beautiful', 'slow', 'fast',
+    'main', 'side', 'best', 'worst', 'overall', 'enjoyed', 'loved', 'hated',
+    'watched', 'recommend', 'ﬁnal', 'eﬀort', 'I', 'we', 'they', 'he',
+    'she',
+]
+
+#: Queries asked of synthetic reviews
+QUERIES = [
+    'Who are the main characters?',
+    'How is the animation?',
+]
+
+
+def _review(rng: np.random.Generator) -> str:
+    """Generates a single review of a few sentences to many paragraphs.
+
+    Arguments:
+        rng: The random number generator to use.
+
+    Returns:
+        The review text.
+    """
+
+    # Review lengths in the real dataset are heavily right-skewed
+    num_words = int(np.clip(rng.lognormal(5.0, 0.8), 20, 3000))
+    words = rng.choice(VOCABULARY, size=num_words)
+    paragraphs = [
+        ' '.join(chunk) + '.'
+        for chunk in np.array_split(words, max(1, num_words // 120))
+    ]
+    return '\n\n'.join(paragraphs)
+
+
+def generate_reviews(num_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Generates a DataFrame of synthetic MAL-style reviews.
+
+    Arguments:
+        num_rows: The number of reviews to generate.
+        seed: The random seed.
+
+    Returns:
+        The reviews, with the columns of the Kaggle reviews CSV file.
+    """
+
+    rng = np.random.default_rng(seed)
+    titles = [f'Anime {num}' for num in range(max(1, num_rows // 10))]
+    title_ids = rng.integers(0, len(titles), size=num_rows)
+    ratings = rng.integers(1, 11, size=(num_rows, 6))
+    return pd.DataFrame({
+        'Anime Title': [titles[num] for num in title_ids],
+        'Anime URL': [
+            f'https://myanimelist.net/anime/{num}' for num in title_ids],
+        'Review': [_review(rng) for _ in range(num_rows)],
+        'Overall Rating': ratings[:, 0],
+        'Story Rating': ratings[:, 1],
+        'Animation Rating': ratings[:, 2],
+        'Sound Rating': ratings[:, 3],
+        'Character Rating': ratings[:, 4],
+        'Enjoyment Rating': ratings[:, 5],
+    })
+
+
+def write_dataset(
+    directory: str | pathlib.Path,
+    num_rows: int,
+    seed: int = 0,
+) -> pathlib.Path:
+    """Writes a synthetic Kaggle-style dataset zip, reusing an existing one.
+
+    Arguments:
+        directory: The directory to write the zip file to.
+        num_rows: The number of reviews to generate.
+        seed: The random seed.
+
+    Returns:
+        The path of the zip file containing :data:`REVIEWS_CSV`.
+    """
+
+    path = pathlib.Path(directory) / f'mal-synthetic-{num_rows}-{seed}.zip'
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        dataframe = generate_reviews(num_rows, seed=seed)
+        tmp_path = path.with_suffix('.tmp')
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as myzip:
+            myzip.writestr(REVIEWS_CSV, dataframe.to_csv(index=False))
+        tmp_path.replace(path)
+
+    return path
+
+
+def vocabulary() -> List[str]:
+    """Gets every word appearing in synthetic reviews and queries.
+
+    Returns:
+        The sorted vocabulary.
+    """
+
+    words = {word.lower() for word in VOCABULARY}
+    for query in QUERIES:
+        words.update(query.rstrip('?').lower().split())
+    return sorted(words)
@@ -1,18 +1,36 @@
-"""Defines the MAL Haystack main entry point."""
+"""Defines the MAL Haystack main entry point.
+
+Haystack, and with it torch and transformers, take seconds to import, so
+they are only imported once the command line arguments have been validated
+and a stage needs them. ``--help`` and argument errors return immediately.
+"""
 
 import argparse
-import csv
+import contextlib
+import functools
+import itertools
+import json
 import logging
+import os
 import sys
-from typing import List
+import threading
+from typing import Any, Dict, List
+
+from mal_haystack.extraction import (
+    read_directly,
+    retrieve_and_read,
+    search_corpus,
+)
 
-from haystack.document_stores import InMemoryDocumentStore
-from haystack.nodes.reader import FARMReader
-from haystack.pipelines import ExtractiveQAPipeline
-from tqdm.auto import tqdm
+#: The reader model used for extractive QA
+READER_MODEL = 'deepset/roberta-base-squad2'
 
-from mal_haystack.nodes import EmbeddingRetriever, ZipLister
-from mal_haystack.pipelines import ReviewIndexer, ZippedReviewIndexer
+#: The embedding model used for document retrieval
+EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+#: The embedding storage precisions, as ``embedding_matrix.DTYPES``, kept
+#: here so that parsing arguments does not import numpy
+EMBEDDING_DTYPES = ('float32', 'float16', 'int8')
 
 
 def _configure_logger() -> logging.Logger:
@@ -31,6 +49,121 @@ def _configure_logger() -> logging.Logger:
     return log
 
 
+def _ann_index(
+    document_store: Any,
+    args: argparse.Namespace,
+    logger: logging.Logger,
+    model: str,
+) -> Any:
+    """Loads the corpus-wide search index, building it if missing or stale.
+
+    An index is stale unless it holds exactly the stored documents, was
+    built with `model` and has the requested number of lists.
+
+    Arguments:
+        document_store: The document store of embedded documents.
+        args: The parsed command line arguments.
+        logger: The main logger.
+        model: The name and variant of the model documents are embedded
+            with.
+
+    Returns:
+        The approximate nearest neighbour index.
+    """
+
+    from mal_haystack.ann import IVFIndex
+
+    ids = [
+        document.id
+        for document in document_store.get_all_documents_generator()
+    ]
+    if args.ann_index and os.path.exists(args.ann_index):
+        index = IVFIndex.load(args.ann_index)
+        if (
+            index.model == model
+            and index.matches(ids)
+            and args.ann_nlist in (None, index.nlist)
+        ):
+            index.nprobe = args.ann_nprobe
+            logger.info(
+                'Loaded search index of %s documents from %s',
+                len(index), args.ann_index)
+            return index
+        logger.info('Rebuilding stale search index %s', args.ann_index)
+
+    ids, embeddings = [], []
+    for document in document_store.get_all_documents_generator(
+            return_embedding=True):
+        ids.append(document.id)
+        embeddings.append(document.embedding)
+
+    index = IVFIndex(
+        document_store.embedding_dim,
+        nlist=args.ann_nlist,
+        nprobe=args.ann_nprobe,
+        model=model,
+    )
+    index.build(ids, embeddings)
+    logger.info(
+        'Built search index of %s documents in %s lists',
+        len(index), index.nlist)
+    if args.ann_index:
+        index.save(args.ann_index)
+        logger.info('Saved search index to %s', args.ann_index)
+    return index
+
+
+def _is_pending(writer: Any, deduplicator: Any, index: Any) -> bool:
+    """Checks whether a stored document still needs reading.
+
+    Arguments:
+        writer: The result writer, holding the indices already processed.
+        deduplicator: The duplicate document detection node, if any.
+        index: The document index.
+
+    Returns:
+        Whether the document, or any duplicate of it, was not processed by
+        a previous run.
+    """
+
+    if deduplicator is not None:
+        return not deduplicator.is_group_processed(index)
+    return not writer.is_processed(index)
+
+
+def _log_ingestion(
+    logger: logging.Logger,
+    args: argparse.Namespace,
+    converter: Any,
+    splitter: Any,
+):
+    """Logs the documents split and rejected while indexing.
+
+    Arguments:
+        logger: The main logger.
+        args: The parsed command line arguments.
+        converter: The DataFrame converter documents were converted with.
+        splitter: The passage splitter, if documents were split.
+    """
+
+    if splitter is not None:
+        logger.info(
+            'Split %s documents into %s passages (%s truncated to the '
+            'token budget)',
+            splitter.document_count,
+            splitter.passage_count,
+            splitter.truncated_count,
+        )
+
+    if args.valid_language:
+        logger.info(
+            'Language validation rejected %s documents '
+            '(%s reader calls saved)',
+            converter.rejected_count,
+            converter.rejected_count * len(args.query or []),
+        )
+
+
 def get_parser() -> argparse.ArgumentParser:
     """Gets the main MAL Haystack CLI argument parser.
 
@@ -55,6 +188,17 @@ def get_parser() -> argparse.ArgumentParser:
         '-z', '--zip-path',
         help='path to zip containing CSV files, if compressed',
     )
+    parser.add_argument(
+        '--zip-workers',
+        type=int,
+        help='number of threads to read CSV files from the zip with, '
+             'unless reading --chunksize rows at a time (default: 1)',
+    )
+    parser.add_argument(
+        '--csv-cache',
+        help='directory to cache parsed CSV files in as columnar Arrow files '
+             '(requires pyarrow)',
+    )
     parser.add_argument(
         '-m', '--metadata-column',
         action='append',
@@ -65,16 +209,231 @@ def get_parser() -> argparse.ArgumentParser:
         action='append',
         help='query to extract answers for per document',
     )
+    parser.add_argument(
+        '-s', '--search',
+        action='append',
+        help='query to answer across the whole corpus instead of per '
+             'document, writing a record per document found, best answers '
+             'first (usable multiple times)',
+    )
+    parser.add_argument(
+        '--search-top-k',
+        type=int,
+        default=10,
+        help='number of passages to retrieve per --search query '
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--ann-index',
+        help='path of approximate nearest neighbour index file to search '
+             'with, built and saved if missing or stale',
+    )
+    parser.add_argument(
+        '--ann-nlist',
+        type=int,
+        help='number of clusters to build the search index with (default: '
+             'four times the square root of the number of passages)',
+    )
+    parser.add_argument(
+        '--ann-nprobe',
+        type=int,
+        default=8,
+        help='number of clusters searched per --search query; higher '
+             'increases recall and latency (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--deduplicate',
+        action='store_true',
+        help='embed and read documents with identical normalized content '
+             'once, copying their answers to every duplicate',
+    )
+    parser.add_argument(
+        '--split-passages',
+        action='store_true',
+        help='split long documents into passages of at most '
+             '--passage-tokens model tokens, so that they are neither '
+             'truncated when embedded nor read in many windows; answers are '
+             'the best across all passages of a document',
+    )
+    parser.add_argument(
+        '--passage-tokens',
+        type=int,
+        default=254,
+        help='maximum number of tokens per --split-passages passage '
+             '(default: %(default)s, the retriever model limit)',
+    )
+    parser.add_argument(
+        '--passage-overlap',
+        type=int,
+        default=32,
+        help='number of tokens consecutive --split-passages passages share '
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--token-budget',
+        type=int,
+        help='maximum number of tokens of each document to keep with '
+             '--split-passages (default: unlimited)',
+    )
+    parser.add_argument(
+        '-l', '--valid-language',
+        action='append',
+        help='ISO 639-1 language to keep documents in; documents in other '
+             'languages are dropped (usable multiple times)',
+    )
+    parser.add_argument(
+        '--language-workers',
+        type=int,
+        help='number of processes to detect document languages with '
+             '(default: number of CPUs)',
+    )
+    parser.add_argument(
+        '--language-cache',
+        help='path of JSON file caching detected languages between runs',
+    )
     parser.add_argument(
         '--no-gpu',
         action='store_true',
         help='do not use the GPU to accelerate extractive QA pipeline',
     )
+    parser.add_argument(
+        '--quantize',
+        action='store_true',
+        help='dynamically quantize the retriever and reader models to int8 '
+             'for faster CPU inference (requires --no-gpu)',
+    )
+    parser.add_argument(
+        '--onnx',
+        help='directory to export the reader model to ONNX in, running it '
+             'with ONNX Runtime; quantized with --quantize (requires '
+             '--no-gpu and onnxruntime)',
+    )
+    parser.add_argument(
+        '--direct-read',
+        action='store_true',
+        help='read each document directly instead of retrieving it first',
+    )
+    parser.add_argument(
+        '--compact-store',
+        action='store_true',
+        help='keep documents in a compact columnar table instead of an '
+             'in-memory document store, creating documents only as they are '
+             'read; for large corpora read with --direct-read or --workers',
+    )
+    parser.add_argument(
+        '--embedding-dtype',
+        choices=EMBEDDING_DTYPES,
+        default='float16',
+        help='precision to keep document embeddings in, scoring queries '
+             'with batched matrix products (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='number of processes to read documents with, each loading its '
+             'own reader; with more than one, documents are read directly '
+             'as with --direct-read, without the retriever '
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--threads-per-worker',
+        type=int,
+        help='number of torch threads per --workers process (default: '
+             'number of CPUs divided among the workers)',
+    )
+    parser.add_argument(
+        '--shard-size',
+        type=int,
+        default=128,
+        help='number of documents per --workers shard '
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=16,
+        help='number of documents to read per reader call with '
+             '--direct-read (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--skip-threshold',
+        type=float,
+        help='cosine similarity between query and document embeddings '
+             'below which the reader is skipped, writing an empty answer '
+             'flagged as skipped instead (not with --direct-read)',
+    )
+    parser.add_argument(
+        '--skip-calibration',
+        help='path of JSON file to write the reader calls skipped and the '
+             'recall of confident answers at candidate --skip-threshold '
+             'values to; every pair is read to measure them',
+    )
+    parser.add_argument(
+        '--embedding-cache',
+        help='directory to cache document embeddings in between runs',
+    )
+    parser.add_argument(
+        '--embedding-cache-size',
+        type=int,
+        help='maximum number of embeddings to keep in --embedding-cache '
+             '(default: unlimited)',
+    )
+    parser.add_argument(
+        '--embedding-cache-eviction',
+        choices=['lru', 'fifo'],
+        default='lru',
+        help='policy for evicting embeddings from a full --embedding-cache '
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--answer-cache',
+        help='path of SQLite database caching answers between runs, so '
+             'that only new document and query pairs are read',
+    )
+    parser.add_argument(
+        '--chunksize',
+        type=int,
+        help='number of CSV rows to read, convert and index at a time '
+             '(default: all rows at once)',
+    )
+    parser.add_argument(
+        '--overlap',
+        action='store_true',
+        help='parse, convert, embed and read each --chunksize chunk of rows '
+             'in concurrent stages, writing answers while later chunks are '
+             'still being parsed, instead of indexing all documents first',
+    )
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=2,
+        help='number of chunks each --overlap stage may queue ahead of the '
+             'next (default: %(default)s)',
+    )
     parser.add_argument(
         '--output',
         default='output.csv',
         help='name of output CSV file to write',
     )
+    parser.add_argument(
+        '--flush-every',
+        type=int,
+        default=256,
+        help='number of output records to write between flushes to disk '
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='keep records already in the output file and skip their '
+             'documents instead of overwriting it',
+    )
+    parser.add_argument(
+        '--profile',
+        help='path of JSON file to write wall time, calls, items per second '
+             'and peak RSS of each pipeline stage to (requires psutil)',
+    )
     parser.add_argument(
         '--debug',
         action='store_true',
@@ -99,105 +458,501 @@ def main(argv: List[str] = sys.argv[1:]) -> int:
         logger.setLevel(logging.DEBUG)
         logging.getLogger('haystack.pipelines.base').setLevel(logging.DEBUG)
 
-    # Confirm at least 1 metadata column or query
-    if not args.metadata_column and not args.query:
+    # Confirm at least 1 metadata column, query or search
+    if not args.metadata_column and not args.query and not args.search:
         raise ValueError('No metadata columns or queries specified!')
 
+    if args.workers < 1 or args.shard_size < 1:
+        raise ValueError('--workers and --shard-size must be positive!')
+
+    if not 0 <= args.passage_overlap < args.passage_tokens:
+        raise ValueError(
+            '--passage-overlap must be less than --passage-tokens!')
+    if args.token_budget is not None and args.token_budget < 1:
+        raise ValueError('--token-budget must be positive!')
+
+    # Sharded workers only read directly, without the retriever
+    direct_read = args.direct_read or args.workers > 1
+    if args.workers > 1 and not args.direct_read:
+        logger.warning(
+            '--workers %s reads documents directly as with --direct-read, '
+            'without retrieving, embedding or similarity gating',
+            args.workers)
+
+    # Chunked zip files are streamed one CSV at a time in a single thread
+    if args.zip_workers and args.zip_workers > 1 and args.chunksize:
+        logger.warning(
+            '--zip-workers %s is ignored with --chunksize, which reads the '
+            'CSV files in the zip one at a time', args.zip_workers)
+
+    # Similarity gating screens with the retriever's document embeddings
+    gated = args.skip_threshold is not None or args.skip_calibration
+    if gated and (direct_read or not args.query):
+        raise ValueError(
+            '--skip-threshold and --skip-calibration require queries and '
+            'the retriever!')
+
+    # Searches retrieve from the whole corpus rather than per document
+    if args.search and (args.query or direct_read or args.resume):
+        raise ValueError(
+            '--search cannot be combined with --query, --direct-read, '
+            '--workers or --resume!')
+    if args.search_top_k < 1 or args.ann_nprobe < 1 or (
+            args.ann_nlist is not None and args.ann_nlist < 1):
+        raise ValueError(
+            '--search-top-k, --ann-nlist and --ann-nprobe must be positive!')
+
+    # Overlapped stages read documents chunk by chunk, as they are indexed
+    if args.overlap and (
+            not args.chunksize or args.search or args.workers > 1):
+        raise ValueError(
+            '--overlap requires --chunksize, and cannot be combined with '
+            '--search or --workers!')
+    if args.queue_size < 1:
+        raise ValueError('--queue-size must be positive!')
+
+    # The compact store keeps no embeddings to retrieve with
+    if args.compact_store and not direct_read:
+        raise ValueError(
+            '--compact-store requires --direct-read or --workers!')
+
+    # Quantized and ONNX models only run on CPU
+    if (args.quantize or args.onnx) and not args.no_gpu:
+        raise ValueError('--quantize and --onnx require --no-gpu!')
+
+    # Heavy dependencies are only imported once arguments are valid
+    from tqdm.auto import tqdm
+
+    from mal_haystack.document_stores import (
+        CompactDocumentStore,
+        IndexedInMemoryDocumentStore,
+    )
+    from mal_haystack.nodes import (
+        DataFrameConverter,
+        DocumentDeduplicator,
+        PassageSplitter,
+        ZipLister,
+    )
+    from mal_haystack.pipelines import ReviewIndexer, ZippedReviewIndexer
+    from mal_haystack.writers import CSVResultWriter
+
     # Create and run index pipeline
-    document_store = InMemoryDocumentStore(
-        embedding_dim=384,  # This is to match the model used
-        similarity='cosine',
+    if args.compact_store:
+        document_store = CompactDocumentStore()
+    else:
+        document_store = IndexedInMemoryDocumentStore(
+            embedding_dim=384,  # This is to match the model used
+            similarity='cosine',
+            indexed_fields=['index', *(args.metadata_column or [])],
+            embedding_dtype=args.embedding_dtype,
+        )
+    converter = DataFrameConverter(
+        language_workers=args.language_workers,
+        language_cache_path=args.language_cache,
+    )
+    params = {
+        'DataFrameConverter': {
+            'document_column': args.document_column,
+            'meta_columns': args.metadata_column,
+            'valid_languages': args.valid_language,
+        },
+    }
+    framer_params = {
+        'columns': list(dict.fromkeys(
+            [args.document_column, *(args.metadata_column or [])])),
+    }
+    writer = CSVResultWriter(
+        args.output,
+        flush_every=args.flush_every,
+        resume=args.resume,
     )
+    deduplicator = None
+    if args.deduplicate:
+        deduplicator = DocumentDeduplicator(is_processed=writer.is_processed)
+
+    # Passages are sized in tokens of the model reading them first
+    splitter = None
+    if args.split_passages:
+        splitter = PassageSplitter(
+            max_tokens=args.passage_tokens,
+            overlap=args.passage_overlap,
+            token_budget=args.token_budget,
+            tokenizer=READER_MODEL if direct_read else EMBEDDING_MODEL,
+        )
     if args.zip_path:
         lister = ZipLister()
-        pipeline = ZippedReviewIndexer(lister, document_store)
-        pipeline.run(file_paths=[args.zip_path], params={
-            'ZipLister': {'valid_names': args.files},
-            'DataFrameConverter': {
-                'document_column': args.document_column,
-                'meta_columns': args.metadata_column,
-            },
-        })
+        pipeline = ZippedReviewIndexer(
+            lister,
+            document_store,
+            converter,
+            num_workers=args.zip_workers,
+            cache_dir=args.csv_cache,
+            deduplicator=deduplicator,
+            splitter=splitter,
+        )
+        params['ZipLister'] = {'valid_names': args.files}
+        params['ZipDataFramer'] = framer_params
+        file_paths = [args.zip_path]
     else:
-        pipeline = ReviewIndexer(document_store)
-        pipeline.run(file_paths=args.files)
-
-    # Create query pipeline
-    retriever = EmbeddingRetriever(
-        document_store=document_store,
-        embedding_model='sentence-transformers/all-MiniLM-L6-v2',
-        use_gpu=not args.no_gpu,
-    )
-
-    # Important:
-    # Now that we initialized the Retriever, we need to call update_embeddings
-    # to iterate over all previously indexed documents and update their
-    # embedding representation.
-    # While this can be a time consuming operation (depending on the corpus
-    # size), it only needs to be done once. At query time, we only need to
-    # embed the query and compare it to the existing document embeddings, which
-    # is very fast.
-    document_store.update_embeddings(retriever)
-
-    reader = FARMReader(
-        'deepset/roberta-base-squad2',
-        num_processes=1,  # Eliminate multiprocessing hangups
-        use_gpu=not args.no_gpu,
-    )
-    query_pipeline = ExtractiveQAPipeline(reader, retriever)
-
-    document_generator = document_store.get_all_documents_generator()
-    metadata_records = []
+        pipeline = ReviewIndexer(
+            document_store,
+            converter,
+            cache_dir=args.csv_cache,
+            deduplicator=deduplicator,
+            splitter=splitter,
+        )
+        params['DataFramer'] = framer_params
+        file_paths = args.files
+
+    profiler = None
+    if args.profile:
+        from mal_haystack.profiling import Profiler
+        profiler = Profiler()
+        pipeline.profile(profiler)
+
+    # Overlapped stages index documents while extracting answers below
+    if not args.overlap:
+        if args.chunksize:
+            pipeline.run_streaming(
+                file_paths=file_paths,
+                chunksize=args.chunksize,
+                params=params,
+            )
+        else:
+            pipeline.run(file_paths=file_paths, params=params)
+        converter.close()
+        _log_ingestion(logger, args, converter, splitter)
+
+    import haystack
+    from haystack.nodes.reader import FARMReader
+
+    # Answers of optimized reader variants are cached separately
+    reader_model = READER_MODEL
+    reader_variant = '+int8' if args.quantize else ''
+    if args.onnx:
+        from mal_haystack.quantization import export_onnx_reader
+        reader_model = str(export_onnx_reader(
+            READER_MODEL, args.onnx, quantize=args.quantize))
+        reader_variant = '+onnx-int8' if args.quantize else '+onnx'
+    answer_model = (
+        f'{READER_MODEL}{reader_variant}@haystack-{haystack.__version__}')
+    reader_kwargs = {
+        'model_name_or_path': reader_model,
+        'num_processes': 1,  # Eliminate multiprocessing hangups
+        'use_gpu': not args.no_gpu,
+    }
+
+    # Sharded workers load their own readers
+    reader = None
+    answer_cache = None
+    if args.workers <= 1:
+        reader = FARMReader(**reader_kwargs)
+        if args.quantize and not args.onnx:
+            from mal_haystack.quantization import quantize_reader
+            quantize_reader(reader)
+        if profiler is not None:
+            profiler.instrument(
+                reader,
+                'Reader',
+                methods=('run', 'run_batch', 'predict', 'predict_batch'),
+            )
+
+        if args.answer_cache:
+            from mal_haystack.answer_cache import AnswerCache
+            answer_cache = AnswerCache(args.answer_cache, model=answer_model)
+
+    # Documents are filtered lazily, once the writer has read any records
+    # already in the output file when resuming, and a document is read
+    # again if any of its duplicates was not processed
+    is_pending = functools.partial(_is_pending, writer, deduplicator)
+    document_generator = (
+        document
+        for document in document_store.get_all_documents_generator(
+            return_embedding=bool(gated))
+        if is_pending(document.meta['index'])
+    )
+    sharded_reader = None
+    gate = None
+    retriever = None
+    extract = None
+    if args.workers > 1:
+        from mal_haystack.sharding import ShardedReader
+        sharded_reader = ShardedReader(
+            args.workers,
+            reader_kwargs,
+            threads=args.threads_per_worker,
+            quantize=args.quantize and not args.onnx,
+            answer_cache=(
+                {'path': args.answer_cache, 'model': answer_model}
+                if args.answer_cache else None),
+            shard_size=args.shard_size,
+            batch_size=args.batch_size,
+        )
+        records = sharded_reader.map(document_generator, args.query)
+    elif args.direct_read:
+        extract = functools.partial(
+            read_directly,
+            reader,
+            queries=args.query,
+            batch_size=args.batch_size,
+            logger=logger,
+            answer_cache=answer_cache,
+        )
+    else:
+        from haystack.pipelines import ExtractiveQAPipeline
+
+        from mal_haystack.embedding_cache import EmbeddingCache
+        from mal_haystack.nodes import EmbeddingRetriever
+
+        # Create query pipeline, keeping the embeddings of optimized
+        # retriever variants apart
+        embedding_model = EMBEDDING_MODEL
+        embedding_variant = embedding_model + (
+            '+int8' if args.quantize else '')
+        embedding_cache = None
+        if args.embedding_cache:
+            embedding_cache = EmbeddingCache(
+                args.embedding_cache,
+                embedding_variant,
+                max_entries=args.embedding_cache_size,
+                eviction=args.embedding_cache_eviction,
+            )
+        retriever = EmbeddingRetriever(
+            document_store=document_store,
+            embedding_model=embedding_model,
+            use_gpu=not args.no_gpu,
+            embedding_cache=embedding_cache,
+        )
+        if args.quantize:
+            from mal_haystack.quantization import quantize_retriever
+            quantize_retriever(retriever)
+        if profiler is not None:
+            profiler.instrument(
+                retriever,
+                'Retriever',
+                methods=('run', 'run_batch', 'retrieve', 'retrieve_batch'),
+            )
+
+        # Important:
+        # Now that we initialized the Retriever, we need to call
+        # update_embeddings to iterate over all previously indexed documents
+        # and update their embedding representation.
+        # While this can be a time consuming operation (depending on the
+        # corpus size), it only needs to be done once. At query time, we only
+        # need to embed the query and compare it to the existing document
+        # embeddings, which is very fast.
+        # Overlapped stages embed each chunk of documents as it is indexed
+        embedding_stage = contextlib.nullcontext()
+        if profiler is not None:
+            embedding_stage = profiler.stage(
+                'Embedding',
+                items=document_store.get_document_count(),
+            )
+        if not args.overlap:
+            with embedding_stage:
+                document_store.update_embeddings(retriever)
+        if embedding_cache is not None:
+            embedding_cache.flush()
+
+        if gated:
+            from mal_haystack.gating import SimilarityGate
+            gate = SimilarityGate.from_retriever(
+                retriever,
+                args.query,
+                args.skip_threshold or 0.0,
+                calibrate=bool(args.skip_calibration),
+            )
+
+        if args.search:
+            index_stage = contextlib.nullcontext()
+            if profiler is not None:
+                index_stage = profiler.stage(
+                    'Search index',
+                    items=document_store.get_document_count(),
+                )
+            with index_stage:
+                retriever.ann_index = _ann_index(
+                    document_store, args, logger, embedding_variant)
+            records = search_corpus(
+                retriever,
+                reader,
+                args.search,
+                args.search_top_k,
+                logger,
+            )
+        else:
+            query_pipeline = ExtractiveQAPipeline(reader, retriever)
+            extract = functools.partial(
+                retrieve_and_read,
+                query_pipeline,
+                queries=args.query,
+                logger=logger,
+                answer_cache=answer_cache,
+                gate=gate,
+            )
+
+    # Overlapped stages parse, convert, embed and read one chunk of rows
+    # each at a time, and the retriever only reads the document store
+    # while no chunk is being written to it
+    executor = None
+    if args.overlap:
+        from mal_haystack.streaming import StagedExecutor
+
+        store_lock = contextlib.nullcontext()
+        if retriever is not None:
+            store_lock = threading.Lock()
+
+        def embed(documents: List[Any]) -> List[Any]:
+            """Embeds and indexes the documents not already processed."""
+
+            documents = [
+                document for document in documents
+                if is_pending(document.meta['index'])
+            ]
+            if retriever is not None and documents:
+                embeddings = retriever.embed_documents(documents)
+                for document, embedding in zip(documents, embeddings):
+                    document.embedding = embedding
+            with store_lock:
+                document_store.write_documents(documents)
+            return documents
+
+        def read(documents: List[Any]) -> List[Dict[str, Any]]:
+            """Extracts the metadata records of indexed documents."""
+
+            with store_lock:
+                return list(extract(documents))
+
+        convert = functools.partial(pipeline.convert, params=params)
+        executor = StagedExecutor(
+            [
+                ('Convert', convert),
+                ('Embed' if retriever is not None else 'Index', embed),
+                ('Read', read),
+            ],
+            maxsize=args.queue_size,
+            source_name='Parse',
+        )
+        records = itertools.chain.from_iterable(executor.map(
+            pipeline.iter_dataframes(
+                file_paths, args.chunksize, params=params)))
+    elif extract is not None:
+        records = extract(document_generator)
+
+    if profiler is not None:
+        records = profiler.iterate('Extraction', records)
+
+    # Records are written per document rather than per stored passage, or
+    # per document found by each search
     document_count = document_store.get_document_count()
+    if splitter is not None:
+        document_count -= splitter.passage_count - splitter.document_count
+    if args.search:
+        document_count = len(args.search) * args.search_top_k
+    # Overlapped stages deduplicate chunks while records are fanned out, so
+    # duplicates of documents already read are copied from kept records
+    if deduplicator is not None:
+        records = deduplicator.fan_out(records, keep_records=args.overlap)
+        document_count += deduplicator.duplicate_count
     desc = 'Extracting document metadata'
-    for document in tqdm(document_generator, desc=desc, total=document_count):
-
-        # Get column metadata
-        metadata = document.meta.copy()
-
-        index = metadata['index']
-
-        # TODO: Get tqdm working to report this data
-        if (index + 1) % 10 == 0:
+    if args.search:
+        desc = 'Searching documents'
+    with writer:
+        if writer.processed:
+            logger.info(
+                'Resuming with %s documents already in %s',
+                len(writer.processed), args.output)
+        # Overlapped stages only count documents as they are indexed
+        total = document_count - len(writer.processed)
+        if executor is not None:
+            total = None
+        for num, metadata in enumerate(
+            tqdm(records, desc=desc, total=total),
+        ):
+
+            # TODO: Get tqdm working to report this data
+            if (num + 1) % 10 == 0:
+                logger.info(
+                    'Processing document %s of %s',
+                    num + 1, 'unknown' if total is None else total)
+
+            writer.write(metadata)
+
+    if executor is not None:
+        converter.close()
+        _log_ingestion(logger, args, converter, splitter)
+        if retriever is not None and retriever.embedding_cache is not None:
+            retriever.embedding_cache.flush()
+
+        report = executor.report()
+        logger.info(
+            'Overlapped stages wrote the first records after %.1fs and '
+            'finished after %.1fs',
+            report['first_output_seconds'] or 0.0,
+            report['seconds'],
+        )
+        for stage in report['stages']:
+            logger.info(
+                '%s stage: %s chunks, %.1fs busy, %.1fs waiting on the '
+                'previous stage, %.1fs waiting on the next',
+                stage['name'],
+                stage['items'],
+                stage['busy_seconds'],
+                stage['starved_seconds'],
+                stage['blocked_seconds'],
+            )
+
+    if deduplicator is not None:
+        embedded = not direct_read
+        summary = deduplicator.summary(len(args.query or []))
+        logger.info(
+            'Deduplication grouped %s duplicates into %s distinct documents '
+            '(%s embeddings and %s reader calls saved)',
+            summary['duplicates'],
+            summary['documents'],
+            summary['embeddings'] if embedded else 0,
+            summary['reader_calls'],
+        )
+
+    if gate is not None:
+        report = gate.report()
+        logger.info(
+            'Similarity gating skipped %s of %s reader calls (%.1f%%)',
+            report['skipped'],
+            report['pairs'],
+            100 * report['skipped_fraction'],
+        )
+        if args.skip_calibration:
+            for point in report['calibration']:
+                logger.info(
+                    'Threshold %.2f would skip %.1f%% of reader calls, '
+                    'keeping %.1f%% of answers scoring at least %s',
+                    point['threshold'],
+                    100 * point['skipped_fraction'],
+                    100 * point['recall'],
+                    report['min_score'],
+                )
+            with open(args.skip_calibration, 'w') as outfile:
+                json.dump(report, outfile, indent=2)
             logger.info(
-                'Processing document %s of %s', index + 1, document_count)
-
-        # Get QA metadata
-        filters = {'index': {'$eq': index}}
-        if args.query:
-            result = query_pipeline.run_batch(args.query, params={
-                'Retriever': {'filters': filters},
-            })
-            for idx, (query, answers) in enumerate(
-                zip(result['queries'], result['answers'])
-            ):
-                metadata[f'Q{idx + 1}'] = query
-                if answers is None or len(answers) == 0:
-                    logger.warning('No answers for document: %s', metadata)
-                    metadata[f'Q{idx + 1} answer'] = ''
-                    metadata[f'Q{idx + 1} score'] = 0.0
-                    metadata[f'Q{idx + 1} context'] = ''
-                else:
-                    metadata[f'Q{idx + 1} answer'] = answers[0].answer
-                    metadata[f'Q{idx + 1} score'] = answers[0].score
-                    metadata[f'Q{idx + 1} context'] = answers[0].context
-
-        metadata_records.append(metadata)
-
-    # Write metadata records to output CSV
-    chunk_index = 0
-    chunk_size = 256  # TODO: Considerin making this an option
-    desc = f'Writing metadata records to {args.output}'
-    with (
-        tqdm(desc=desc, total=len(metadata_records)) as pbar,
-        open(args.output, 'w', newline='') as outfile,
-    ):
-        writer = csv.DictWriter(outfile, metadata_records[0].keys())
-        while chunk_index < len(metadata_records):
-            writer.writerows(
-                metadata_records[chunk_index:chunk_index + chunk_size])
-            chunk_index += chunk_size
-            pbar.update(min(chunk_index, len(metadata_records)))
+                'Wrote skip calibration report to %s', args.skip_calibration)
+
+    # Workers count their own answer cache hits
+    cache_stats = answer_cache
+    if sharded_reader is not None:
+        cache_stats = sharded_reader
+    if args.answer_cache and cache_stats is not None:
+        logger.info(
+            'Answer cache provided %s of %s answers without reading',
+            cache_stats.hits,
+            cache_stats.hits + cache_stats.misses,
+        )
+    if answer_cache is not None:
+        answer_cache.close()
+
+    if profiler is not None:
+        profiler.write(args.profile)
+        logger.info('Wrote profile report to %s', args.profile)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,266 @@
+"""Defines the MAL Haystack approximate nearest neighbour index.
+
+An :class:`IVFIndex` is an inverted file index: document embeddings are
+clustered around `nlist` centroids with spherical k-means, and stored
+grouped by their nearest centroid. A query is then only scored against the
+embeddings of its `nprobe` nearest centroids, trading recall for latency.
+"""
+
+import math
+import pathlib
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .embedding_matrix import normalize
+
+#: The supported storage precisions of indexed embeddings
+DTYPES = ('float32', 'float16')
+
+#: The number of embeddings k-means is trained on per centroid
+TRAINING_SAMPLES = 64
+
+
+def default_nlist(count: int) -> int:
+    """Gets a number of centroids suited to `count` embeddings.
+
+    Arguments:
+        count: The number of embeddings to index.
+
+    Returns:
+        Four times the square root of `count`, and at most `count`.
+    """
+
+    return max(1, min(count, round(4 * math.sqrt(count))))
+
+
+class IVFIndex:
+    """Inverted file index of unit length embeddings for cosine search.
+
+    Parameters:
+        dim: The embedding dimension.
+        nlist: The number of centroids to cluster embeddings around, by
+            default :func:`default_nlist` of the number of embeddings
+            once built.
+        nprobe: The number of nearest centroids whose embeddings are
+            searched per query; more increases recall and latency.
+        dtype: The storage precision, one of :data:`DTYPES`.
+        chunk_rows: The number of embeddings to assign at a time.
+        model: If specified, the name of the model the embeddings are
+            computed with, saved with the index so that an index of another
+            model's embeddings can be told apart.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        dtype: str = 'float16',
+        chunk_rows: int = 65_536,
+        model: Optional[str] = None,
+    ):
+        """Constructor."""
+
+        if dtype not in DTYPES:
+            raise ValueError(f'Unknown index dtype: {dtype}')
+        if (nlist is not None and nlist < 1) or nprobe < 1:
+            raise ValueError('`nlist` and `nprobe` must be positive!')
+
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.dtype = dtype
+        self.chunk_rows = chunk_rows
+        self.model = model
+
+        self.ids: List[str] = []
+        self._centroids = np.empty((0, dim), dtype=np.float32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._vectors = np.empty((0, dim), dtype=dtype)
+
+    def __len__(self) -> int:
+        """Gets the number of indexed embeddings."""
+
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Gets the number of bytes the index arrays take."""
+
+        return (
+            self._centroids.nbytes
+            + self._offsets.nbytes
+            + self._vectors.nbytes
+        )
+
+    def _assign(self, embeddings: np.ndarray) -> np.ndarray:
+        """Gets the nearest centroid of each normalized embedding."""
+
+        labels = np.empty(len(embeddings), dtype=np.int64)
+        for start in range(0, len(embeddings), self.chunk_rows):
+            chunk = embeddings[start:start + self.chunk_rows]
+            labels[start:start + len(chunk)] = np.argmax(
+                chunk @ self._centroids.T, axis=1)
+        return labels
+
+    def _train(
+        self,
+        embeddings: np.ndarray,
+        nlist: int,
+        iterations: int,
+        rng: np.random.Generator,
+    ):
+        """Clusters a sample of normalized embeddings with k-means.
+
+        Centroids are renormalized after each iteration, and centroids left
+        without embeddings are moved to random embeddings.
+        """
+
+        sample_size = min(len(embeddings), nlist * TRAINING_SAMPLES)
+        sample = embeddings[
+            rng.choice(len(embeddings), sample_size, replace=False)]
+        self._centroids = sample[
+            rng.choice(len(sample), nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = self._assign(sample)
+            sums = np.zeros_like(self._centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            self._centroids = normalize(sums)
+
+    def build(
+        self,
+        ids: Sequence[str],
+        embeddings: Any,
+        iterations: int = 10,
+        seed: int = 0,
+    ):
+        """Builds the index from scratch.
+
+        Arguments:
+            ids: The ids of the embeddings.
+            embeddings: The embeddings, one per id.
+            iterations: The number of k-means iterations to train with.
+            seed: The seed of training's random sampling.
+        """
+
+        embeddings = normalize(np.vstack(embeddings))
+        if embeddings.shape != (len(ids), self.dim):
+            raise ValueError(
+                f'Expected {len(ids)} embeddings of dimension {self.dim}, '
+                f'got {embeddings.shape}')
+
+        nlist = self.nlist = min(
+            self.nlist or default_nlist(len(ids)), len(ids))
+        self._train(
+            embeddings, nlist, iterations, np.random.default_rng(seed))
+
+        # Embeddings are stored grouped by centroid, each list contiguous
+        labels = self._assign(embeddings)
+        order = np.argsort(labels, kind='stable')
+        self.ids = [ids[row] for row in order.tolist()]
+        self._vectors = embeddings[order].astype(self.dtype)
+        self._offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=nlist), out=self._offsets[1:])
+
+    def search(
+        self,
+        queries: Any,
+        top_k: int,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[List[List[str]], List[np.ndarray]]:
+        """Finds the embeddings most cosine similar to each query.
+
+        Arguments:
+            queries: The query embeddings, one per row.
+            top_k: The number of embeddings to find per query.
+            nprobe: If specified, the number of centroids to probe instead
+                of `nprobe`.
+
+        Returns:
+            The ids found for each query, most similar first, and their
+            cosine similarities.
+        """
+
+        queries = normalize(np.atleast_2d(queries))
+        nprobe = min(nprobe or self.nprobe, len(self._centroids))
+        if not len(self) or top_k < 1:
+            return [[] for _ in queries], [np.empty(0) for _ in queries]
+
+        probes = np.argpartition(
+            -(queries @ self._centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        found, similarities = [], []
+        for query, lists in zip(queries, probes):
+            rows = np.concatenate([
+                np.arange(self._offsets[num], self._offsets[num + 1])
+                for num in lists.tolist()
+            ])
+            scores = self._vectors[rows].astype(np.float32) @ query
+            if len(scores) > top_k:
+                top = np.argpartition(-scores, top_k - 1)[:top_k]
+                rows, scores = rows[top], scores[top]
+            order = np.argsort(-scores, kind='stable')
+            found.append([self.ids[row] for row in rows[order].tolist()])
+            similarities.append(scores[order])
+
+        return found, similarities
+
+    def matches(self, ids: Iterable[str]) -> bool:
+        """Checks whether exactly the embeddings of `ids` are indexed.
+
+        Arguments:
+            ids: The ids of the embeddings expected in the index.
+        """
+
+        return set(ids) == set(self.ids)
+
+    def save(self, path: str | pathlib.Path):
+        """Saves the index to a NumPy ``.npz`` file.
+
+        Arguments:
+            path: The path of the file to save to.
+        """
+
+        with open(path, 'wb') as outfile:
+            np.savez(
+                outfile,
+                ids=np.array(self.ids, dtype=str),
+                centroids=self._centroids,
+                offsets=self._offsets,
+                vectors=self._vectors,
+                nprobe=self.nprobe,
+                model=np.array(self.model or '', dtype=str),
+            )
+
+    @classmethod
+    def load(cls, path: str | pathlib.Path) -> 'IVFIndex':
+        """Loads an index saved with :meth:`save`.
+
+        Arguments:
+            path: The path of the file to load from.
+
+        Returns:
+            The index.
+        """
+
+        with np.load(path, allow_pickle=False) as arrays:
+            vectors = arrays['vectors']
+            index = cls(
+                vectors.shape[1],
+                nlist=len(arrays['centroids']),
+                nprobe=int(arrays['nprobe']),
+                dtype=vectors.dtype.name,
+                model=(
+                    str(arrays['model']) or None
+                    if 'model' in arrays.files else None),
+            )
+            index.ids = arrays['ids'].tolist()
+            index._centroids = arrays['centroids']
+            index._offsets = arrays['offsets']
+            index._vectors = vectors
+
+        return index
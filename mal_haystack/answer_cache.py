@@ -0,0 +1,149 @@
+"""Defines the MAL Haystack persistent answer cache."""
+
+import hashlib
+import pathlib
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from haystack import Answer
+
+
+class AnswerCache:
+    """SQLite cache of top answers keyed by document, query and model.
+
+    Each entry holds the top answer, score and context extracted by a reader
+    model for a query on a document, identified by the hash of its content.
+    Queries without answers are cached as well, so that they are not read
+    again either.
+
+    Lookups are counted in the ``hits`` and ``misses`` attributes.
+
+    Parameters:
+        path: The path of the SQLite database file.
+        model: The name and version of the reader model answers are
+            extracted with.
+    """
+
+    def __init__(self, path: str | pathlib.Path, model: str):
+        """Constructor."""
+
+        self.model = model
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+
+        # Wait on writes of other processes sharing the cache, and allow
+        # the overlapped read stage's thread to use the connection
+        self._connection = sqlite3.connect(
+            self.path, timeout=60, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS answers ('
+            'content_hash TEXT NOT NULL, '
+            'query TEXT NOT NULL, '
+            'model TEXT NOT NULL, '
+            'answer TEXT, '
+            'score REAL, '
+            'context TEXT, '
+            'PRIMARY KEY (content_hash, query, model))'
+        )
+        self._connection.commit()
+
+    def __len__(self) -> int:
+        """Gets the number of cached answers for the model."""
+
+        row = self._connection.execute(
+            'SELECT COUNT(*) FROM answers WHERE model = ?', (self.model,),
+        ).fetchone()
+        return row[0]
+
+    @staticmethod
+    def key(content: str) -> str:
+        """Gets the cache key for document `content`.
+
+        Arguments:
+            content: The document content.
+
+        Returns:
+            The content hash.
+        """
+
+        return hashlib.sha256(str(content).encode('utf-8')).hexdigest()
+
+    def get(
+        self,
+        keys: Sequence[str],
+        queries: Sequence[str],
+    ) -> Dict[Tuple[str, str], List[Answer]]:
+        """Gets cached answers for every pair of `keys` and `queries`.
+
+        Arguments:
+            keys: The content hashes of the documents.
+            queries: The queries.
+
+        Returns:
+            The answers of each cached (content hash, query) pair, as a list
+            holding the top answer, or an empty list if there was none.
+        """
+
+        cached = {}
+        keys = list(dict.fromkeys(keys))
+        queries = list(dict.fromkeys(queries))
+        if not keys or not queries:
+            return cached
+
+        # Stay well below SQLite's limit on the number of bound parameters
+        step = max(1, 900 - len(queries))
+        query_marks = ', '.join('?' * len(queries))
+        for start in range(0, len(keys), step):
+            batch = keys[start:start + step]
+            rows = self._connection.execute(
+                'SELECT content_hash, query, answer, score, context '
+                'FROM answers WHERE model = ? '
+                f'AND content_hash IN ({", ".join("?" * len(batch))}) '
+                f'AND query IN ({query_marks})',
+                (self.model, *batch, *queries),
+            )
+            for key, query, answer, score, context in rows:
+                cached[key, query] = [] if answer is None else [
+                    Answer(answer=answer, score=score, context=context)]
+
+        self.hits += len(cached)
+        self.misses += len(keys) * len(queries) - len(cached)
+        return cached
+
+    def put(
+        self,
+        entries: Iterable[Tuple[str, str, Optional[List[Answer]]]],
+    ):
+        """Caches the top answers of (content hash, query) pairs.
+
+        Arguments:
+            entries: The content hash, query and answers of each pair, best
+                answer first.
+        """
+
+        rows = []
+        for key, query, answers in entries:
+            if answers:
+                top = answers[0]
+                rows.append((
+                    key, query, self.model, top.answer, top.score,
+                    top.context))
+            else:
+                rows.append((key, query, self.model, None, None, None))
+
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO answers '
+                '(content_hash, query, model, answer, score, context) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+
+    def close(self):
+        """Closes the database connection."""
+
+        self._connection.close()
@@ -0,0 +1,20 @@
+"""Defines MAL Haystack batching utilities."""
+
+import itertools
+from typing import Iterable, Iterator, List
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Batches `iterable` into lists of up to `size` items.
+
+    Arguments:
+        iterable: The iterable to batch.
+        size: The maximum batch size.
+
+    Returns:
+        An iterator of batches.
+    """
+
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
@@ -0,0 +1,274 @@
+"""Defines the MAL Haystack compact review table.
+
+A :class:`ReviewTable` holds reviews without a Python object per review:
+contents are UTF-8 encoded back to back in a single byte arena, indexed by
+an offset array, and metadata is held in typed columns. Documents are only
+created when a review is accessed.
+"""
+
+import array
+import numbers
+import sys
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from haystack import Document
+
+
+class _Column:
+    """A typed metadata column.
+
+    Columns of integers or floats are stored in typed arrays. Any other
+    column, including a numeric column once it holds a value of another
+    type, is dictionary encoded: each distinct value is stored once, and
+    rows hold its code. Values are distinct by type too, so that ``True``,
+    ``1`` and ``1.0`` are read back as stored.
+
+    Parameters:
+        length: The number of rows before the column, read as ``None``.
+    """
+
+    __slots__ = ('values', 'categories', 'codes')
+
+    def __init__(self, length: int = 0):
+        """Constructor."""
+
+        self.values = None
+        self.categories: List[Any] = []
+        self.codes: Dict[Tuple[type, Any], int] = {}
+        if length:
+            self._encode_all([None] * length)
+
+    def __getitem__(self, row: int) -> Any:
+        """Gets the value of `row`."""
+
+        if self.values.typecode == 'l':
+            return self.categories[self.values[row]]
+        return self.values[row]
+
+    def _encode(self, value: Any) -> int:
+        """Gets the code of a dictionary encoded value, adding it if new."""
+
+        key = (type(value), value)
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.categories)
+            self.categories.append(value)
+        return code
+
+    def _encode_all(self, values: List[Any]):
+        """Replaces the column with dictionary encoded `values`."""
+
+        self.categories, self.codes = [], {}
+        self.values = array.array('l', map(self._encode, values))
+
+    def append(self, value: Any):
+        """Appends a value to the column.
+
+        Arguments:
+            value: The value to append.
+        """
+
+        if self.values is None:
+            if isinstance(value, bool):
+                self._encode_all([])
+            elif isinstance(value, numbers.Integral):
+                self.values = array.array('q')
+            elif isinstance(value, numbers.Real):
+                self.values = array.array('d')
+            else:
+                self._encode_all([])
+
+        typecode = self.values.typecode
+        if typecode == 'l':
+            self.values.append(self._encode(value))
+        elif (
+            isinstance(value, bool)
+            or not isinstance(value, numbers.Real)
+            or (typecode == 'q' and not isinstance(value, numbers.Integral))
+            or (typecode == 'q' and not -2**63 <= value < 2**63)
+        ):
+            self._encode_all([*self.values, value])
+        else:
+            self.values.append(value)
+
+    @property
+    def nbytes(self) -> int:
+        """Gets the approximate number of bytes the column holds."""
+
+        size = self.values.itemsize * len(self.values)
+        if self.categories:
+            size += sys.getsizeof(self.categories)
+            size += sys.getsizeof(self.codes)
+            size += sum(map(sys.getsizeof, self.categories))
+        return size
+
+
+class ReviewRecord:
+    """A view of one review of a :class:`ReviewTable`.
+
+    Records only hold their table and row, decoding the review's content
+    and metadata when accessed.
+
+    Parameters:
+        table: The table holding the review.
+        row: The review's row.
+    """
+
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table: 'ReviewTable', row: int):
+        """Constructor."""
+
+        self.table = table
+        self.row = row
+
+    @property
+    def content(self) -> str:
+        """Gets the review's content."""
+
+        return self.table.content(self.row)
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        """Gets a copy of the review's metadata."""
+
+        return self.table.meta(self.row)
+
+    def to_document(self) -> 'Document':
+        """Creates a document of the review.
+
+        Returns:
+            The document.
+        """
+
+        from haystack import Document
+
+        return Document(content=self.content, meta=self.meta)
+
+
+class ReviewTable:
+    """Column-oriented table of review contents and metadata.
+
+    Reviews are appended row by row, e.g. from documents as they are
+    converted. Contents are stored UTF-8 encoded in one contiguous byte
+    arena, with the end offset of each review in a typed array, and each
+    metadata field in a typed :class:`_Column`, so that a review costs a
+    few bytes beyond its text rather than a document, a content string and
+    a metadata dict of boxed values. Metadata fields missing from a review
+    are read as ``None``.
+    """
+
+    def __init__(self):
+        """Constructor."""
+
+        self._arena = bytearray()
+        self._offsets = array.array('q', [0])
+        self._columns: Dict[str, _Column] = {}
+
+    def __len__(self) -> int:
+        """Gets the number of reviews."""
+
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> ReviewRecord:
+        """Gets a view of the review of `row`."""
+
+        if not -len(self) <= row < len(self):
+            raise IndexError('ReviewTable index out of range')
+        return ReviewRecord(self, row % len(self))
+
+    def __iter__(self) -> Iterator[ReviewRecord]:
+        """Iterates over views of the reviews in order."""
+
+        return (ReviewRecord(self, row) for row in range(len(self)))
+
+    @property
+    def columns(self) -> List[str]:
+        """Gets the metadata field names."""
+
+        return list(self._columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Gets the approximate number of bytes the table holds."""
+
+        return (
+            len(self._arena)
+            + self._offsets.itemsize * len(self._offsets)
+            + sum(column.nbytes for column in self._columns.values())
+        )
+
+    def append(self, content: str, meta: Dict[str, Any]):
+        """Appends a review.
+
+        Arguments:
+            content: The review's content.
+            meta: The review's metadata.
+        """
+
+        row = len(self)
+        for name, value in meta.items():
+            column = self._columns.get(name)
+            if column is None:
+                column = self._columns[name] = _Column(row)
+            column.append(value)
+        for name, column in self._columns.items():
+            if name not in meta:
+                column.append(None)
+
+        self._arena += str(content).encode('utf-8')
+        self._offsets.append(len(self._arena))
+
+    def extend(self, documents: Iterable[Any]):
+        """Appends the content and metadata of documents.
+
+        Arguments:
+            documents: The documents to append.
+        """
+
+        for document in documents:
+            self.append(document.content, document.meta)
+
+    def content(self, row: int) -> str:
+        """Gets the content of the review of `row`.
+
+        Arguments:
+            row: The review's row.
+
+        Returns:
+            The review's content.
+        """
+
+        start, end = self._offsets[row], self._offsets[row + 1]
+        return self._arena[start:end].decode('utf-8')
+
+    def meta(self, row: int) -> Dict[str, Any]:
+        """Gets the metadata of the review of `row`.
+
+        Arguments:
+            row: The review's row.
+
+        Returns:
+            A new dict of the review's metadata.
+        """
+
+        return {name: column[row] for name, column in self._columns.items()}
+
+    def documents(self) -> Iterator['Document']:
+        """Creates documents of the reviews in order, one at a time.
+
+        Returns:
+            An iterator of documents.
+        """
+
+        for record in self:
+            yield record.to_document()
@@ -0,0 +1,198 @@
+"""Defines the MAL Haystack columnar cache of parsed CSV files."""
+
+import hashlib
+import logging
+import os
+import pathlib
+import zipfile
+from typing import Callable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+
+def iter_csv(
+    csvfile,
+    chunksize: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Reads a CSV file as :class:`pandas.DataFrame` chunks.
+
+    Arguments:
+        csvfile: The open CSV file.
+        chunksize: If specified, the number of rows per DataFrame. Otherwise
+            the whole file is read as a single DataFrame.
+        columns: If specified, the only columns to read.
+
+    Returns:
+        An iterator of DataFrame chunks.
+    """
+
+    if chunksize is None:
+        yield pd.read_csv(csvfile, usecols=columns)
+    else:
+        yield from pd.read_csv(csvfile, usecols=columns, chunksize=chunksize)
+
+
+class DataFrameCache:
+    """On-disk cache of parsed CSV files in columnar Arrow format.
+
+    The first read of a CSV file parses it with :func:`pandas.read_csv` and
+    writes it to an uncompressed Arrow IPC (Feather) file. Later reads
+    memory-map that file and load only the requested columns.
+
+    .. note::
+
+       Requires the optional ``pyarrow`` package.
+
+    Parameters:
+        cache_dir: The directory to store cached files in.
+    """
+
+    def __init__(self, cache_dir: str | pathlib.Path):
+        """Constructor."""
+
+        if pa is None:
+            raise ImportError(
+                'DataFrameCache requires pyarrow: pip install pyarrow')
+
+        self.path = pathlib.Path(cache_dir)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def member_key(zipinfo: zipfile.ZipInfo) -> str:
+        """Gets the cache key of a zipped CSV file.
+
+        Arguments:
+            zipinfo: The zip file member info.
+
+        Returns:
+            A key from the member's name, CRC and uncompressed size.
+        """
+
+        name = hashlib.sha1(zipinfo.filename.encode('utf-8')).hexdigest()
+        return f'{name[:16]}-{zipinfo.CRC:08x}-{zipinfo.file_size}'
+
+    @staticmethod
+    def file_key(file_path: str | pathlib.Path) -> str:
+        """Gets the cache key of a CSV file.
+
+        Arguments:
+            file_path: The CSV file path.
+
+        Returns:
+            A key from the file's resolved path, size and modification time.
+        """
+
+        path = pathlib.Path(file_path).resolve()
+        stat = path.stat()
+        name = hashlib.sha1(str(path).encode('utf-8')).hexdigest()
+        return f'{name[:16]}-{stat.st_mtime_ns:x}-{stat.st_size}'
+
+    def iter_load(
+        self,
+        key: str,
+        parse: Callable[[], Iterator[pd.DataFrame]],
+        columns: Optional[List[str]] = None,
+        chunksize: Optional[int] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Load a cached CSV file, parsing and caching it on a miss.
+
+        Arguments:
+            key: The cache key of the CSV file.
+            parse: Callable returning an iterator of the CSV file's parsed
+                DataFrame chunks, all columns included.
+            columns: If specified, the only columns to load.
+            chunksize: If specified, the number of rows per yielded
+                DataFrame when loading from the cache.
+
+        Returns:
+            An iterator of DataFrame chunks with contiguous indices.
+        """
+
+        path = self.path / f'{key}.arrow'
+        if path.exists():
+            yield from self._read(path, columns, chunksize)
+            return
+
+        for dataframe in self._write(path, parse()):
+            yield dataframe if columns is None else dataframe[columns]
+
+    def _read(
+        self,
+        path: pathlib.Path,
+        columns: Optional[List[str]],
+        chunksize: Optional[int],
+    ) -> Iterator[pd.DataFrame]:
+        """Reads DataFrame chunks from a memory-mapped cache file.
+
+        Arguments:
+            path: The cache file path.
+            columns: If specified, the only columns to load.
+            chunksize: If specified, the number of rows per DataFrame.
+        """
+
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        chunksize = chunksize or max(table.num_rows, 1)
+        for start in range(0, max(table.num_rows, 1), chunksize):
+            dataframe = table.slice(start, chunksize).to_pandas()
+            dataframe.index = pd.RangeIndex(start, start + len(dataframe))
+
+            # Arrow reads missing strings back as None, pandas.read_csv as NaN
+            for column in dataframe.columns[dataframe.dtypes == object]:
+                series = dataframe[column]
+                dataframe[column] = series.where(series.notna(), np.nan)
+
+            yield dataframe
+
+    def _write(
+        self,
+        path: pathlib.Path,
+        dataframes: Iterator[pd.DataFrame],
+    ) -> Iterator[pd.DataFrame]:
+        """Writes DataFrame chunks to a cache file as they pass through.
+
+        The cache file is only created once every chunk was written; chunks
+        that Arrow cannot convert to the first chunk's schema disable
+        caching for the file without interrupting the chunks.
+
+        Arguments:
+            path: The cache file path.
+            dataframes: The DataFrame chunks to cache.
+        """
+
+        tmp_path = path.with_suffix('.tmp')
+        writer = None
+        schema = None
+        caching = True
+        complete = False
+        try:
+            for dataframe in dataframes:
+                if caching:
+                    try:
+                        table = pa.Table.from_pandas(
+                            dataframe, schema=schema, preserve_index=False)
+                        if writer is None:
+                            schema = table.schema
+                            writer = pa.ipc.new_file(str(tmp_path), schema)
+                        writer.write_table(table)
+                    except (pa.ArrowInvalid, pa.ArrowTypeError) as exc:
+                        logger.warning('Not caching %s: %s', path.name, exc)
+                        caching = False
+                yield dataframe
+            complete = True
+        finally:
+            if writer is not None:
+                writer.close()
+            if caching and complete and writer is not None:
+                os.replace(tmp_path, path)
+            elif tmp_path.exists():
+                tmp_path.unlink()
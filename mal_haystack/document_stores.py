@@ -0,0 +1,630 @@
+"""Defines MAL Haystack custom document stores."""
+
+from collections import defaultdict
+from copy import deepcopy
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+import numpy as np
+from haystack import Document
+from haystack.document_stores import InMemoryDocumentStore
+from haystack.document_stores.filter_utils import LogicalFilterClause
+from haystack.nodes import BaseComponent
+
+from .batching import batched
+from .compact import ReviewTable
+from .embedding_matrix import EmbeddingMatrix
+
+
+def _equality_values(condition: Any) -> Optional[List[Hashable]]:
+    """Gets the values an equality filter condition matches.
+
+    Arguments:
+        condition: The filter condition for a single meta field, e.g.
+            ``{'$eq': 5}``, ``{'$in': [1, 2]}``, ``5`` or ``[1, 2]``.
+
+    Returns:
+        The matched values, or ``None`` if `condition` is not a hashable
+        ``$eq`` or ``$in`` condition.
+    """
+
+    if isinstance(condition, dict):
+        if len(condition) != 1:
+            return None
+        operator, value = next(iter(condition.items()))
+        if operator == '$eq':
+            values = [value]
+        elif operator == '$in' and isinstance(value, list):
+            values = value
+        else:
+            return None
+    elif isinstance(condition, list):
+        values = condition
+    else:
+        values = [condition]
+
+    if not all(isinstance(value, Hashable) for value in values):
+        return None
+
+    return values
+
+
+class IndexedInMemoryDocumentStore(InMemoryDocumentStore):
+    """In-memory document store with hash indexes on selected meta fields.
+
+    Filters with ``$eq`` or ``$in`` conditions on an indexed field look
+    candidate documents up in the field's hash index instead of scanning,
+    and copying, every document in the store. Any remaining conditions are
+    then evaluated on the candidates only.
+
+    With an `embedding_dtype`, document embeddings are moved out of the
+    documents into one contiguous
+    :class:`~mal_haystack.embedding_matrix.EmbeddingMatrix` per index, and
+    queries are scored with batched matrix products instead of one
+    embedding object per document.
+
+    Parameters:
+        indexed_fields: The meta fields to keep hash indexes on.
+        embedding_dtype: If specified, the precision to keep embeddings in
+            an embedding matrix with, one of ``'float32'``, ``'float16'``
+            or ``'int8'``. Requires cosine similarity. All other parameters
+            are passed to
+            :class:`~haystack.document_stores.InMemoryDocumentStore`.
+    """
+
+    def __init__(
+        self,
+        *args,
+        indexed_fields: Sequence[str] = ('index',),
+        embedding_dtype: Optional[str] = None,
+        **kwargs,
+    ):
+        """Constructor."""
+
+        super().__init__(*args, **kwargs)
+        self.indexed_fields = list(indexed_fields)
+        self.embedding_dtype = embedding_dtype
+        if embedding_dtype is not None and self.similarity != 'cosine':
+            raise ValueError('Embedding matrices require cosine similarity!')
+
+        # Maps index -> embedding matrix, with an embedding_dtype
+        self._matrices: Dict[str, EmbeddingMatrix] = {}
+
+        # Maps index -> field -> meta value -> document ids, with dicts used
+        # as insertion-ordered sets so results keep the store's order
+        self._meta_index = defaultdict(
+            lambda: defaultdict(lambda: defaultdict(dict)))
+        # Maps index -> document id -> indexed field values
+        self._indexed_values = defaultdict(dict)
+
+    def _index_document(self, index: str, document: Document):
+        """Adds `document` to the meta field indexes of `index`.
+
+        Arguments:
+            index: The name of the document index.
+            document: The stored document.
+        """
+
+        self._unindex_document(index, document.id)
+
+        values = {}
+        for field in self.indexed_fields:
+            value = document.meta.get(field)
+            if field in document.meta and isinstance(value, Hashable):
+                self._meta_index[index][field][value][document.id] = None
+                values[field] = value
+        self._indexed_values[index][document.id] = values
+
+    def _unindex_document(self, index: str, document_id: str):
+        """Removes a document from the meta field indexes of `index`.
+
+        Arguments:
+            index: The name of the document index.
+            document_id: The id of the document.
+        """
+
+        values = self._indexed_values[index].pop(document_id, {})
+        for field, value in values.items():
+            ids = self._meta_index[index][field][value]
+            ids.pop(document_id, None)
+            if not ids:
+                del self._meta_index[index][field][value]
+
+    def _rebuild_index(self, index: str):
+        """Rebuilds the meta field indexes of `index` from scratch.
+
+        Arguments:
+            index: The name of the document index.
+        """
+
+        self._meta_index.pop(index, None)
+        self._indexed_values.pop(index, None)
+        for document in self.indexes[index].values():
+            if isinstance(document, Document):
+                self._index_document(index, document)
+
+    def _candidate_ids(
+        self,
+        index: str,
+        filters: Dict[str, Any],
+    ) -> Optional[List[str]]:
+        """Gets ids of documents that may match `filters` using the indexes.
+
+        Arguments:
+            index: The name of the document index.
+            filters: The metadata filters.
+
+        Returns:
+            The candidate document ids, or ``None`` if no indexed field
+            condition could narrow down the search.
+        """
+
+        conditions = filters
+        if list(filters) == ['$and'] and isinstance(filters['$and'], dict):
+            conditions = filters['$and']
+
+        candidates = None
+        for field, condition in conditions.items():
+            if field not in self.indexed_fields:
+                continue
+            values = _equality_values(condition)
+            if values is None:
+                continue
+            field_index = self._meta_index[index][field]
+            ids = {}
+            for value in values:
+                ids.update(field_index.get(value, {}))
+            if candidates is not None:
+                ids = {id: None for id in candidates if id in ids}
+            candidates = ids
+
+        return None if candidates is None else list(candidates)
+
+    def _matrix(self, index: str) -> EmbeddingMatrix:
+        """Gets the embedding matrix of `index`, creating it if needed.
+
+        Arguments:
+            index: The name of the document index.
+
+        Returns:
+            The embedding matrix.
+        """
+
+        matrix = self._matrices.get(index)
+        if matrix is None:
+            matrix = self._matrices[index] = EmbeddingMatrix(
+                self.embedding_dim, dtype=self.embedding_dtype)
+        return matrix
+
+    def _move_embeddings(self, index: str, documents: List[Document]):
+        """Moves the embeddings of stored documents to the matrix of `index`.
+
+        Arguments:
+            index: The name of the document index.
+            documents: The stored documents.
+        """
+
+        embedded = [doc for doc in documents if doc.embedding is not None]
+        if embedded:
+            self._matrix(index).put(
+                [doc.id for doc in embedded],
+                [doc.embedding for doc in embedded],
+            )
+            for document in embedded:
+                document.embedding = None
+
+    def write_documents(
+        self,
+        documents: Union[List[dict], List[Document]],
+        index: Optional[str] = None,
+        **kwargs,
+    ):
+        """Indexes documents for later queries, indexing their meta fields.
+
+        Arguments:
+            documents: A list of Python dictionaries or a list of Haystack
+                Document objects.
+            index: The name of the index to write documents to.
+            kwargs: Passed to the base ``write_documents``.
+        """
+
+        index = index or self.index
+        field_map = self._create_document_field_map()
+        documents = [
+            Document.from_dict(doc, field_map=field_map)
+            if isinstance(doc, dict) else doc
+            for doc in documents
+        ]
+        super().write_documents(documents, index=index, **kwargs)
+
+        stored = self.indexes[index]
+        for document in documents:
+            if document.id in stored:
+                self._index_document(index, stored[document.id])
+
+        if self.embedding_dtype is not None:
+            self._move_embeddings(index, [
+                stored[doc.id] for doc in documents if doc.id in stored])
+
+    def update_embeddings(
+        self,
+        retriever: Any,
+        index: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        update_existing_embeddings: bool = True,
+        batch_size: int = 10_000,
+    ):
+        """Updates document embeddings with the retriever's model.
+
+        With an `embedding_dtype`, embeddings are written straight into the
+        embedding matrix of `index`.
+
+        Arguments:
+            retriever: The retriever to embed documents with.
+            index: The name of the document index.
+            filters: Optional filters narrowing the documents to embed.
+            update_existing_embeddings: Whether to update existing
+                embeddings, or only embed documents without embeddings.
+            batch_size: The number of documents to embed at a time.
+        """
+
+        if self.embedding_dtype is None:
+            return super().update_embeddings(
+                retriever,
+                index=index,
+                filters=filters,
+                update_existing_embeddings=update_existing_embeddings,
+                batch_size=batch_size,
+            )
+
+        index = index or self.index
+        documents = self._query(
+            index=index,
+            filters=filters,
+            return_embedding=False,
+            only_documents_without_embedding=not update_existing_embeddings,
+        )
+        matrix = self._matrix(index)
+        for batch in batched(documents, batch_size):
+            embeddings = retriever.embed_documents(batch)
+            matrix.put([doc.id for doc in batch], embeddings)
+
+    def get_embedding_count(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        index: Optional[str] = None,
+    ) -> int:
+        """Gets the number of documents with embeddings.
+
+        Arguments:
+            filters: Optional filters narrowing the documents to count.
+            index: The name of the document index.
+        """
+
+        if self.embedding_dtype is None:
+            return super().get_embedding_count(filters=filters, index=index)
+
+        index = index or self.index
+        matrix = self._matrix(index)
+        if not filters:
+            return len(matrix)
+        documents = self._query(index=index, filters=filters)
+        return sum(doc.id in matrix for doc in documents)
+
+    def query_by_embedding(
+        self,
+        query_emb: np.ndarray,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: int = 10,
+        index: Optional[str] = None,
+        return_embedding: Optional[bool] = None,
+        headers: Optional[Dict[str, str]] = None,
+        scale_score: bool = True,
+    ) -> List[Document]:
+        """Gets the documents most similar to a query embedding.
+
+        Arguments:
+            query_emb: The query embedding.
+            filters: Optional filters narrowing the documents to search.
+            top_k: The number of documents to return.
+            index: The name of the document index.
+            return_embedding: Whether to return document embeddings.
+            headers: Unsupported.
+            scale_score: Whether to scale scores to the unit interval.
+        """
+
+        if self.embedding_dtype is None:
+            return super().query_by_embedding(
+                query_emb,
+                filters=filters,
+                top_k=top_k,
+                index=index,
+                return_embedding=return_embedding,
+                headers=headers,
+                scale_score=scale_score,
+            )
+
+        return self.query_by_embedding_batch(
+            [query_emb],
+            filters=filters,
+            top_k=top_k,
+            index=index,
+            return_embedding=return_embedding,
+            headers=headers,
+            scale_score=scale_score,
+        )[0]
+
+    def query_by_embedding_batch(
+        self,
+        query_embs: Sequence[np.ndarray],
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: int = 10,
+        index: Optional[str] = None,
+        return_embedding: Optional[bool] = None,
+        headers: Optional[Dict[str, str]] = None,
+        scale_score: bool = True,
+    ) -> List[List[Document]]:
+        """Gets the documents most similar to each of many query embeddings.
+
+        With an `embedding_dtype`, all queries are scored against the
+        documents matching `filters` together, with one matrix product per
+        chunk of the embedding matrix.
+
+        Arguments:
+            query_embs: The query embeddings.
+            filters: Optional filters narrowing the documents to search,
+                applied to every query.
+            top_k: The number of documents to return per query.
+            index: The name of the document index.
+            return_embedding: Whether to return document embeddings.
+            headers: Unsupported.
+            scale_score: Whether to scale scores to the unit interval.
+
+        Returns:
+            The documents found for each query, most similar first.
+        """
+
+        if self.embedding_dtype is None:
+            return [
+                super(IndexedInMemoryDocumentStore, self).query_by_embedding(
+                    query_emb,
+                    filters=filters,
+                    top_k=top_k,
+                    index=index,
+                    return_embedding=return_embedding,
+                    headers=headers,
+                    scale_score=scale_score,
+                )
+                for query_emb in query_embs
+            ]
+
+        if headers:
+            raise NotImplementedError(
+                'IndexedInMemoryDocumentStore does not support headers.')
+
+        index = index or self.index
+        if return_embedding is None:
+            return_embedding = self.return_embedding
+        matrix = self._matrices.get(index)
+        if matrix is None or not len(query_embs):
+            return [[] for _ in query_embs]
+
+        rows = None
+        if filters:
+            candidates = self._query(index=index, filters=filters)
+            rows = matrix.rows(doc.id for doc in candidates)
+        found, scores = matrix.search(np.vstack(query_embs), top_k, rows)
+
+        stored = self.indexes[index]
+        results = []
+        for query_rows, query_scores in zip(found, scores):
+            documents = []
+            for row, score in zip(query_rows.tolist(), query_scores.tolist()):
+                id = matrix.ids[row]
+                document = Document(
+                    id=id,
+                    content=stored[id].content,
+                    meta=deepcopy(stored[id].meta),
+                    embedding=matrix.get(id) if return_embedding else None,
+                )
+                document.score = (
+                    self.scale_to_unit_interval(score, self.similarity)
+                    if scale_score else score)
+                documents.append(document)
+            results.append(documents)
+
+        return results
+
+    def update_document_meta(
+        self,
+        id: str,
+        meta: Dict[str, Any],
+        index: Optional[str] = None,
+    ):
+        """Updates the metadata dictionary of a document by specifying its
+        string id, reindexing its meta fields.
+
+        Arguments:
+            id: The id of the document.
+            meta: The new metadata.
+            index: The name of the document index.
+        """
+
+        index = index or self.index
+        super().update_document_meta(id, meta, index=index)
+        self._index_document(index, self.indexes[index][id])
+
+    def delete_documents(self, index: Optional[str] = None, **kwargs):
+        """Deletes documents, then rebuilds the meta field indexes.
+
+        Arguments:
+            index: The name of the document index.
+            kwargs: Passed to the base ``delete_documents``.
+        """
+
+        index = index or self.index
+        super().delete_documents(index=index, **kwargs)
+        self._rebuild_index(index)
+        if index in self._matrices:
+            self._matrices[index].retain(self.indexes[index])
+
+    def delete_index(self, index: str):
+        """Deletes an existing index and its meta field indexes.
+
+        Arguments:
+            index: The name of the index to delete.
+        """
+
+        super().delete_index(index)
+        self._meta_index.pop(index, None)
+        self._indexed_values.pop(index, None)
+        self._matrices.pop(index, None)
+
+    def _query(
+        self,
+        index: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        return_embedding: Optional[bool] = None,
+        only_documents_without_embedding: bool = False,
+        **kwargs,
+    ) -> List[Document]:
+        """Gets documents matching `filters`, using meta field indexes where
+        possible.
+
+        Arguments:
+            index: The name of the document index.
+            filters: Optional metadata filters.
+            return_embedding: Whether to return document embeddings.
+            only_documents_without_embedding: Whether to only return
+                documents without embeddings.
+            kwargs: Passed to the base implementation when the meta field
+                indexes cannot be used.
+        """
+
+        index = index or self.index
+        candidates = None
+        if filters:
+            candidates = self._candidate_ids(index, filters)
+
+        if candidates is None:
+            documents = super()._query(
+                index=index,
+                filters=filters,
+                return_embedding=return_embedding,
+                only_documents_without_embedding=(
+                    only_documents_without_embedding),
+                **kwargs,
+            )
+        else:
+            stored = self.indexes[index]
+            documents = deepcopy(
+                [stored[id] for id in candidates if id in stored])
+
+            if return_embedding is None:
+                return_embedding = self.return_embedding
+            if return_embedding is False:
+                for document in documents:
+                    document.embedding = None
+            if only_documents_without_embedding:
+                documents = [doc for doc in documents if doc.embedding is None]
+
+            parsed_filter = LogicalFilterClause.parse(filters)
+            documents = [
+                doc for doc in documents if parsed_filter.evaluate(doc.meta)]
+
+        # Stored documents hold no embeddings when kept in a matrix
+        matrix = self._matrices.get(index)
+        if matrix is not None:
+            if only_documents_without_embedding:
+                documents = [doc for doc in documents if doc.id not in matrix]
+            if return_embedding or (
+                    return_embedding is None and self.return_embedding):
+                for document in documents:
+                    document.embedding = matrix.get(document.id)
+
+        return documents
+
+
+class CompactDocumentStore(BaseComponent):
+    """Append-only document store holding documents in a compact table.
+
+    Documents written to the store are kept as rows of a
+    :class:`~mal_haystack.compact.ReviewTable` rather than as documents,
+    and documents are only created again as the store is iterated. The
+    store keeps neither ids nor embeddings and cannot be queried, so it
+    suits reading every document directly, without a retriever.
+    """
+
+    outgoing_edges = 1
+
+    def __init__(self):
+        """Constructor."""
+
+        self.table = ReviewTable()
+
+    def write_documents(
+        self,
+        documents: Union[List[dict], List[Document]],
+        index: Optional[str] = None,
+        **kwargs,
+    ):
+        """Appends documents to the table.
+
+        Arguments:
+            documents: A list of Python dictionaries or a list of Haystack
+                Document objects.
+            index: Unused; the store has a single index.
+            kwargs: Unused.
+        """
+
+        self.table.extend(
+            Document.from_dict(doc) if isinstance(doc, dict) else doc
+            for doc in documents
+        )
+
+    def get_document_count(self, **kwargs) -> int:
+        """Gets the number of documents in the store.
+
+        Arguments:
+            kwargs: Unused.
+        """
+
+        return len(self.table)
+
+    def get_all_documents_generator(
+        self,
+        return_embedding: Optional[bool] = None,
+        **kwargs,
+    ) -> Iterator[Document]:
+        """Gets documents in the order they were written, one at a time.
+
+        Arguments:
+            return_embedding: Unused; the store keeps no embeddings.
+            kwargs: Unused.
+        """
+
+        if return_embedding:
+            raise ValueError('CompactDocumentStore keeps no embeddings!')
+
+        return self.table.documents()
+
+    def run(self, documents: List[Document], **kwargs):
+        """Appends documents to the table in a pipeline.
+
+        Arguments:
+            documents: The documents to write.
+            kwargs: Unused.
+        """
+
+        self.write_documents(documents)
+        return {}, 'output_1'
+
+    run_batch = run
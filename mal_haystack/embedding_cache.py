@@ -0,0 +1,228 @@
+"""Defines the MAL Haystack persistent document embedding cache."""
+
+import hashlib
+import json
+import os
+import pathlib
+import sys
+from typing import List, Literal, Optional, Sequence
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """On-disk cache of document embeddings keyed by content hash.
+
+    Embeddings for one model are stored as rows of a single memory-mapped
+    ``embeddings.npy`` array, alongside an ``index.json`` id index mapping
+    content hashes to rows. Each model gets its own cache subdirectory.
+
+    The id index is rewritten every `flush_every` cached embeddings and by
+    :meth:`flush`, which callers should call once done. Rows evicted since
+    the index was last written are not reused until it is written again,
+    so that the index on disk never maps content to another's embedding.
+
+    Parameters:
+        cache_dir: The directory to store caches in.
+        model_name: The name of the model the embeddings are computed with.
+        max_entries: If specified, the maximum number of embeddings to keep.
+            Entries beyond this limit are evicted according to `eviction`.
+        eviction: The eviction policy, either ``'lru'`` to evict the least
+            recently used entries or ``'fifo'`` to evict the oldest entries.
+        flush_every: The number of embeddings to cache between writes of
+            the id index.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | pathlib.Path,
+        model_name: str,
+        max_entries: Optional[int] = None,
+        eviction: Literal['lru', 'fifo'] = 'lru',
+        flush_every: int = 1024,
+    ):
+        """Constructor."""
+
+        if eviction not in ('lru', 'fifo'):
+            raise ValueError(f'Unknown eviction policy: {eviction}')
+        if max_entries is not None and max_entries < 1:
+            raise ValueError('`max_entries` must be positive!')
+        if flush_every < 1:
+            raise ValueError('`flush_every` must be positive!')
+
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.eviction = eviction
+        self.flush_every = flush_every
+        self.path = pathlib.Path(cache_dir) / model_name.replace('/', '--')
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._array_path = self.path / 'embeddings.npy'
+        self._index_path = self.path / 'index.json'
+
+        # Maps content hashes to [row, tick] pairs
+        self._rows = {}
+        self._tick = 0
+
+        # Rows evicted and embeddings cached since the index was written
+        self._freed = set()
+        self._unflushed_count = 0
+        self._array = None
+        if self._index_path.exists() and self._array_path.exists():
+            with open(self._index_path) as indexfile:
+                index = json.load(indexfile)
+            if index['model_name'] != model_name:
+                raise ValueError(
+                    f'Cache at {self.path} is for model {index["model_name"]}')
+            self._rows = index['rows']
+            self._tick = index['tick']
+            self._array = np.load(self._array_path, mmap_mode='r+')
+
+    def __len__(self) -> int:
+        """Gets the number of cached embeddings."""
+
+        return len(self._rows)
+
+    @staticmethod
+    def key(content: str) -> str:
+        """Gets the cache key for document `content`.
+
+        Arguments:
+            content: The document content.
+
+        Returns:
+            The content hash.
+        """
+
+        return hashlib.sha256(str(content).encode('utf-8')).hexdigest()
+
+    def get(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Gets cached embeddings.
+
+        Arguments:
+            keys: The content hashes to get embeddings for.
+
+        Returns:
+            The embedding for each key, or ``None`` if not cached.
+        """
+
+        embeddings = []
+        for key in keys:
+            entry = self._rows.get(key)
+            if entry is None:
+                embeddings.append(None)
+                continue
+            if self.eviction == 'lru':
+                self._tick += 1
+                entry[1] = self._tick
+            embeddings.append(np.array(self._array[entry[0]]))
+
+        return embeddings
+
+    def put(self, keys: Sequence[str], embeddings: np.ndarray):
+        """Caches embeddings, writing the id index every `flush_every` ones.
+
+        Arguments:
+            keys: The content hashes of the embedded documents.
+            embeddings: The embeddings, one row per key.
+        """
+
+        new = {}
+        for key, embedding in zip(keys, embeddings):
+            if key in self._rows:
+                self._array[self._rows[key][0]] = embedding
+            else:
+                new[key] = embedding
+        new = list(new.items())
+
+        if self.max_entries is not None:
+            new = new[-self.max_entries:]
+            self._evict(len(self._rows) + len(new) - self.max_entries)
+
+        if new:
+            # Evicted rows are reused once the index no longer maps them
+            size = len(self._rows) + len(new)
+            if size + len(self._freed) > self._capacity():
+                self.flush()
+            self._reserve(size + len(self._freed), embeddings.shape[1])
+            used = {row for row, _ in self._rows.values()} | self._freed
+            free = (row for row in range(len(self._array)) if row not in used)
+            for (key, embedding), row in zip(new, free):
+                self._tick += 1
+                self._rows[key] = [row, self._tick]
+                self._array[row] = embedding
+
+        self._unflushed_count += len(embeddings)
+        if self._unflushed_count >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Writes the cached embeddings and id index to disk."""
+
+        if self._array is None:
+            return
+
+        self._array.flush()
+        index = {
+            'model_name': self.model_name,
+            'tick': self._tick,
+            'rows': self._rows,
+        }
+        tmp_path = self._index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as indexfile:
+            json.dump(index, indexfile)
+        os.replace(tmp_path, self._index_path)
+        self._freed.clear()
+        self._unflushed_count = 0
+
+    def _evict(self, count: int):
+        """Evicts `count` entries according to the eviction policy.
+
+        Arguments:
+            count: The number of entries to evict.
+        """
+
+        if count <= 0:
+            return
+
+        # Both policies evict the lowest ticks; only LRU refreshes on reads
+        oldest = sorted(self._rows, key=lambda key: self._rows[key][1])
+        for key in oldest[:count]:
+            self._freed.add(self._rows.pop(key)[0])
+
+    def _capacity(self) -> int:
+        """Gets the maximum number of rows of the array.
+
+        Returns:
+            The row limit, leaving room beyond `max_entries` for rows
+            evicted between index writes.
+        """
+
+        if self.max_entries is None:
+            return sys.maxsize
+        return self.max_entries + self.flush_every
+
+    def _reserve(self, size: int, dim: int):
+        """Grows the memory-mapped array to hold at least `size` rows.
+
+        Arguments:
+            size: The number of rows required.
+            dim: The embedding dimension.
+        """
+
+        if self._array is not None and len(self._array) >= size:
+            return
+
+        current = len(self._array) if self._array is not None else 0
+        capacity = min(max(size, 2 * current, 1024), self._capacity())
+
+        tmp_path = self.path / 'embeddings.tmp.npy'
+        array = np.lib.format.open_memmap(
+            tmp_path, mode='w+', dtype=np.float32, shape=(capacity, dim))
+        if self._array is not None:
+            array[:len(self._array)] = self._array
+        array.flush()
+        del array
+        self._array = None
+        os.replace(tmp_path, self._array_path)
+        self._array = np.load(self._array_path, mmap_mode='r+')
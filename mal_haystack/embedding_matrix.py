@@ -0,0 +1,258 @@
+"""Defines the MAL Haystack reduced-precision embedding matrix."""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+#: The supported storage precisions
+DTYPES = ('float32', 'float16', 'int8')
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    """Scales embeddings to unit length in float32.
+
+    Arguments:
+        embeddings: The embeddings, one per row.
+
+    Returns:
+        The normalized embeddings.
+    """
+
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+def recall_at_k(found: np.ndarray, expected: np.ndarray) -> float:
+    """Gets the fraction of expected top-k results found.
+
+    Arguments:
+        found: The top-k result rows found per query.
+        expected: The exact top-k result rows per query.
+
+    Returns:
+        The mean fraction of each query's expected rows that were found.
+    """
+
+    if not len(expected):
+        return 1.0
+    return float(np.mean([
+        len(np.intersect1d(row, expected_row)) / max(len(expected_row), 1)
+        for row, expected_row in zip(found, expected)
+    ]))
+
+
+class EmbeddingMatrix:
+    """Contiguous matrix of unit length embeddings in reduced precision.
+
+    Embeddings are normalized and stored as rows of a single matrix, in
+    float16 by default, halving the memory of float32, or in int8 with a
+    float32 scale per row, quartering it. Cosine similarities of many
+    queries are scored with one matrix product per chunk of rows, computed
+    in float32, and the top-k rows of each query are kept as chunks are
+    scored, so that memory stays bounded by `chunk_rows`.
+
+    Parameters:
+        dim: The embedding dimension.
+        dtype: The storage precision, one of :data:`DTYPES`.
+        chunk_rows: The number of rows to score at a time.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        dtype: str = 'float16',
+        chunk_rows: int = 65_536,
+    ):
+        """Constructor."""
+
+        if dtype not in DTYPES:
+            raise ValueError(f'Unknown embedding dtype: {dtype}')
+        if chunk_rows < 1:
+            raise ValueError('`chunk_rows` must be positive!')
+
+        self.dim = dim
+        self.dtype = dtype
+        self.chunk_rows = chunk_rows
+
+        self._matrix = np.empty((0, dim), dtype=dtype)
+        self._scales = np.empty(0, dtype=np.float32)
+
+        # Maps ids to rows, and rows to ids
+        self._rows: Dict[str, int] = {}
+        self.ids: List[str] = []
+
+    def __len__(self) -> int:
+        """Gets the number of embeddings."""
+
+        return len(self.ids)
+
+    def __contains__(self, id: str) -> bool:
+        """Checks whether an embedding of `id` is stored."""
+
+        return id in self._rows
+
+    @property
+    def nbytes(self) -> int:
+        """Gets the number of bytes the stored embeddings take."""
+
+        size = self._matrix[:len(self)].nbytes
+        if self.dtype == 'int8':
+            size += self._scales[:len(self)].nbytes
+        return size
+
+    def _reserve(self, count: int):
+        """Grows the matrix, doubling it, to hold at least `count` rows."""
+
+        capacity = len(self._matrix)
+        if count <= capacity:
+            return
+
+        matrix = np.empty(
+            (max(count, 2 * capacity, 1024), self.dim), dtype=self.dtype)
+        matrix[:capacity] = self._matrix
+        scales = np.empty(len(matrix), dtype=np.float32)
+        scales[:capacity] = self._scales
+        self._matrix, self._scales = matrix, scales
+
+    def _encode(self, embeddings: np.ndarray, rows: np.ndarray):
+        """Stores normalized float32 `embeddings` in `rows`."""
+
+        if self.dtype == 'int8':
+            scales = np.abs(embeddings).max(axis=1) / 127
+            scales = np.maximum(scales, np.finfo(np.float32).tiny)
+            self._matrix[rows] = np.rint(embeddings / scales[:, None])
+            self._scales[rows] = scales
+        else:
+            self._matrix[rows] = embeddings
+
+    def _decode(self, start: int, stop: int) -> np.ndarray:
+        """Gets rows `start` to `stop` as float32."""
+
+        chunk = self._matrix[start:stop].astype(np.float32)
+        if self.dtype == 'int8':
+            chunk *= self._scales[start:stop, None]
+        return chunk
+
+    def put(self, ids: Sequence[str], embeddings: Iterable[np.ndarray]):
+        """Stores embeddings, replacing any stored for the same ids.
+
+        Arguments:
+            ids: The ids of the embeddings.
+            embeddings: The embeddings, one per id.
+        """
+
+        embeddings = normalize(np.vstack(list(embeddings)))
+        if embeddings.shape != (len(ids), self.dim):
+            raise ValueError(
+                f'Expected {len(ids)} embeddings of dimension {self.dim}, '
+                f'got {embeddings.shape}')
+
+        rows = np.empty(len(ids), dtype=np.int64)
+        for num, id in enumerate(ids):
+            row = self._rows.get(id)
+            if row is None:
+                row = self._rows[id] = len(self.ids)
+                self.ids.append(id)
+            rows[num] = row
+
+        self._reserve(len(self.ids))
+        self._encode(embeddings, rows)
+
+    def get(self, id: str) -> Optional[np.ndarray]:
+        """Gets the float32 embedding of `id`.
+
+        Arguments:
+            id: The id of the embedding.
+
+        Returns:
+            The normalized embedding, or ``None`` if not stored.
+        """
+
+        row = self._rows.get(id)
+        if row is None:
+            return None
+        return self._decode(row, row + 1)[0]
+
+    def rows(self, ids: Iterable[str]) -> np.ndarray:
+        """Gets the rows of the stored embeddings of `ids`.
+
+        Arguments:
+            ids: The ids to look up; ids without embeddings are skipped.
+
+        Returns:
+            The rows, in the order of `ids`.
+        """
+
+        rows = [self._rows[id] for id in ids if id in self._rows]
+        return np.asarray(rows, dtype=np.int64)
+
+    def retain(self, ids: Iterable[str]):
+        """Drops all embeddings but those of `ids`, compacting the matrix.
+
+        Arguments:
+            ids: The ids of the embeddings to keep.
+        """
+
+        kept = [id for id in dict.fromkeys(ids) if id in self._rows]
+        rows = self.rows(kept)
+        self._matrix = self._matrix[rows]
+        self._scales = self._scales[rows]
+        self._rows = {id: row for row, id in enumerate(kept)}
+        self.ids = kept
+
+    def search(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        rows: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Finds the rows most cosine similar to each query.
+
+        Arguments:
+            queries: The query embeddings, one per row.
+            top_k: The number of rows to find per query.
+            rows: If specified, the only rows to search.
+
+        Returns:
+            The rows found for each query, most similar first, and their
+            cosine similarities, each of shape ``(len(queries), k)`` where
+            ``k`` is `top_k` or the number of rows searched if fewer.
+        """
+
+        queries = normalize(np.atleast_2d(queries))
+        total = len(self) if rows is None else len(rows)
+        top_k = min(top_k, total)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        if top_k < 1:
+            return best_rows, best_scores
+
+        for start in range(0, total, self.chunk_rows):
+            stop = min(start + self.chunk_rows, total)
+            if rows is None:
+                chunk_rows = np.arange(start, stop)
+                chunk = self._decode(start, stop)
+            else:
+                chunk_rows = rows[start:stop]
+                chunk = self._matrix[chunk_rows].astype(np.float32)
+                if self.dtype == 'int8':
+                    chunk *= self._scales[chunk_rows, None]
+
+            # Merge this chunk's scores with the best found so far
+            scores = np.hstack([best_scores, queries @ chunk.T])
+            candidates = np.hstack([
+                best_rows,
+                np.broadcast_to(chunk_rows, (len(queries), len(chunk_rows))),
+            ])
+            if scores.shape[1] > top_k:
+                top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                candidates = np.take_along_axis(candidates, top, axis=1)
+            best_rows, best_scores = candidates, scores
+
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        return (
+            np.take_along_axis(best_rows, order, axis=1),
+            np.take_along_axis(best_scores, order, axis=1),
+        )
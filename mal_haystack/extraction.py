@@ -0,0 +1,329 @@
+"""Defines MAL Haystack query answer extraction loops."""
+
+from __future__ import annotations
+
+import itertools
+import logging
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from .batching import batched
+
+if TYPE_CHECKING:
+    from haystack import Answer, Document
+    from haystack.nodes.reader import BaseReader
+    from haystack.nodes.retriever import BaseRetriever
+    from haystack.pipelines import ExtractiveQAPipeline
+
+    from .answer_cache import AnswerCache
+    from .gating import SimilarityGate
+
+
+def group_passages(
+    documents: Iterable[Document],
+    index_key: str = 'index',
+) -> Iterator[List[Document]]:
+    """Groups consecutive passages of the same document together.
+
+    Documents split by :class:`~mal_haystack.nodes.PassageSplitter` are
+    stored as consecutive passages sharing their document's `index_key`
+    meta field. Unsplit documents form groups of one passage.
+
+    Arguments:
+        documents: The stored documents or passages, in stored order.
+        index_key: The meta field uniquely identifying each document.
+
+    Returns:
+        An iterator of the passages of each document.
+    """
+
+    for _, passages in itertools.groupby(
+        documents,
+        key=lambda document: document.meta[index_key],
+    ):
+        yield list(passages)
+
+
+def add_answers(
+    metadata: Dict[str, Any],
+    queries: List[str],
+    answers: List[Optional[List[Answer]]],
+    logger: logging.Logger,
+    skipped: Optional[Set[str]] = None,
+) -> Dict[str, Any]:
+    """Adds the top answer for each query to a document's metadata.
+
+    Arguments:
+        metadata: The document metadata to add answers to.
+        queries: The queries answered.
+        answers: The answers to each query, best first.
+        logger: The main logger.
+        skipped: If specified, the queries not read for the document, each
+            query's skipped flag being added to the metadata.
+
+    Returns:
+        The updated metadata.
+    """
+
+    for idx, (query, query_answers) in enumerate(zip(queries, answers)):
+        metadata[f'Q{idx + 1}'] = query
+        if skipped is not None:
+            metadata[f'Q{idx + 1} skipped'] = query in skipped
+        if query_answers is None or len(query_answers) == 0:
+            if skipped is None or query not in skipped:
+                logger.warning('No answers for document: %s', metadata)
+            metadata[f'Q{idx + 1} answer'] = ''
+            metadata[f'Q{idx + 1} score'] = 0.0
+            metadata[f'Q{idx + 1} context'] = ''
+        else:
+            metadata[f'Q{idx + 1} answer'] = query_answers[0].answer
+            metadata[f'Q{idx + 1} score'] = query_answers[0].score
+            metadata[f'Q{idx + 1} context'] = query_answers[0].context
+
+    return metadata
+
+
+def cached_answers(
+    answer_cache: Optional[AnswerCache],
+    documents: List[List[Document]],
+    queries: List[str],
+) -> Tuple[List[str], Dict[Tuple[int, str], List[Answer]]]:
+    """Looks up cached answers for every pair of `documents` and `queries`.
+
+    Arguments:
+        answer_cache: The answer cache, if any.
+        documents: The passages of each document to look up answers for.
+        queries: The queries to look up answers for.
+
+    Returns:
+        The content hash of each document, or an empty list without a cache,
+        and the cached answers keyed by (document number, query).
+    """
+
+    if answer_cache is None:
+        return [], {}
+
+    # Split documents are keyed by their passages, so that answers read
+    # with other passage sizes are not reused
+    keys = [
+        answer_cache.key('\n\n'.join(
+            str(passage.content) for passage in passages))
+        for passages in documents
+    ]
+    cached = answer_cache.get(keys, queries)
+    return keys, {
+        (num, query): cached[key, query]
+        for num, key in enumerate(keys)
+        for query in queries
+        if (key, query) in cached
+    }
+
+
+def retrieve_and_read(
+    query_pipeline: ExtractiveQAPipeline,
+    documents: Iterable[Document],
+    queries: Optional[List[str]],
+    logger: logging.Logger,
+    answer_cache: Optional[AnswerCache] = None,
+    gate: Optional[SimilarityGate] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Extracts metadata by querying the pipeline once per document.
+
+    The retriever is filtered to the document's passages, so the best
+    answer across all of them is extracted. With a similarity `gate`,
+    queries too dissimilar to a document are not read, and are answered
+    with empty answers flagged as skipped instead.
+
+    Arguments:
+        query_pipeline: The extractive QA pipeline to query.
+        documents: The documents or passages to extract metadata from, in
+            stored order.
+        queries: The queries to answer per document.
+        logger: The main logger.
+        answer_cache: If specified, the cache to look answers up in before
+            querying the pipeline, and to add new answers to.
+        gate: If specified, the gate to screen uncached queries with. The
+            documents must be given with their embeddings.
+
+    Returns:
+        An iterator of metadata records, one per document.
+    """
+
+    for passages in group_passages(documents):
+        metadata = passages[0].meta.copy()
+
+        # Get QA metadata, querying only for answers not already cached
+        if queries:
+            keys, answers = cached_answers(
+                answer_cache, [passages], queries)
+            pending = [query for query in queries if (0, query) not in answers]
+
+            # Skipped answers are not cached, so other thresholds read them
+            skipped = None
+            if gate is not None:
+                similarities, skipped = gate.screen(passages, pending)
+                for query in skipped:
+                    answers[0, query] = []
+                pending = [query for query in pending if query not in skipped]
+
+            if pending:
+                filters = {'index': {'$eq': metadata['index']}}
+                result = query_pipeline.run_batch(pending, params={
+                    'Retriever': {'filters': filters},
+                })
+                for query, query_answers in zip(pending, result['answers']):
+                    answers[0, query] = query_answers
+                if answer_cache is not None:
+                    answer_cache.put(
+                        (keys[0], query, answers[0, query])
+                        for query in pending)
+
+            if gate is not None:
+                gate.observe(similarities, {
+                    query: answers[0, query]
+                    for query in queries
+                    if query not in skipped
+                })
+
+            add_answers(
+                metadata,
+                queries,
+                [answers[0, query] for query in queries],
+                logger,
+                skipped=skipped,
+            )
+
+        yield metadata
+
+
+def read_directly(
+    reader: BaseReader,
+    documents: Iterable[Document],
+    queries: Optional[List[str]],
+    batch_size: int,
+    logger: logging.Logger,
+    answer_cache: Optional[AnswerCache] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Extracts metadata by reading documents without a retriever.
+
+    Each batch of `batch_size` documents is read against every query in a
+    single :meth:`~haystack.nodes.reader.BaseReader.predict_batch` call,
+    each document's passages together so that the best answer across all
+    of them is extracted.
+
+    Arguments:
+        reader: The reader to extract answers with.
+        documents: The documents or passages to extract metadata from, in
+            stored order.
+        queries: The queries to answer per document.
+        batch_size: The number of documents to read per reader call.
+        logger: The main logger.
+        answer_cache: If specified, the cache to look answers up in before
+            reading, and to add new answers to.
+
+    Returns:
+        An iterator of metadata records, one per document.
+    """
+
+    def read(batch: List[List[Document]]) -> List[Dict[str, Any]]:
+        """Reads a batch of documents, returning their metadata records."""
+
+        if queries:
+            keys, answers = cached_answers(answer_cache, batch, queries)
+            pending = [
+                (num, query)
+                for num in range(len(batch))
+                for query in queries
+                if (num, query) not in answers
+            ]
+            if pending:
+                # One list of passages per (document, query) pair
+                result = reader.predict_batch(
+                    queries=[query for _, query in pending],
+                    documents=[batch[num] for num, _ in pending],
+                    top_k=1,
+                )
+                answers.update(zip(pending, result['answers']))
+                if answer_cache is not None:
+                    answer_cache.put(
+                        (keys[num], query, answers[num, query])
+                        for num, query in pending)
+
+        records = []
+        for num, passages in enumerate(batch):
+            metadata = passages[0].meta.copy()
+            if queries:
+                add_answers(
+                    metadata,
+                    queries,
+                    [answers[num, query] for query in queries],
+                    logger,
+                )
+            records.append(metadata)
+        return records
+
+    for batch in batched(group_passages(documents), batch_size):
+        yield from read(batch)
+
+
+def search_corpus(
+    retriever: BaseRetriever,
+    reader: BaseReader,
+    queries: List[str],
+    top_k: int,
+    logger: logging.Logger,
+) -> Iterator[Dict[str, Any]]:
+    """Extracts answers to queries across the whole corpus.
+
+    Each query retrieves its `top_k` most similar passages from every
+    document, and each retrieved document's passages are read together,
+    so that its best answer is extracted. Documents are then ranked by the
+    score of their answers, with the query and answer added to their
+    metadata as by :func:`add_answers`.
+
+    Arguments:
+        retriever: The retriever to search the corpus with.
+        reader: The reader to extract answers with.
+        queries: The queries to answer across the corpus.
+        top_k: The number of passages to retrieve per query.
+        logger: The main logger.
+
+    Returns:
+        An iterator of search records, one per query and document found,
+        query by query.
+    """
+
+    retrieved = retriever.retrieve_batch(queries=queries, top_k=top_k)
+    for query, passages in zip(queries, retrieved):
+        if not passages:
+            logger.warning('No documents found for query: %s', query)
+            continue
+
+        # Passages of a document are read together, in order of similarity
+        documents: Dict[Any, List[Document]] = {}
+        for passage in passages:
+            documents.setdefault(passage.meta['index'], []).append(passage)
+        result = reader.predict_batch(
+            queries=[query] * len(documents),
+            documents=list(documents.values()),
+            top_k=1,
+        )
+
+        records = []
+        for group, answers in zip(documents.values(), result['answers']):
+            record = group[0].meta.copy()
+            record['similarity'] = group[0].score
+            add_answers(record, [query], [answers], logger)
+            records.append(record)
+        records.sort(key=lambda record: -record['Q1 score'])
+        for rank, record in enumerate(records):
+            yield {'rank': rank + 1, **record}
@@ -0,0 +1,205 @@
+"""Defines MAL Haystack similarity-gated reading."""
+
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+#: The similarity thresholds calibration reports are computed for
+CALIBRATION_THRESHOLDS = tuple(np.round(np.arange(0.0, 0.55, 0.05), 2))
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    """Scales embeddings to unit length.
+
+    Arguments:
+        embeddings: The embeddings, one per row.
+
+    Returns:
+        The normalized embeddings.
+    """
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+class SimilarityGate:
+    """Skips reading query and document pairs of low embedding similarity.
+
+    Each query is scored against a document by the highest cosine
+    similarity between its embedding and the document's passage
+    embeddings, as already computed by the retriever. Pairs scoring below
+    `threshold` are not read, and are answered with an empty, skipped
+    answer instead.
+
+    To choose a threshold, the gate can `calibrate` instead: every pair is
+    read, and the similarity and top answer score of each are recorded, so
+    that :meth:`report` shows the fraction of reader calls each candidate
+    threshold would skip and the fraction of confident answers it would
+    keep.
+
+    Parameters:
+        queries: The queries to screen.
+        query_embeddings: The embedding of each query, one per row.
+        threshold: The similarity below which pairs are skipped.
+        calibrate: Whether to read every pair, recording similarities and
+            answer scores for calibration, instead of skipping any.
+        min_score: The reader score from which an answer counts as found
+            when calibrating.
+    """
+
+    def __init__(
+        self,
+        queries: Sequence[str],
+        query_embeddings: Any,
+        threshold: float,
+        calibrate: bool = False,
+        min_score: float = 0.5,
+    ):
+        """Constructor."""
+
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        if len(query_embeddings) != len(queries):
+            raise ValueError('Expected one embedding per query!')
+
+        self.queries = list(queries)
+        self.threshold = threshold
+        self.calibrate = calibrate
+        self.min_score = min_score
+        self._embeddings = _normalize(query_embeddings)
+
+        self.pair_count = 0
+        self.skipped_count = 0
+
+        # The (similarity, top answer score) of each pair read to calibrate
+        self._observations: List[Tuple[float, float]] = []
+
+    @classmethod
+    def from_retriever(
+        cls,
+        retriever: Any,
+        queries: Sequence[str],
+        threshold: float,
+        **kwargs,
+    ) -> 'SimilarityGate':
+        """Creates a gate embedding its queries with `retriever`.
+
+        Arguments:
+            retriever: The embedding retriever documents were embedded with.
+            queries: The queries to screen.
+            threshold: The similarity below which pairs are skipped.
+            kwargs: Further keyword arguments of the gate.
+
+        Returns:
+            The similarity gate.
+        """
+
+        embeddings = retriever.embed_queries(list(queries))
+        return cls(queries, np.vstack(embeddings), threshold, **kwargs)
+
+    def similarities(self, passages: Sequence[Any]) -> Dict[str, float]:
+        """Scores each query against a document.
+
+        Arguments:
+            passages: The document's passages, with their embeddings.
+
+        Returns:
+            The highest cosine similarity of each query to any passage.
+        """
+
+        if any(passage.embedding is None for passage in passages):
+            raise ValueError(
+                'Similarity gating requires stored document embeddings!')
+
+        embeddings = _normalize(np.vstack(
+            [passage.embedding for passage in passages]).astype(np.float32))
+        scores = (self._embeddings @ embeddings.T).max(axis=1)
+        return dict(zip(self.queries, scores.tolist()))
+
+    def screen(
+        self,
+        passages: Sequence[Any],
+        queries: Sequence[str],
+    ) -> Tuple[Dict[str, float], Set[str]]:
+        """Gets the queries not worth reading against a document.
+
+        Arguments:
+            passages: The document's passages, with their embeddings.
+            queries: The queries about to be read.
+
+        Returns:
+            The similarity of each of `queries` to the document, and the set
+            of queries to skip, always empty when calibrating.
+        """
+
+        similarities = self.similarities(passages)
+        skipped: Set[str] = set()
+        if not self.calibrate:
+            skipped = {
+                query for query in queries
+                if similarities[query] < self.threshold
+            }
+
+        self.pair_count += len(queries)
+        self.skipped_count += len(skipped)
+        return similarities, skipped
+
+    def observe(
+        self,
+        similarities: Dict[str, float],
+        answers: Dict[str, Optional[List[Any]]],
+    ):
+        """Records the top answer scores of pairs read, when calibrating.
+
+        Arguments:
+            similarities: The similarity of each query to the document.
+            answers: The answers read for each query, best first.
+        """
+
+        if not self.calibrate:
+            return
+
+        for query, query_answers in answers.items():
+            score = query_answers[0].score if query_answers else 0.0
+            self._observations.append((similarities[query], score))
+
+    def report(
+        self,
+        thresholds: Sequence[float] = CALIBRATION_THRESHOLDS,
+    ) -> Dict[str, Any]:
+        """Reports the reader calls skipped and, when calibrating, recall.
+
+        Arguments:
+            thresholds: The candidate thresholds to calibrate.
+
+        Returns:
+            The ``threshold``, the number of ``pairs`` screened and
+            ``skipped``, and when calibrating, the ``calibration`` of each
+            candidate threshold: the fraction of pairs it would skip and
+            the ``recall`` of answers scoring at least ``min_score``.
+        """
+
+        report: Dict[str, Any] = {
+            'threshold': self.threshold,
+            'pairs': self.pair_count,
+            'skipped': self.skipped_count,
+            'skipped_fraction': self.skipped_count / max(self.pair_count, 1),
+        }
+        if not self.calibrate:
+            return report
+
+        observations = np.asarray(self._observations, dtype=float)
+        similarity, score = observations.reshape(-1, 2).T
+        found = score >= self.min_score
+        report['min_score'] = self.min_score
+        report['calibration'] = [
+            {
+                'threshold': float(threshold),
+                'skipped_fraction': float(
+                    np.sum(similarity < threshold) / max(len(similarity), 1)),
+                'recall': float(
+                    np.sum(found & (similarity >= threshold)) / np.sum(found)
+                    if found.any() else 1.0),
+            }
+            for threshold in thresholds
+        ]
+        return report
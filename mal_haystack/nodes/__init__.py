@@ -1,17 +1,60 @@
-"""MAL Haystack custom pipeline nodes."""
+"""MAL Haystack custom pipeline nodes.
 
-from .dataframe_converter import DataFrameConverter
-from .dataframer import DataFramer
-from .embedding_retriever import EmbeddingRetriever
-from .qa_extractor import QAExtractor
-from .zip_dataframer import ZipDataFramer
-from .zip_lister import ZipLister
+Nodes are imported on first access, so that importing the package does not
+import haystack and its torch and transformers dependencies until a node is
+actually used.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from .dataframe_converter import DataFrameConverter
+    from .dataframer import DataFramer
+    from .document_deduplicator import DocumentDeduplicator
+    from .embedding_retriever import EmbeddingRetriever
+    from .passage_splitter import PassageSplitter
+    from .qa_extractor import QAExtractor
+    from .zip_dataframer import ZipDataFramer
+    from .zip_lister import ZipLister
+
+#: Maps node names to the modules defining them
+_NODE_MODULES = {
+    'DataFrameConverter': '.dataframe_converter',
+    'DataFramer': '.dataframer',
+    'DocumentDeduplicator': '.document_deduplicator',
+    'EmbeddingRetriever': '.embedding_retriever',
+    'PassageSplitter': '.passage_splitter',
+    'QAExtractor': '.qa_extractor',
+    'ZipDataFramer': '.zip_dataframer',
+    'ZipLister': '.zip_lister',
+}
 
 __all__ = [
     'DataFrameConverter',
     'DataFramer',
+    'DocumentDeduplicator',
     'EmbeddingRetriever',
+    'PassageSplitter',
     'QAExtractor',
     'ZipDataFramer',
     'ZipLister',
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """Imports nodes on first access."""
+
+    if name not in _NODE_MODULES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    module = importlib.import_module(_NODE_MODULES[name], __name__)
+    node = getattr(module, name)
+    globals()[name] = node
+    return node
+
+
+def __dir__() -> List[str]:
+    """Lists the module attributes, including nodes not yet imported."""
+
+    return sorted({*globals(), *__all__})
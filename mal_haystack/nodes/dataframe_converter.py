@@ -1,6 +1,15 @@
 """The MAL Haystack DataFrame to document converter node."""
 
-from typing import Dict, List, Optional
+import functools
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 import langdetect
 import pandas as pd
@@ -10,6 +19,69 @@ from haystack.nodes.file_converter.base import KNOWN_LIGATURES
 # TODO: Investigate why tqdm.auto does not work properly with VS Code
 from tqdm import tqdm
 
+logger = logging.getLogger(__name__)
+
+
+def _detect_language(text: str) -> Optional[str]:
+    """Detects the ISO 639-1 language of `text`.
+
+    Module-level so that it can be dispatched to worker processes.
+
+    Arguments:
+        text: The text to detect the language of.
+
+    Returns:
+        The detected language, or ``None`` if detection failed.
+    """
+
+    # Seed so that cached detections are reproducible between runs
+    langdetect.DetectorFactory.seed = 0
+    try:
+        return langdetect.detect(text)
+    except langdetect.lang_detect_exception.LangDetectException:
+        return None
+
+
+@functools.lru_cache(maxsize=8)
+def _ligature_regex(ligatures: Tuple[Tuple[str, str], ...]) -> re.Pattern:
+    """Compiles a regex matching any of `ligatures` in a single pass.
+
+    Arguments:
+        ligatures: The ``(ligature, letters)`` pairs to match.
+
+    Returns:
+        The compiled ligature regex.
+    """
+
+    # Longest first so multi-character ligatures win over their prefixes
+    keys = sorted((lig for lig, _ in ligatures), key=len, reverse=True)
+    return re.compile('|'.join(re.escape(key) for key in keys))
+
+
+def _clean_ligatures(
+    series: pd.Series,
+    known_ligatures: Dict[str, str],
+) -> pd.Series:
+    """Replaces `known_ligatures` in `series` with their split letters.
+
+    Arguments:
+        series: The text series to clean.
+        known_ligatures: Mapping of ligatures to their split counterparts.
+
+    Returns:
+        The cleaned text series.
+    """
+
+    if not known_ligatures:
+        return series
+
+    regex = _ligature_regex(tuple(known_ligatures.items()))
+    return series.str.replace(
+        regex,
+        lambda match: known_ligatures[match.group()],
+        regex=True,
+    )
+
 
 class DataFrameConverter(BaseComponent):
     """Component for converting :class:`pandas.DataFrame` objects
@@ -31,7 +103,23 @@ class DataFrameConverter(BaseComponent):
             not unique, you can modify the metadata and pass e.g. `"meta"` to
             this field (e.g. [`"content"`, `"meta"`]). In this case the id will
             be generated by using the content and the defined metadata.
+        known_ligatures: Mapping of ligatures to replace with their split
+            counterparts in document text. Defaults to
+            `haystack.nodes.file_converter.base.KNOWN_LIGATURES`.
+        language_workers: Number of worker processes to detect languages
+            with when `valid_languages` is used. Defaults to the number of
+            CPUs; ``1`` detects in the current process.
+        language_cache_path: If specified, a JSON file persisting detected
+            languages by content hash, so that re-ingesting the same
+            documents skips detection.
+        language_cache_flush_every: The number of newly detected languages
+            to persist the language cache after. The cache is also
+            persisted by :meth:`close`.
         progress_bar: Show a progress bar for the conversion.
+
+    Attributes:
+        rejected_count: Running count of documents rejected for not being
+            in `valid_languages`.
     """
 
     outgoing_edges: int = 1
@@ -42,6 +130,10 @@ class DataFrameConverter(BaseComponent):
         meta_columns: Optional[List[str]] = None,
         valid_languages: Optional[List[str]] = None,
         id_hash_keys: Optional[List[str]] = None,
+        known_ligatures: Dict[str, str] = KNOWN_LIGATURES,
+        language_workers: Optional[int] = None,
+        language_cache_path: Optional[str | pathlib.Path] = None,
+        language_cache_flush_every: int = 10_000,
         progress_bar: bool = True,
     ):
         """Constructor."""
@@ -50,7 +142,15 @@ class DataFrameConverter(BaseComponent):
         self.meta_columns = meta_columns
         self.valid_languages = valid_languages
         self.id_hash_keys = id_hash_keys
+        self.known_ligatures = known_ligatures
+        self.language_workers = language_workers
+        self.language_cache_path = language_cache_path
+        self.language_cache_flush_every = language_cache_flush_every
         self.progress_bar = progress_bar
+        self.rejected_count = 0
+        self._language_cache = None
+        self._unflushed_count = 0
+        self._language_pool = None
 
     def validate_language(
         self,
@@ -73,12 +173,98 @@ class DataFrameConverter(BaseComponent):
         if not valid_languages:
             return True
 
-        try:
-            lang = langdetect.detect(text)
-        except langdetect.lang_detect_exception.LangDetectException:
-            lang = None
+        return self.detect_languages([text])[0] in valid_languages
 
-        return lang in valid_languages
+    def _load_language_cache(self) -> Dict[str, Optional[str]]:
+        """Loads the language cache, from disk if persisted.
+
+        Returns:
+            The mapping of content hashes to detected languages.
+        """
+
+        if self._language_cache is None:
+            self._language_cache = {}
+            path = self.language_cache_path
+            if path is not None and os.path.exists(path):
+                with open(path) as cachefile:
+                    self._language_cache = json.load(cachefile)
+
+        return self._language_cache
+
+    def detect_languages(self, texts: List[str]) -> List[Optional[str]]:
+        """Detect the languages of `texts`, using cached results if possible.
+
+        Texts not already in the cache are detected across a process pool
+        of `language_workers` processes, started on first use and kept
+        until :meth:`close`.
+
+        Arguments:
+            texts: The texts to detect the languages of.
+
+        Returns:
+            The detected language of each text, or ``None`` where detection
+            failed.
+        """
+
+        cache = self._load_language_cache()
+        keys = [
+            hashlib.sha1(str(text).encode('utf-8')).hexdigest()
+            for text in texts
+        ]
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cache and isinstance(text, str):
+                missing[key] = text
+
+        if missing:
+            workers = self.language_workers or os.cpu_count() or 1
+            if workers == 1 or len(missing) == 1:
+                languages = map(_detect_language, missing.values())
+                cache.update(zip(missing.keys(), languages))
+            else:
+                # The pool is started once and reused for every chunk, and
+                # spawned rather than forked, as chunks may be converted
+                # while torch threads run, and forking those can deadlock
+                if self._language_pool is None:
+                    self._language_pool = ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                    )
+                chunksize = max(1, len(missing) // (workers * 4))
+                languages = self._language_pool.map(
+                    _detect_language,
+                    missing.values(),
+                    chunksize=chunksize,
+                )
+                cache.update(zip(missing.keys(), languages))
+
+            self._unflushed_count += len(missing)
+            if self._unflushed_count >= self.language_cache_flush_every:
+                self.flush_language_cache()
+
+        return [cache.get(key) for key in keys]
+
+    def flush_language_cache(self):
+        """Persists languages detected since the last flush, if any."""
+
+        if self.language_cache_path is None or not self._unflushed_count:
+            return
+
+        path = pathlib.Path(self.language_cache_path)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'w') as cachefile:
+            json.dump(self._language_cache, cachefile)
+        os.replace(tmp_path, path)
+        self._unflushed_count = 0
+
+    def close(self):
+        """Persists the language cache and stops the detection workers."""
+
+        self.flush_language_cache()
+        if self._language_pool is not None:
+            self._language_pool.shutdown()
+            self._language_pool = None
 
     def convert(
         self,
@@ -87,6 +273,7 @@ class DataFrameConverter(BaseComponent):
         meta_columns: Optional[List[str]] = None,
         valid_languages: Optional[List[str]] = None,
         id_hash_keys: Optional[List[str]] = None,
+        known_ligatures: Optional[Dict[str, str]] = None,
     ):
         """Convert `series` to a list of :class:`haystack.Document` objects.
 
@@ -110,6 +297,9 @@ class DataFrameConverter(BaseComponent):
                 e.g. `"meta"` to this field (e.g. [`"content"`, `"meta"`]). In
                 this case the id will be generated by using the content and the
                 defined metadata.
+            known_ligatures: Mapping of ligatures to replace with their split
+                counterparts. The replacement runs once over the whole
+                `document_column` before any documents are created.
         """
 
         if document_column is None:
@@ -120,20 +310,42 @@ class DataFrameConverter(BaseComponent):
             valid_languages = self.valid_languages
         if id_hash_keys is None:
             id_hash_keys = self.id_hash_keys
+        if known_ligatures is None:
+            known_ligatures = self.known_ligatures
+
+        series = _clean_ligatures(dataframe[document_column], known_ligatures)
+        meta_frame = None
+        if dataframe is not None and meta_columns:
+            meta_frame = dataframe[meta_columns]
+
+        # Drop rows, e.g. garbled text, not in a valid language
+        if valid_languages:
+            languages = self.detect_languages(series.to_list())
+            keep = [lang in valid_languages for lang in languages]
+            rejected = len(keep) - sum(keep)
+            if rejected:
+                logger.info(
+                    'Rejected %s of %s documents not in languages %s',
+                    rejected, len(keep), valid_languages)
+                self.rejected_count += rejected
+                series = series[keep]
+                if meta_frame is not None:
+                    meta_frame = meta_frame[keep]
 
-        series = dataframe[document_column]
+        # Pull metadata out column-wise in one pass rather than row by row
+        if meta_frame is not None:
+            records = meta_frame.to_dict('records')
+        else:
+            records = [{}] * len(series)
 
         documents = []
-        for idx, content in tqdm(
-            series.items(),
+        for idx, content, record in tqdm(
+            zip(series.index, series.to_list(), records),
             total=len(series),
             disable=not self.progress_bar,
             desc='Extracting DataFrame documents',
         ):
-            metadata = {'index': idx}
-            if dataframe is not None and meta_columns:
-                cols = meta_columns
-                metadata |= dataframe.loc[idx][cols].to_dict()
+            metadata = {'index': idx} | record
             documents.append(Document(
                 content=content,
                 content_type='text',
@@ -150,7 +362,7 @@ class DataFrameConverter(BaseComponent):
         meta_columns: Optional[List[str]] = None,
         valid_languages: Optional[List[str]] = None,
         id_hash_keys: Optional[List[str]] = None,
-        known_ligatures: Dict[str, str] = KNOWN_LIGATURES,
+        known_ligatures: Optional[Dict[str, str]] = None,
     ):
         """Extract text from a :class:`pandas.Series` object.
 
@@ -195,14 +407,9 @@ class DataFrameConverter(BaseComponent):
                 meta_columns=meta_columns,
                 valid_languages=valid_languages,
                 id_hash_keys=id_hash_keys,
+                known_ligatures=known_ligatures,
             ))
 
-        # Cleanup ligatures
-        for document in documents:
-            for lig, letters in known_ligatures.items():
-                if document.content is not None:
-                    document.content = document.content.replace(lig, letters)
-
         result = {'documents': documents}
         return result, 'output_1'
 
@@ -1,9 +1,11 @@
 import pathlib
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 import pandas as pd
 from haystack.nodes import BaseComponent
 
+from ..dataframe_cache import DataFrameCache, iter_csv
+
 
 class DataFramer(BaseComponent):
     """Component for generating a set of dataframes from CSV files.
@@ -15,6 +17,11 @@ class DataFramer(BaseComponent):
             not unique, you can modify the metadata and pass e.g. `"meta"` to
             this field (e.g. [`"content"`, `"meta"`]). In this case the id will
             be generated by using the content and the defined metadata.
+        chunksize: If specified, the number of CSV rows to read at a time
+            when streaming with :meth:`iter_convert`.
+        cache_dir: If specified, the directory to cache parsed CSV files in
+            as columnar Arrow files, keyed by each file's size and
+            modification time. Requires the optional ``pyarrow`` package.
     """
 
     outgoing_edges: int = 1
@@ -22,14 +29,66 @@ class DataFramer(BaseComponent):
     def __init__(
         self,
         id_hash_keys: Optional[List[str]] = None,
+        chunksize: Optional[int] = None,
+        cache_dir: Optional[str | pathlib.Path] = None,
     ):
         """Constructor."""
 
         self.id_hash_keys = id_hash_keys
+        self.chunksize = chunksize
+        self.cache_dir = cache_dir
+        self.cache = DataFrameCache(cache_dir) if cache_dir else None
+
+    def iter_convert(
+        self,
+        file_paths: List[str | pathlib.Path],
+        chunksize: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+        id_hash_keys: Optional[List[str]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Lazily extract `file_paths` data as :class:`pandas.DataFrame`
+        chunks.
+
+        Only one chunk of rows is held in memory at a time. Chunk indices
+        continue across chunks of the same file, so they match the indices
+        of a whole-file read.
+
+        Arguments:
+            file_paths: Paths of the CSV files.
+            chunksize: The number of CSV rows per yielded DataFrame. If
+                unspecified, each file is yielded as a single DataFrame.
+            columns: If specified, the only CSV columns to read.
+            id_hash_keys: Generate the document id from a custom list of
+                strings that refer to the document's attributes. If you want to
+                ensure you don't have duplicate documents in your DocumentStore
+                but texts are not unique, you can modify the metadata and pass
+                e.g. `"meta"` to this field (e.g. [`"content"`, `"meta"`]). In
+                this case the id will be generated by using the content and the
+                defined metadata.
+        """
+
+        if chunksize is None:
+            chunksize = self.chunksize
+        if id_hash_keys is None:
+            id_hash_keys = self.id_hash_keys
+
+        for file_path in file_paths:
+            if self.cache is None:
+                with open(file_path) as myfile:
+                    yield from iter_csv(myfile, chunksize, columns)
+                continue
+
+            def parse():
+                with open(file_path) as myfile:
+                    yield from iter_csv(myfile, chunksize)
+
+            key = self.cache.file_key(file_path)
+            yield from self.cache.iter_load(key, parse, columns, chunksize)
 
     def convert(
         self,
         file_paths: str | pathlib.Path,
+        columns: Optional[List[str]] = None,
         id_hash_keys: Optional[List[str]] = None,
     ):
         """Extract `file_paths` data as :class:`pandas.DataFrame` objects.
@@ -43,6 +102,7 @@ class DataFramer(BaseComponent):
             file_paths: Path of the zipped CSV file.
             meta: Dictionary containing ``zip_paths`` key to zip file paths to
                 extract CSV `file_paths` from.
+            columns: If specified, the only CSV columns to read.
             id_hash_keys: Generate the document id from a custom list of
                 strings that refer to the document's attributes. If you want to
                 ensure you don't have duplicate documents in your DocumentStore
@@ -52,25 +112,23 @@ class DataFramer(BaseComponent):
                 defined metadata.
         """
 
-        if id_hash_keys is None:
-            id_hash_keys = self.id_hash_keys
-
-        dfs = []
-        for file_path in file_paths:
-            with open(file_path) as myfile:
-                dfs.append(pd.read_csv(myfile))
-
-        return dfs
+        return list(self.iter_convert(
+            file_paths,
+            columns=columns,
+            id_hash_keys=id_hash_keys,
+        ))
 
     def run(
         self,
         file_paths: str | pathlib.Path,
+        columns: Optional[List[str]] = None,
         id_hash_keys: Optional[List[str]] = None,
     ):
         """Read CSV filenames into :class:`pandas.DataFrame` objects.
 
         Arguments:
             file_paths: Paths of the CSV files.
+            columns: If specified, the only CSV columns to read.
             id_hash_keys: Generate the document id from a custom list of
                 strings that refer to the document's attributes. If you want to
                 ensure you don't have duplicate documents in your DocumentStore
@@ -83,6 +141,7 @@ class DataFramer(BaseComponent):
         # Convert paths into dataframes
         dfs = self.convert(
             file_paths,
+            columns=columns,
             id_hash_keys=id_hash_keys,
         )
 
@@ -0,0 +1,259 @@
+"""The MAL Haystack duplicate document detection node."""
+
+import hashlib
+import heapq
+import itertools
+import re
+import threading
+import unicodedata
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from haystack import Document
+from haystack.nodes import BaseComponent
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(content: str) -> str:
+    """Normalizes document content for duplicate detection.
+
+    Content is Unicode NFKC normalized and case folded, and runs of
+    whitespace are collapsed, so that reviews differing only in case,
+    spacing or compatibility characters are regarded as duplicates.
+
+    Arguments:
+        content: The document content.
+
+    Returns:
+        The normalized content.
+    """
+
+    content = unicodedata.normalize('NFKC', str(content)).casefold()
+    return _WHITESPACE.sub(' ', content).strip()
+
+
+class DocumentDeduplicator(BaseComponent):
+    """Component for grouping documents with identical normalized content.
+
+    Only the first document of each group is passed on, so that it is
+    embedded and read once. The metadata of the other members is kept by
+    the node, keyed by the group's first document's `index_key` meta field,
+    so that :meth:`fan_out` can copy the first document's extracted answers
+    to every member. Groups persist across runs of the node, so documents
+    converted and indexed in chunks are deduplicated across chunks too.
+
+    When resuming, documents already processed by a previous run do not
+    need reading again, but their duplicates may. A document duplicating a
+    processed first document therefore starts a new group if it is not
+    processed itself, and :meth:`is_group_processed` tells whether any
+    member of a group still needs the first document read.
+
+    When documents are deduplicated while records are fanned out, as by
+    overlapped stages, a duplicate may arrive after its first document's
+    record was fanned out. :meth:`fan_out` can keep the records it reads
+    so that such late duplicates are copied too.
+
+    Parameters:
+        index_key: The meta field uniquely identifying each document.
+        is_processed: If specified, callable checking whether a document
+            index was processed by a previous run.
+    """
+
+    outgoing_edges = 1
+
+    def __init__(
+        self,
+        index_key: str = 'index',
+        is_processed: Optional[Callable[[Any], bool]] = None,
+    ):
+        """Constructor."""
+
+        self.index_key = index_key
+        self.is_processed = is_processed or (lambda index: False)
+
+        # Maps content hashes to the index of their group's first document
+        self._groups: Dict[str, Any] = {}
+
+        # Maps the index of each document to its position in stored order
+        self._positions: Dict[Any, int] = {}
+
+        # Maps the index of each group's first document to member metadata
+        self.duplicates: Dict[Any, List[Dict[str, Any]]] = {}
+
+        # Maps the index of each first document fanned out to its record,
+        # when kept, and queues the first document index and metadata of
+        # duplicates arriving after it
+        self._records: Dict[Any, Dict[str, Any]] = {}
+        self._late: List[Tuple[Any, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def group_count(self) -> int:
+        """Gets the number of distinct documents seen."""
+
+        return len(self._groups)
+
+    @property
+    def duplicate_count(self) -> int:
+        """Gets the number of duplicate documents dropped."""
+
+        return sum(map(len, self.duplicates.values()))
+
+    @staticmethod
+    def key(content: str) -> str:
+        """Gets the duplicate detection key of document `content`.
+
+        Arguments:
+            content: The document content.
+
+        Returns:
+            The hash of the normalized content.
+        """
+
+        return hashlib.sha1(normalize(content).encode('utf-8')).hexdigest()
+
+    def deduplicate(self, documents: List[Document]) -> List[Document]:
+        """Drops documents duplicating the content of previous documents.
+
+        Arguments:
+            documents: The documents to deduplicate.
+
+        Returns:
+            The documents not duplicating a previous document.
+        """
+
+        unique = []
+        for document in documents:
+            index = document.meta[self.index_key]
+            self._positions[index] = len(self._positions)
+            key = self.key(document.content)
+            first = self._groups.get(key)
+            if first is None or (
+                self.is_processed(first) and not self.is_processed(index)
+            ):
+                self._groups[key] = index
+                unique.append(document)
+            else:
+                with self._lock:
+                    self.duplicates.setdefault(first, []).append(
+                        document.meta)
+                    if first in self._records:
+                        self._late.append((first, document.meta))
+
+        return unique
+
+    def is_group_processed(self, index: Any) -> bool:
+        """Checks whether every member of a document's group is processed.
+
+        Arguments:
+            index: The `index_key` meta field of a group's first document.
+
+        Returns:
+            Whether the first document and all its duplicates were
+            processed by a previous run.
+        """
+
+        return self.is_processed(index) and all(
+            self.is_processed(meta[self.index_key])
+            for meta in self.duplicates.get(index, []))
+
+    def fan_out(
+        self,
+        records: Iterable[Dict[str, Any]],
+        keep_records: bool = False,
+    ) -> Iterator[Dict[str, Any]]:
+        """Copies extracted metadata records to every member of their group.
+
+        Copies are held back until the records of every document stored
+        before them are returned, so that records are returned in stored
+        order. Records and copies of documents processed by a previous run
+        are dropped.
+
+        Arguments:
+            records: The metadata records extracted from deduplicated
+                documents, including their `index_key` meta field, in
+                stored order.
+            keep_records: Whether to keep the records in memory, so that
+                duplicates deduplicated while records are iterated are
+                copied even if their first document's record was already
+                returned.
+
+        Returns:
+            An iterator of the records and a copy for every duplicate of
+            their document, updated with the duplicate's metadata.
+        """
+
+        # Copies are queued as (position, count, record), the count keeping
+        # copies at tied positions in arrival order without comparing them
+        pending = []
+        counter = itertools.count()
+
+        def hold(record, meta):
+            duplicate = meta[self.index_key]
+            if not self.is_processed(duplicate):
+                heapq.heappush(pending, (
+                    self._positions[duplicate], next(counter),
+                    record | meta))
+
+        def hold_late():
+            with self._lock:
+                late, self._late = self._late, []
+            for first, meta in late:
+                hold(self._records[first], meta)
+
+        for record in records:
+            index = record[self.index_key]
+            with self._lock:
+                if keep_records:
+                    self._records[index] = record
+                members = list(self.duplicates.get(index, []))
+            hold_late()
+            position = self._positions.get(index, -1)
+            while pending and pending[0][0] < position:
+                yield heapq.heappop(pending)[2]
+            if not self.is_processed(index):
+                yield record
+            for meta in members:
+                hold(record, meta)
+
+        hold_late()
+        while pending:
+            yield heapq.heappop(pending)[2]
+
+    def summary(self, num_queries: int = 0) -> Dict[str, int]:
+        """Summarizes the inference calls avoided by deduplication.
+
+        Arguments:
+            num_queries: The number of queries read per document.
+
+        Returns:
+            The number of distinct ``documents`` and ``duplicates``, and the
+            ``embeddings`` and ``reader_calls`` avoided.
+        """
+
+        return {
+            'documents': self.group_count,
+            'duplicates': self.duplicate_count,
+            'embeddings': self.duplicate_count,
+            'reader_calls': self.duplicate_count * num_queries,
+        }
+
+    def run(self, documents: List[Document]):
+        """Drops documents duplicating the content of previous documents.
+
+        Arguments:
+            documents: The documents to deduplicate.
+        """
+
+        return {'documents': self.deduplicate(documents)}, 'output_1'
+
+    run_batch = run
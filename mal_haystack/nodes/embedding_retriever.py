@@ -1,19 +1,213 @@
 """Modifies the :class:`~haystack.nodes.retriever.EmbeddingRetriever` to
-accept batch filters.
+accept batch filters, cache document embeddings, query document stores
+with batches of query embeddings and search approximate nearest neighbour
+indexes.
 
 """
 
-from typing import Dict, List, Optional, Union
+from copy import deepcopy
+from typing import Any, Dict, List, Optional, Union
 
+import numpy as np
+from haystack import Document
 from haystack.nodes.retriever import EmbeddingRetriever as EmbeddingBase
 
+from ..ann import IVFIndex
+from ..embedding_cache import EmbeddingCache
+
 
 class EmbeddingRetriever(EmbeddingBase):
     """Modified EmbeddingRetriever to accept `filters` in ``run`` and
     ``run_batch``.
 
+    Parameters:
+        embedding_cache: If specified, the cache to look document
+            embeddings up in before embedding them with the model.
+        ann_index: If specified, the approximate nearest neighbour index of
+            the document store's embeddings to search unfiltered queries
+            with. It can also be set once documents are embedded. All other
+            parameters are passed to the base
+            :class:`~haystack.nodes.retriever.EmbeddingRetriever`.
     """
 
+    def __init__(
+        self,
+        *args,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        ann_index: Optional[IVFIndex] = None,
+        **kwargs,
+    ):
+        """Constructor."""
+
+        super().__init__(*args, **kwargs)
+        self.embedding_cache = embedding_cache
+        self.ann_index = ann_index
+
+    def embed_documents(self, docs: List[Document]) -> np.ndarray:
+        """Create embeddings for a list of documents, reusing cached ones.
+
+        Only documents missing from `embedding_cache` are embedded with the
+        model; their embeddings are then added to the cache.
+
+        Arguments:
+            docs: The documents to embed.
+        """
+
+        if self.embedding_cache is None:
+            return super().embed_documents(docs)
+
+        keys = [self.embedding_cache.key(doc.content) for doc in docs]
+        embeddings = self.embedding_cache.get(keys)
+
+        missing = [num for num, emb in enumerate(embeddings) if emb is None]
+        if missing:
+            computed = super().embed_documents([docs[num] for num in missing])
+            self.embedding_cache.put([keys[num] for num in missing], computed)
+            for num, embedding in zip(missing, computed):
+                embeddings[num] = embedding
+
+        if not embeddings:
+            return super().embed_documents(docs)
+
+        return np.vstack(embeddings)
+
+    def _search_ann(
+        self,
+        query_embs: List[np.ndarray],
+        top_k: int,
+        index: str,
+        scale_score: bool,
+    ) -> List[List[Document]]:
+        """Finds the documents of the most similar embeddings in `ann_index`.
+
+        Arguments:
+            query_embs: The query embeddings.
+            top_k: How many documents to return per query.
+            index: The name of the document index.
+            scale_score: Whether to scale scores to the unit interval.
+
+        Returns:
+            Copies of the documents found for each query, most similar first.
+        """
+
+        found, similarities = self.ann_index.search(
+            np.vstack(query_embs), top_k)
+        results = []
+        for ids, scores in zip(found, similarities):
+            documents = deepcopy(
+                self.document_store.get_documents_by_id(ids, index=index))
+            for document, score in zip(documents, scores.tolist()):
+                document.score = (
+                    self.document_store.scale_to_unit_interval(
+                        score, 'cosine')
+                    if scale_score else score)
+            results.append(documents)
+        return results
+
+    def retrieve(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+        index: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        scale_score: Optional[bool] = None,
+    ) -> List[Document]:
+        """Retrieves the documents most relevant to a query.
+
+        Unfiltered queries are searched in `ann_index`, if set.
+
+        Arguments:
+            query: The query to run.
+            filters: Optional filters to narrow down the search space.
+            top_k: How many documents to return.
+            index: The name of the document index.
+            headers: Optional headers passed to the document store.
+            scale_score: Whether to scale scores to the unit interval.
+        """
+
+        if self.ann_index is not None and not filters:
+            return self.retrieve_batch(
+                [query],
+                top_k=top_k,
+                index=index,
+                headers=headers,
+                scale_score=scale_score,
+            )[0]
+
+        return super().retrieve(
+            query=query,
+            filters=filters,
+            top_k=top_k,
+            index=index,
+            headers=headers,
+            scale_score=scale_score,
+        )
+
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        filters: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]] = None,
+        top_k: Optional[int] = None,
+        index: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        batch_size: Optional[int] = None,
+        scale_score: Optional[bool] = None,
+    ) -> List[List[Document]]:
+        """Retrieves the documents most relevant to each of many queries.
+
+        Unfiltered queries are searched in `ann_index`, if set. Otherwise,
+        when the document store supports ``query_by_embedding_batch``, and
+        one filter applies to every query, all query embeddings are
+        searched together; otherwise each query is searched on its own.
+
+        Arguments:
+            queries: The queries to run.
+            filters: Optional filters to narrow down the search space, one
+                for all queries or one per query.
+            top_k: How many documents to return per query.
+            index: The name of the document index.
+            headers: Optional headers passed to the document store.
+            batch_size: The number of queries to embed at a time.
+            scale_score: Whether to scale scores to the unit interval.
+        """
+
+        approximate = self.ann_index is not None and not filters
+        query_batch = getattr(
+            self.document_store, 'query_by_embedding_batch', None)
+        if not approximate and (
+                query_batch is None or isinstance(filters, list)):
+            return super().retrieve_batch(
+                queries=queries,
+                filters=filters,
+                top_k=top_k,
+                index=index,
+                headers=headers,
+                batch_size=batch_size,
+                scale_score=scale_score,
+            )
+
+        query_embs: List[np.ndarray] = []
+        for batch in self._get_batches(
+                queries=queries, batch_size=batch_size or self.batch_size):
+            query_embs.extend(self.embed_queries(texts=batch))
+
+        top_k = self.top_k if top_k is None else top_k
+        index = index or self.document_store.index
+        if scale_score is None:
+            scale_score = self.scale_score
+        if approximate:
+            return self._search_ann(query_embs, top_k, index, scale_score)
+
+        return query_batch(
+            query_embs,
+            filters=filters,
+            top_k=top_k,
+            index=index,
+            headers=headers,
+            scale_score=scale_score,
+        )
+
     def run(
         self,
         query: str,
@@ -0,0 +1,139 @@
+"""The MAL Haystack token-aware passage splitter node."""
+
+import re
+from typing import Any, List, Optional, Tuple
+
+from haystack import Document
+from haystack.nodes import BaseComponent
+
+_WORD = re.compile(r'\S+')
+
+
+class PassageSplitter(BaseComponent):
+    """Component for splitting documents into passages of limited tokens.
+
+    Documents longer than `max_tokens` are split into passages of up to
+    `max_tokens` tokens, consecutive passages sharing `overlap` tokens, so
+    that retrievers do not truncate them and readers do not slide many
+    windows over them. Passages are slices of the original content and
+    keep a copy of their document's metadata, including its ``index``, so
+    that answers extracted from them roll up to their document. Documents
+    that fit are passed on unchanged.
+
+    Parameters:
+        max_tokens: The maximum number of tokens per passage, excluding
+            any special tokens the model adds.
+        overlap: The number of tokens consecutive passages share.
+        token_budget: If specified, the maximum number of tokens of each
+            document to keep; any further tokens are dropped.
+        tokenizer: The name of a Hugging Face tokenizer, or a fast
+            tokenizer instance, to count tokens with. Defaults to counting
+            whitespace-separated words.
+    """
+
+    outgoing_edges = 1
+
+    def __init__(
+        self,
+        max_tokens: int = 254,
+        overlap: int = 32,
+        token_budget: Optional[int] = None,
+        tokenizer: Optional[Any] = None,
+    ):
+        """Constructor."""
+
+        if max_tokens < 1:
+            raise ValueError('`max_tokens` must be positive!')
+        if not 0 <= overlap < max_tokens:
+            raise ValueError('`overlap` must be less than `max_tokens`!')
+        if token_budget is not None and token_budget < 1:
+            raise ValueError('`token_budget` must be positive!')
+
+        if isinstance(tokenizer, str):
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(tokenizer)
+
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.token_budget = token_budget
+        self.tokenizer = tokenizer
+
+        self.document_count = 0
+        self.passage_count = 0
+        self.truncated_count = 0
+
+    def _spans(self, content: str) -> List[Tuple[int, int]]:
+        """Gets the character span of each token of `content`.
+
+        Arguments:
+            content: The text to tokenize.
+
+        Returns:
+            The ``(start, end)`` character offsets of each token.
+        """
+
+        if self.tokenizer is None:
+            return [match.span() for match in _WORD.finditer(content)]
+
+        encoding = self.tokenizer(
+            content,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False,
+        )
+        return encoding['offset_mapping']
+
+    def split(self, document: Document) -> List[Document]:
+        """Splits a document into passages.
+
+        Arguments:
+            document: The document to split.
+
+        Returns:
+            The document's passages, or the document itself if it fits.
+        """
+
+        self.document_count += 1
+        content = str(document.content)
+        spans = self._spans(content)
+        if self.token_budget is not None and len(spans) > self.token_budget:
+            spans = spans[:self.token_budget]
+            self.truncated_count += 1
+        elif len(spans) <= self.max_tokens:
+            self.passage_count += 1
+            return [document]
+
+        passages = []
+        stride = self.max_tokens - self.overlap
+        for start in range(0, len(spans), stride):
+            window = spans[start:start + self.max_tokens]
+            passage = Document(
+                content=content[window[0][0]:window[-1][1]],
+                meta=document.meta.copy(),
+                id_hash_keys=['content', 'meta'],
+            )
+
+            # Identical passages of one or more documents are kept apart
+            passage.id = f'{passage.id}-{len(passages)}'
+            passages.append(passage)
+            if start + self.max_tokens >= len(spans):
+                break
+
+        self.passage_count += len(passages)
+        return passages
+
+    def run(self, documents: List[Document]):
+        """Splits documents into passages of limited tokens.
+
+        Arguments:
+            documents: The documents to split.
+        """
+
+        passages = [
+            passage
+            for document in documents
+            for passage in self.split(document)
+        ]
+        return {'documents': passages}, 'output_1'
+
+    run_batch = run
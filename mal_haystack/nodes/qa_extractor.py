@@ -1,17 +1,23 @@
 """MAL Haystack Extractive QA pipeline-in-a-node."""
 
-from typing import List, Optional, Type
+from typing import Any, Dict, List, Optional, Type
 
 from haystack import Document
-from haystack.document_stores import InMemoryDocumentStore
 from haystack.nodes import BaseComponent
 from haystack.nodes.retriever.base import BaseRetriever
 from haystack.nodes.reader.base import BaseReader
 from haystack.pipelines import ExtractiveQAPipeline
 
+from ..document_stores import IndexedInMemoryDocumentStore
+
 
 class QAExtractor(BaseComponent):
-    """Component for extracting answers from single-document stores.
+    """Component for extracting answers from the paragraphs of documents.
+
+    A single long-lived document store, retriever and pipeline are shared by
+    all extractions. Paragraphs of every document are written to the store
+    in bulk, scoped by their parent document's id in the `document_key` meta
+    field, and the reader answers queries for many documents per call.
 
     Parameters:
         retriever_cls: Retriever *class* to use.
@@ -22,6 +28,10 @@ class QAExtractor(BaseComponent):
             not unique, you can modify the metadata and pass e.g. `"meta"` to
             this field (e.g. [`"content"`, `"meta"`]). In this case the id will
             be generated by using the content and the defined metadata.
+            Defaults to hashing both, so that identical paragraphs of
+            different documents are kept apart.
+        document_key: The paragraph meta field holding the parent document id.
+        batch_size: The number of documents to read per reader call.
     """
 
     outgoing_edges = 1
@@ -31,12 +41,83 @@ class QAExtractor(BaseComponent):
         retriever_cls: Type[BaseRetriever],
         reader: BaseReader,
         id_hash_keys: Optional[List[str]] = None,
+        document_key: str = 'document_id',
+        batch_size: int = 16,
     ):
         """Constructor."""
 
         self.retriever_cls = retriever_cls
         self.reader = reader
         self.id_hash_keys = id_hash_keys
+        self.document_key = document_key
+        self.batch_size = batch_size
+
+        self.document_store = IndexedInMemoryDocumentStore(
+            indexed_fields=[document_key],
+        )
+        self.retriever = retriever_cls(document_store=self.document_store)
+        self.pipeline = ExtractiveQAPipeline(self.reader, self.retriever)
+
+    def _filters(self, document: Document) -> Dict[str, Any]:
+        """Gets filters scoping retrieval to the paragraphs of `document`.
+
+        Arguments:
+            document: The parent document.
+        """
+
+        return {self.document_key: {'$eq': document.id}}
+
+    def write(
+        self,
+        documents: List[Document],
+        id_hash_keys: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Write the paragraphs of `documents` to the document store in bulk.
+
+        Arguments:
+            documents: The documents to split into paragraphs and write.
+            id_hash_keys: Generate the document id from a custom list of
+                strings that refer to the document's attributes. If you want to
+                ensure you don't have duplicate documents in your DocumentStore
+                but texts are not unique, you can modify the metadata and pass
+                e.g. `"meta"` to this field (e.g. [`"content"`, `"meta"`]). In
+                this case the id will be generated by using the content and the
+                defined metadata.
+
+        Returns:
+            The ids of the written paragraphs.
+        """
+
+        if id_hash_keys is None:
+            id_hash_keys = self.id_hash_keys or ['content', 'meta']
+
+        # Split documents into paragraphs
+        paragraphs = []
+        for document in documents:
+            for num, paragraph in enumerate(document.content.split('\n\n')):
+                if not paragraph.strip():
+                    continue
+                meta = document.meta.copy()
+                meta['num'] = num
+                meta[self.document_key] = document.id
+                paragraphs.append(
+                    Document(
+                        content=paragraph,
+                        meta=meta,
+                        id_hash_keys=id_hash_keys))
+
+        self.document_store.write_documents(paragraphs)
+
+        # Bring the retriever up to date with the new paragraphs
+        if hasattr(self.retriever, 'embed_documents'):
+            self.document_store.update_embeddings(
+                self.retriever,
+                update_existing_embeddings=False,
+            )
+        elif hasattr(self.retriever, 'fit'):
+            self.retriever.fit()
+
+        return [paragraph.id for paragraph in paragraphs]
 
     def extract(
         self,
@@ -57,36 +138,63 @@ class QAExtractor(BaseComponent):
                 defined metadata.
         """
 
-        if id_hash_keys is None:
-            id_hash_keys = self.id_hash_keys
-
-        # Split document into paragraphs
-        documents = []
-        for num, paragraph in enumerate(document.content.split('\n\n')):
-            if not paragraph.strip():
-                continue
-            meta = document.meta.copy()
-            meta['num'] = num
-            documents.append(
-                Document(
-                    content=paragraph,
-                    meta=meta,
-                    id_hash_keys=id_hash_keys))
-
-        print(f'Document store with {len(documents)} documents')
-
-        # Create in-memory document store
-        document_store = InMemoryDocumentStore()
-        document_store.write_documents(documents)
-
-        # Create retriever against document store
-        retriever = self.retriever_cls(
-            document_store=document_store,
-        )
+        ids = self.write([document], id_hash_keys=id_hash_keys)
+        try:
+            return self.pipeline.run(query=query, params={
+                'Retriever': {'filters': self._filters(document)},
+            })
+        finally:
+            self.document_store.delete_documents(ids=ids)
+
+    def extract_batch(
+        self,
+        query: str,
+        documents: List[Document],
+        id_hash_keys: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Extract `query` answers from many documents in batched reader calls.
+
+        Arguments:
+            query: The search query string.
+            documents: The documents to extract query answers from.
+            id_hash_keys: Generate the document id from a custom list of
+                strings that refer to the document's attributes. If you want to
+                ensure you don't have duplicate documents in your DocumentStore
+                but texts are not unique, you can modify the metadata and pass
+                e.g. `"meta"` to this field (e.g. [`"content"`, `"meta"`]). In
+                this case the id will be generated by using the content and the
+                defined metadata.
+
+        Returns:
+            One result per document, with the ``query``, its ``answers`` and
+            the retrieved paragraph ``documents``.
+        """
 
-        # Construct an extractive QA pipeline and run the query
-        pipe = ExtractiveQAPipeline(self.reader, retriever)
-        return pipe.run(query=query)
+        ids = self.write(documents, id_hash_keys=id_hash_keys)
+        try:
+            retrieved = [
+                self.retriever.retrieve(
+                    query=query, filters=self._filters(document))
+                for document in documents
+            ]
+
+            answers = [[] for _ in documents]
+            readable = [num for num, docs in enumerate(retrieved) if docs]
+            for start in range(0, len(readable), self.batch_size):
+                batch = readable[start:start + self.batch_size]
+                prediction = self.reader.predict_batch(
+                    queries=[query] * len(batch),
+                    documents=[retrieved[num] for num in batch],
+                )
+                for num, batch_answers in zip(batch, prediction['answers']):
+                    answers[num] = batch_answers
+        finally:
+            self.document_store.delete_documents(ids=ids)
+
+        return [
+            {'query': query, 'answers': doc_answers, 'documents': docs}
+            for doc_answers, docs in zip(answers, retrieved)
+        ]
 
     def run(
         self,
@@ -108,13 +216,11 @@ class QAExtractor(BaseComponent):
                 defined metadata.
         """
 
-        answers = []
-        for document in documents:
-            answers.append(self.extract(
-                query=query,
-                document=document,
-                id_hash_keys=id_hash_keys,
-            ))
+        answers = self.extract_batch(
+            query=query,
+            documents=documents,
+            id_hash_keys=id_hash_keys,
+        )
 
         return {'answers': answers}, 'output_1'
 
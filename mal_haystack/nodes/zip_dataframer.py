@@ -1,10 +1,15 @@
+import functools
+import itertools
 import pathlib
 import zipfile
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
 
 import pandas as pd
 from haystack.nodes import BaseComponent
 
+from ..dataframe_cache import DataFrameCache, iter_csv
+
 
 class ZipDataFramer(BaseComponent):
     """Component for generating a set of dataframes from zipped CSV files.
@@ -16,6 +21,14 @@ class ZipDataFramer(BaseComponent):
             not unique, you can modify the metadata and pass e.g. `"meta"` to
             this field (e.g. [`"content"`, `"meta"`]). In this case the id will
             be generated by using the content and the defined metadata.
+        chunksize: If specified, the number of CSV rows to read at a time
+            when streaming with :meth:`iter_convert`.
+        num_workers: If greater than one, the number of threads to decompress
+            and parse zipped CSV files of the same zip file with concurrently.
+            Only whole files are read concurrently, i.e. without `chunksize`.
+        cache_dir: If specified, the directory to cache parsed CSV files in
+            as columnar Arrow files, keyed by each zipped file's CRC and size.
+            Requires the optional ``pyarrow`` package.
     """
 
     outgoing_edges: int = 1
@@ -23,15 +36,128 @@ class ZipDataFramer(BaseComponent):
     def __init__(
         self,
         id_hash_keys: Optional[List[str]] = None,
+        chunksize: Optional[int] = None,
+        num_workers: Optional[int] = None,
+        cache_dir: Optional[str | pathlib.Path] = None,
     ):
         """Constructor."""
 
         self.id_hash_keys = id_hash_keys
+        self.chunksize = chunksize
+        self.num_workers = num_workers
+        self.cache_dir = cache_dir
+        self.cache = DataFrameCache(cache_dir) if cache_dir else None
+
+    def _iter_member(
+        self,
+        myzip: zipfile.ZipFile,
+        file_path: str,
+        chunksize: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Reads a zipped CSV file as DataFrame chunks, via the cache if any.
+
+        Arguments:
+            myzip: The open zip file containing `file_path`.
+            file_path: Path of the CSV file in `myzip`.
+            chunksize: If specified, the number of rows per DataFrame.
+            columns: If specified, the only columns to read.
+        """
+
+        if self.cache is None:
+            with myzip.open(file_path) as myzipfile:
+                yield from iter_csv(myzipfile, chunksize, columns)
+            return
+
+        def parse():
+            with myzip.open(file_path) as myzipfile:
+                yield from iter_csv(myzipfile, chunksize)
+
+        key = self.cache.member_key(myzip.getinfo(file_path))
+        yield from self.cache.iter_load(key, parse, columns, chunksize)
+
+    def _read_member(
+        self,
+        myzip: zipfile.ZipFile,
+        file_path: str,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """Reads a whole zipped CSV file into a DataFrame.
+
+        Arguments:
+            myzip: The open zip file containing `file_path`.
+            file_path: Path of the CSV file in `myzip`.
+            columns: If specified, the only columns to read.
+        """
+
+        # Exhaust the reader so that cache misses are written out
+        dataframe, = self._iter_member(myzip, file_path, columns=columns)
+        return dataframe
+
+    def iter_convert(
+        self,
+        file_paths: List[str | pathlib.Path],
+        meta: Dict[str, List[str | pathlib.Path]],
+        chunksize: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+        id_hash_keys: Optional[List[str]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Lazily extract `file_paths` data as :class:`pandas.DataFrame`
+        chunks.
+
+        Only one chunk of rows is held in memory at a time. Chunk indices
+        continue across chunks of the same file, so they match the indices
+        of a whole-file read. Each zip file is opened once for all of the
+        CSV files it contains.
+
+        Arguments:
+            file_paths: Paths of the zipped CSV files.
+            meta: Dictionary containing ``zip_paths`` key to zip file paths to
+                extract CSV `file_paths` from.
+            chunksize: The number of CSV rows per yielded DataFrame. If
+                unspecified, each file is yielded as a single DataFrame.
+            columns: If specified, the only CSV columns to read.
+            id_hash_keys: Generate the document id from a custom list of
+                strings that refer to the document's attributes. If you want to
+                ensure you don't have duplicate documents in your DocumentStore
+                but texts are not unique, you can modify the metadata and pass
+                e.g. `"meta"` to this field (e.g. [`"content"`, `"meta"`]). In
+                this case the id will be generated by using the content and the
+                defined metadata.
+        """
+
+        if chunksize is None:
+            chunksize = self.chunksize
+        if id_hash_keys is None:
+            id_hash_keys = self.id_hash_keys
+
+        if not meta or 'zip_paths' not in meta:
+            raise ValueError('`meta` dict must contain "zip_paths" key!')
+
+        num_workers = self.num_workers or 1
+        members = zip(file_paths, meta['zip_paths'])
+        for zip_path, group in itertools.groupby(members, lambda m: m[1]):
+            names = [file_path for file_path, _ in group]
+            with zipfile.ZipFile(zip_path) as myzip:
+
+                # Zip reads of separate members can share one handle, and
+                # both decompression and parsing release the GIL
+                if chunksize is None and num_workers > 1 and len(names) > 1:
+                    read = functools.partial(
+                        self._read_member, myzip, columns=columns)
+                    with ThreadPoolExecutor(num_workers) as executor:
+                        yield from executor.map(read, names)
+                    continue
+
+                for file_path in names:
+                    yield from self._iter_member(
+                        myzip, file_path, chunksize, columns)
 
     def convert(
         self,
         file_paths: str | pathlib.Path,
         meta: Dict[str, List[str | pathlib.Path]],
+        columns: Optional[List[str]] = None,
         id_hash_keys: Optional[List[str]] = None,
     ):
         """Extract `file_paths` data as :class:`pandas.DataFrame` objects.
@@ -45,6 +171,7 @@ class ZipDataFramer(BaseComponent):
             file_paths: Path of the zipped CSV file.
             meta: Dictionary containing ``zip_paths`` key to zip file paths to
                 extract CSV `file_paths` from.
+            columns: If specified, the only CSV columns to read.
             id_hash_keys: Generate the document id from a custom list of
                 strings that refer to the document's attributes. If you want to
                 ensure you don't have duplicate documents in your DocumentStore
@@ -54,24 +181,18 @@ class ZipDataFramer(BaseComponent):
                 defined metadata.
         """
 
-        if id_hash_keys is None:
-            id_hash_keys = self.id_hash_keys
-
-        if not meta or 'zip_paths' not in meta:
-            raise ValueError('`meta` dict must contain "zip_paths" key!')
-
-        dfs = []
-        for file_path, zip_path in zip(file_paths, meta['zip_paths']):
-            with zipfile.ZipFile(zip_path) as myzip:
-                with myzip.open(file_path) as myzipfile:
-                    dfs.append(pd.read_csv(myzipfile))
-
-        return dfs
+        return list(self.iter_convert(
+            file_paths,
+            meta,
+            columns=columns,
+            id_hash_keys=id_hash_keys,
+        ))
 
     def run(
         self,
         file_paths: str | pathlib.Path,
         meta: Dict[str, str | pathlib.Path],
+        columns: Optional[List[str]] = None,
         id_hash_keys: Optional[List[str]] = None,
     ):
         """Extract contained filenames from `zip_path`.
@@ -80,6 +201,7 @@ class ZipDataFramer(BaseComponent):
             file_paths: Path of the zipped CSV file.
             meta: Dictionary containing ``zip_path`` key to zip file path to
                 extract CSV `file_paths` from.
+            columns: If specified, the only CSV columns to read.
             id_hash_keys: Generate the document id from a custom list of
                 strings that refer to the document's attributes. If you want to
                 ensure you don't have duplicate documents in your DocumentStore
@@ -93,6 +215,7 @@ class ZipDataFramer(BaseComponent):
         dfs = self.convert(
             file_paths,
             meta,
+            columns=columns,
             id_hash_keys=id_hash_keys,
         )
 
@@ -1,17 +1,96 @@
 """Defines MAL Haystack custom pipelines."""
 
-from typing import Optional
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional
 
-from haystack import Pipeline
+import pandas as pd
+from haystack import Document, Pipeline
 from haystack.document_stores import BaseDocumentStore
 from haystack.pipelines.standard_pipelines import BaseStandardPipeline
 from .nodes import (
     DataFramer,
     DataFrameConverter,
+    DocumentDeduplicator,
+    PassageSplitter,
     ZipDataFramer,
     ZipLister,
 )
 
+# Profiling samples memory with psutil, which is only needed with --profile
+if TYPE_CHECKING:
+    from .profiling import Profiler
+
+
+def _convert_dataframe(
+    dataframe: pd.DataFrame,
+    converter: DataFrameConverter,
+    params: Optional[dict] = None,
+    deduplicator: Optional[DocumentDeduplicator] = None,
+    splitter: Optional[PassageSplitter] = None,
+) -> List[Document]:
+    """Converts a DataFrame chunk to the documents or passages to index.
+
+    Arguments:
+        dataframe: The DataFrame chunk to convert.
+        converter: The DataFrame converter to use.
+        params: Params for the pipeline nodes.
+        deduplicator: If specified, the node to drop duplicate documents
+            with.
+        splitter: If specified, the node to split documents into passages
+            with.
+
+    Returns:
+        The documents or passages.
+    """
+
+    params = params or {}
+    converter_params = params.get('DataFrameConverter', {})
+
+    result, _ = converter.run(dataframes=[dataframe], **converter_params)
+    if deduplicator is not None:
+        result, _ = deduplicator.run(documents=result['documents'])
+    if splitter is not None:
+        result, _ = splitter.run(documents=result['documents'])
+    return result['documents']
+
+
+def _index_stream(
+    dataframes: Iterable[pd.DataFrame],
+    converter: DataFrameConverter,
+    document_store: BaseDocumentStore,
+    params: Optional[dict] = None,
+    deduplicator: Optional[DocumentDeduplicator] = None,
+    splitter: Optional[PassageSplitter] = None,
+) -> int:
+    """Converts and writes DataFrame chunks to a document store one at a time.
+
+    Arguments:
+        dataframes: The DataFrame chunks to convert and index.
+        converter: The DataFrame converter to use.
+        document_store: The document store to write documents to.
+        params: Params for the pipeline nodes.
+        deduplicator: If specified, the node to drop duplicate documents
+            with before writing them.
+        splitter: If specified, the node to split documents into passages
+            with before writing them.
+
+    Returns:
+        The number of documents or passages written.
+    """
+
+    count = 0
+    for dataframe in dataframes:
+        documents = _convert_dataframe(
+            dataframe,
+            converter,
+            params=params,
+            deduplicator=deduplicator,
+            splitter=splitter,
+        )
+        document_store.write_documents(documents=documents)
+        count += len(documents)
+
+    return count
+
 
 class ReviewIndexer(BaseStandardPipeline):
     """Pipeline for indexing and tagging zipped MAL reviews.
@@ -19,33 +98,67 @@ class ReviewIndexer(BaseStandardPipeline):
     Pipeline nodes are:
       - DataFramer (CSVs -> DataFrames)
       - DataFrameConverter (DataFrames -> Documents)
+      - DocumentDeduplicator (Documents -> distinct Documents), optional
+      - PassageSplitter (Documents -> passages), optional
       - DocumentStore (Documents -> DocumentStore)
 
     Parameters:
         document_store: The document_store instance to use.
+        converter: The DataFrame converter to use. Defaults to a new
+            :class:`~mal_haystack.nodes.DataFrameConverter`.
+        cache_dir: If specified, the directory to cache parsed CSV files in.
+        deduplicator: If specified, the node to drop documents duplicating
+            earlier documents' content with before indexing.
+        splitter: If specified, the node to split long documents into
+            passages sharing their document's index with before indexing.
     """
 
-    def __init__(self, document_store: BaseDocumentStore):
+    def __init__(
+        self,
+        document_store: BaseDocumentStore,
+        converter: Optional[DataFrameConverter] = None,
+        cache_dir: Optional[str] = None,
+        deduplicator: Optional[DocumentDeduplicator] = None,
+        splitter: Optional[PassageSplitter] = None,
+    ):
         """Constructor."""
 
-        framer = DataFramer()
-        converter = DataFrameConverter()
+        self.framer = DataFramer(cache_dir=cache_dir)
+        self.converter = converter or DataFrameConverter()
+        self.deduplicator = deduplicator
+        self.splitter = splitter
+        self.document_store = document_store
 
         self.pipeline = Pipeline()
         self.pipeline.add_node(
-            component=framer,
+            component=self.framer,
             name='DataFramer',
             inputs=['File'],
         )
         self.pipeline.add_node(
-            component=converter,
+            component=self.converter,
             name='DataFrameConverter',
             inputs=['DataFramer'],
         )
+        last_node = 'DataFrameConverter'
+        if deduplicator is not None:
+            self.pipeline.add_node(
+                component=deduplicator,
+                name='DocumentDeduplicator',
+                inputs=[last_node],
+            )
+            last_node = 'DocumentDeduplicator'
+        if splitter is not None:
+            self.pipeline.add_node(
+                component=splitter,
+                name='PassageSplitter',
+                inputs=[last_node],
+            )
+            last_node = 'PassageSplitter'
         self.pipeline.add_node(
             component=document_store,
             name='DocumentStore',
-            inputs=['DataFrameConverter'],
+            inputs=[last_node],
         )
 
     def run(
@@ -72,6 +185,108 @@ class ReviewIndexer(BaseStandardPipeline):
             debug=debug,
         )
 
+    def iter_dataframes(
+        self,
+        file_paths: List[str],
+        chunksize: int,
+        params: Optional[dict] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Reads CSV files one chunk of rows at a time.
+
+        Parameters:
+            file_paths: The CSV file paths to read.
+            chunksize: The number of CSV rows to read at a time.
+            params: Params for the pipeline nodes, keyed by node name.
+
+        Returns:
+            An iterator of DataFrame chunks.
+        """
+
+        params = params or {}
+        return self.framer.iter_convert(
+            file_paths,
+            chunksize=chunksize,
+            **params.get('DataFramer', {}),
+        )
+
+    def run_streaming(
+        self,
+        file_paths: List[str],
+        chunksize: int,
+        params: Optional[dict] = None,
+    ):
+        """Runs the pipeline one chunk of CSV rows at a time.
+
+        Each chunk is converted and written to the document store before
+        the next chunk is read, so peak memory is bounded by `chunksize`
+        rather than by the size of the CSV files.
+
+        Parameters:
+            file_paths: The CSV file paths to convert and index.
+            chunksize: The number of CSV rows to read, convert and index at
+                a time.
+            params: Params for the pipeline nodes, keyed by node name.
+        """
+
+        count = _index_stream(
+            self.iter_dataframes(file_paths, chunksize, params=params),
+            self.converter,
+            self.document_store,
+            params=params,
+            deduplicator=self.deduplicator,
+            splitter=self.splitter,
+        )
+        return {'file_paths': file_paths, 'documents_written': count}
+
+    def convert(
+        self,
+        dataframe: pd.DataFrame,
+        params: Optional[dict] = None,
+    ) -> List[Document]:
+        """Converts a DataFrame chunk as the pipeline would index it.
+
+        Parameters:
+            dataframe: A DataFrame chunk of :meth:`iter_dataframes`.
+            params: Params for the pipeline nodes, keyed by node name.
+
+        Returns:
+            The documents or passages to index.
+        """
+
+        return _convert_dataframe(
+            dataframe,
+            self.converter,
+            params=params,
+            deduplicator=self.deduplicator,
+            splitter=self.splitter,
+        )
+
+    def profile(self, profiler: 'Profiler'):
+        """Measures each node of the pipeline with `profiler`.
+
+        Nodes are measured whether the pipeline is run with :meth:`run` or
+        :meth:`run_streaming`, and are reported under their node names.
+
+        Parameters:
+            profiler: The profiler to record measurements with.
+        """
+
+        profiler.instrument(
+            self.framer,
+            'DataFramer',
+            methods=('run', 'run_batch', 'iter_convert'),
+        )
+        profiler.instrument(self.converter, 'DataFrameConverter')
+        if self.deduplicator is not None:
+            profiler.instrument(self.deduplicator, 'DocumentDeduplicator')
+        if self.splitter is not None:
+            profiler.instrument(self.splitter, 'PassageSplitter')
+        profiler.instrument(
+            self.document_store,
+            'DocumentStore',
+            methods=('run', 'write_documents'),
+        )
+
 
 class ZippedReviewIndexer(BaseStandardPipeline):
     """Pipeline for indexing and tagging zipped MAL reviews.
@@ -80,39 +295,81 @@ class ZippedReviewIndexer(BaseStandardPipeline):
       - ZipLister (ZIPs -> zipped CSVs)
       - ZipDataFramer (zipped CSVs -> DataFrames)
       - DataFrameConverter (DataFrames -> Documents)
+      - DocumentDeduplicator (Documents -> distinct Documents), optional
+      - PassageSplitter (Documents -> passages), optional
       - DocumentStore (Documents -> DocumentStore)
 
     Parameters:
         lister: The Zip file lister to use.
         document_store: The document_store instance to use.
+        converter: The DataFrame converter to use. Defaults to a new
+            :class:`~mal_haystack.nodes.DataFrameConverter`.
+        num_workers: If greater than one, the number of threads to read
+            CSV files from each zip file with concurrently.
+        cache_dir: If specified, the directory to cache parsed CSV files in.
+        deduplicator: If specified, the node to drop documents duplicating
+            earlier documents' content with before indexing.
+        splitter: If specified, the node to split long documents into
+            passages sharing their document's index with before indexing.
     """
 
-    def __init__(self, lister: ZipLister, document_store: BaseDocumentStore):
+    def __init__(
+        self,
+        lister: ZipLister,
+        document_store: BaseDocumentStore,
+        converter: Optional[DataFrameConverter] = None,
+        num_workers: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        deduplicator: Optional[DocumentDeduplicator] = None,
+        splitter: Optional[PassageSplitter] = None,
+    ):
         """Constructor."""
 
-        framer = ZipDataFramer()
-        converter = DataFrameConverter()
+        self.lister = lister
+        self.framer = ZipDataFramer(
+            num_workers=num_workers,
+            cache_dir=cache_dir,
+        )
+        self.converter = converter or DataFrameConverter()
+        self.deduplicator = deduplicator
+        self.splitter = splitter
+        self.document_store = document_store
 
         self.pipeline = Pipeline()
         self.pipeline.add_node(
-            component=lister,
+            component=self.lister,
             name='ZipLister',
             inputs=['File'],
         )
         self.pipeline.add_node(
-            component=framer,
+            component=self.framer,
             name='ZipDataFramer',
             inputs=['ZipLister'],
         )
         self.pipeline.add_node(
-            component=converter,
+            component=self.converter,
             name='DataFrameConverter',
             inputs=['ZipDataFramer'],
         )
+        last_node = 'DataFrameConverter'
+        if deduplicator is not None:
+            self.pipeline.add_node(
+                component=deduplicator,
+                name='DocumentDeduplicator',
+                inputs=[last_node],
+            )
+            last_node = 'DocumentDeduplicator'
+        if splitter is not None:
+            self.pipeline.add_node(
+                component=splitter,
+                name='PassageSplitter',
+                inputs=[last_node],
+            )
+            last_node = 'PassageSplitter'
         self.pipeline.add_node(
             component=document_store,
             name='DocumentStore',
-            inputs=['DataFrameConverter'],
+            inputs=[last_node],
         )
 
     def run(
@@ -138,3 +395,111 @@ class ZippedReviewIndexer(BaseStandardPipeline):
             params=params,
             debug=debug,
         )
+
+    def iter_dataframes(
+        self,
+        file_paths: List[str],
+        chunksize: int,
+        params: Optional[dict] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Reads zipped CSV files one chunk of rows at a time.
+
+        Parameters:
+            file_paths: The zip file paths to read.
+            chunksize: The number of CSV rows to read at a time.
+            params: Params for the pipeline nodes, keyed by node name.
+
+        Returns:
+            An iterator of DataFrame chunks.
+        """
+
+        params = params or {}
+        listed, _ = self.lister.run(
+            file_paths=file_paths,
+            **params.get('ZipLister', {}),
+        )
+        return self.framer.iter_convert(
+            listed['file_paths'],
+            listed['meta'],
+            chunksize=chunksize,
+            **params.get('ZipDataFramer', {}),
+        )
+
+    def run_streaming(
+        self,
+        file_paths: List[str],
+        chunksize: int,
+        params: Optional[dict] = None,
+    ):
+        """Runs the pipeline one chunk of zipped CSV rows at a time.
+
+        Each chunk is converted and written to the document store before
+        the next chunk is read, so peak memory is bounded by `chunksize`
+        rather than by the size of the zipped CSV files.
+
+        Parameters:
+            file_paths: The zip file paths to convert and index.
+            chunksize: The number of CSV rows to read, convert and index at
+                a time.
+            params: Params for the pipeline nodes, keyed by node name.
+        """
+
+        count = _index_stream(
+            self.iter_dataframes(file_paths, chunksize, params=params),
+            self.converter,
+            self.document_store,
+            params=params,
+            deduplicator=self.deduplicator,
+            splitter=self.splitter,
+        )
+        return {'file_paths': file_paths, 'documents_written': count}
+
+    def convert(
+        self,
+        dataframe: pd.DataFrame,
+        params: Optional[dict] = None,
+    ) -> List[Document]:
+        """Converts a DataFrame chunk as the pipeline would index it.
+
+        Parameters:
+            dataframe: A DataFrame chunk of :meth:`iter_dataframes`.
+            params: Params for the pipeline nodes, keyed by node name.
+
+        Returns:
+            The documents or passages to index.
+        """
+
+        return _convert_dataframe(
+            dataframe,
+            self.converter,
+            params=params,
+            deduplicator=self.deduplicator,
+            splitter=self.splitter,
+        )
+
+    def profile(self, profiler: 'Profiler'):
+        """Measures each node of the pipeline with `profiler`.
+
+        Nodes are measured whether the pipeline is run with :meth:`run` or
+        :meth:`run_streaming`, and are reported under their node names.
+
+        Parameters:
+            profiler: The profiler to record measurements with.
+        """
+
+        profiler.instrument(self.lister, 'ZipLister')
+        profiler.instrument(
+            self.framer,
+            'ZipDataFramer',
+            methods=('run', 'run_batch', 'iter_convert'),
+        )
+        profiler.instrument(self.converter, 'DataFrameConverter')
+        if self.deduplicator is not None:
+            profiler.instrument(self.deduplicator, 'DocumentDeduplicator')
+        if self.splitter is not None:
+            profiler.instrument(self.splitter, 'PassageSplitter')
+        profiler.instrument(
+            self.document_store,
+            'DocumentStore',
+            methods=('run', 'write_documents'),
+        )
@@ -0,0 +1,414 @@
+"""Defines the MAL Haystack per-stage profiler."""
+
+import functools
+import inspect
+import json
+import pathlib
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+#: Output and input keys whose list lengths count the items a node processed
+ITEM_KEYS = ('documents', 'answers', 'dataframes', 'file_paths', 'queries')
+
+
+def count_items(output: Any, kwargs: Dict[str, Any]) -> int:
+    """Counts the items processed by a node run.
+
+    Items are counted from the node's output if possible and otherwise from
+    its inputs, as the length of the first list found under
+    :data:`ITEM_KEYS`. Lists of DataFrames are counted by their rows.
+
+    Arguments:
+        output: The node's return value.
+        kwargs: The node's keyword arguments.
+
+    Returns:
+        The number of items processed, or zero if unknown.
+    """
+
+    if isinstance(output, tuple) and output:
+        output = output[0]
+    for mapping in (output, kwargs):
+        if not isinstance(mapping, dict):
+            continue
+        for key in ITEM_KEYS:
+            if isinstance(mapping.get(key), list):
+                if key == 'dataframes':
+                    return sum(map(len, mapping[key]))
+                return len(mapping[key])
+
+    return 0
+
+
+class PeakRSS:
+    """Context manager sampling peak resident memory in a thread.
+
+    Parameters:
+        interval: Seconds between samples.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """Constructor."""
+
+        # psutil is only needed when profiling
+        import psutil
+
+        self.interval = interval
+        self.process = psutil.Process()
+        self.start = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        """Samples resident memory until stopped."""
+
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self) -> 'PeakRSS':
+        """Starts sampling."""
+
+        self.start = self.peak = self.process.memory_info().rss
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stops sampling."""
+
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+    @property
+    def growth_mb(self) -> float:
+        """Peak resident memory growth in MiB."""
+
+        return (self.peak - self.start) / 2 ** 20
+
+
+class _Stats:
+    """Accumulated measurements of one profiled stage."""
+
+    __slots__ = ('calls', 'seconds', 'items', 'peak_rss', 'rss_growth')
+
+    def __init__(self):
+        """Constructor."""
+
+        self.calls = 0
+        self.seconds = 0.0
+        self.items = 0
+        self.peak_rss = 0
+        self.rss_growth = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Gets the measurements as a JSON serializable dict."""
+
+        return {
+            'calls': self.calls,
+            'seconds': self.seconds,
+            'items': self.items,
+            'items_per_second': (
+                self.items / self.seconds if self.seconds else None),
+            'peak_rss_mb': self.peak_rss / 2 ** 20,
+            'rss_growth_mb': self.rss_growth / 2 ** 20,
+        }
+
+
+class Profiler:
+    """Records wall time, calls, items per second and peak RSS per stage.
+
+    Stages are measured with the :meth:`stage` context manager, or by
+    instrumenting component methods with :meth:`instrument`. A stage entered
+    while it is already active, e.g. a document store's
+    ``write_documents`` called from its ``run``, is only measured once.
+
+    Resident memory is sampled by a single background thread while any
+    stage is active, so the peak of short stages may be missed.
+
+    Parameters:
+        interval: Seconds between resident memory samples.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        """Constructor."""
+
+        # psutil is only needed when profiling
+        import psutil
+
+        self.interval = interval
+        self.process = psutil.Process()
+        self.stats: Dict[str, _Stats] = {}
+        self.started = time.perf_counter()
+
+        self._lock = threading.Lock()
+        self._active: Dict[str, int] = {}
+        self._peaks: Dict[str, int] = {}
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def _rss(self) -> int:
+        """Gets the current resident memory and updates active peaks."""
+
+        rss = self.process.memory_info().rss
+        with self._lock:
+            for name, peak in self._peaks.items():
+                self._peaks[name] = max(peak, rss)
+        return rss
+
+    def _sample(self):
+        """Samples resident memory while any stage is active."""
+
+        while True:
+            self._wakeup.wait()
+            while self._peaks:
+                self._rss()
+                time.sleep(self.interval)
+            self._wakeup.clear()
+            if self._peaks:
+                self._wakeup.set()
+
+    def _enter(self, name: str) -> Optional[int]:
+        """Starts measuring stage `name`, unless it is already active.
+
+        Returns:
+            The resident memory at the start, or None if already active.
+        """
+
+        with self._lock:
+            depth = self._active.get(name, 0)
+            self._active[name] = depth + 1
+        if depth:
+            return None
+
+        rss = self.process.memory_info().rss
+        with self._lock:
+            self._peaks[name] = rss
+        self._wakeup.set()
+        return rss
+
+    def _exit(
+        self,
+        name: str,
+        start_rss: Optional[int],
+        seconds: float,
+        items: int,
+        record: bool = True,
+    ):
+        """Stops measuring stage `name` and records its measurements."""
+
+        with self._lock:
+            self._active[name] -= 1
+        if start_rss is None:
+            return
+
+        self._rss()
+        with self._lock:
+            peak = self._peaks.pop(name)
+            if not record:
+                return
+            stats = self.stats.setdefault(name, _Stats())
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.items += items
+            stats.peak_rss = max(stats.peak_rss, peak)
+            stats.rss_growth = max(stats.rss_growth, peak - start_rss)
+
+    def measure(
+        self,
+        name: str,
+        func: Callable,
+        *args,
+        count: Optional[Callable[[Any, Dict[str, Any]], int]] = None,
+        **kwargs,
+    ) -> Any:
+        """Calls and measures `func` as stage `name`.
+
+        Arguments:
+            name: The stage name.
+            func: The callable to measure.
+            count: Callable counting the items processed from the return
+                value and keyword arguments. Defaults to :func:`count_items`.
+
+        Returns:
+            The return value of `func`.
+        """
+
+        start_rss = self._enter(name)
+        start = time.perf_counter()
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            seconds = time.perf_counter() - start
+            items = (count or count_items)(result, kwargs)
+            self._exit(name, start_rss, seconds, items)
+
+    def stage(self, name: str, items: int = 0) -> '_Stage':
+        """Gets a context manager measuring a block of code as stage `name`.
+
+        Arguments:
+            name: The stage name.
+            items: The number of items processed, which may also be set on
+                the returned context manager's ``items`` attribute.
+
+        Returns:
+            The stage context manager.
+        """
+
+        return _Stage(self, name, items)
+
+    def iterate(
+        self,
+        name: str,
+        iterator: Iterator,
+        count: Callable[[Any], int] = lambda item: 1,
+    ) -> Iterator:
+        """Measures the time spent producing the items of `iterator`.
+
+        Each item produced is recorded as one call of stage `name`.
+
+        Arguments:
+            name: The stage name.
+            iterator: The iterator to measure.
+            count: Callable counting the items in each produced item.
+
+        Returns:
+            An iterator of the same items.
+        """
+
+        iterator = iter(iterator)
+        while True:
+            start_rss = self._enter(name)
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._exit(name, start_rss, 0.0, 0, record=False)
+                return
+            except BaseException:
+                self._exit(name, start_rss, time.perf_counter() - start, 0)
+                raise
+            seconds = time.perf_counter() - start
+            self._exit(name, start_rss, seconds, count(item))
+            yield item
+
+    def instrument(
+        self,
+        component: Any,
+        name: str,
+        methods=('run', 'run_batch'),
+        count: Optional[Callable[[Any, Dict[str, Any]], int]] = None,
+    ):
+        """Measures calls of a component's methods as stage `name`.
+
+        The methods are replaced on the component instance with wrappers
+        keeping their signatures, so that haystack still dispatches the
+        right parameters to them. Generator methods are measured with
+        :meth:`iterate`, counting the rows of yielded DataFrames.
+
+        Arguments:
+            component: The component to instrument.
+            name: The stage name.
+            methods: The names of the methods to measure.
+            count: Callable counting the items processed from a method's
+                return value and keyword arguments. Defaults to
+                :func:`count_items`.
+        """
+
+        for method_name in methods:
+            method = getattr(component, method_name, None)
+            if method is None or hasattr(method, '__profiler__'):
+                continue
+
+            wrapper = self._wrap(method, name, count)
+            wrapper.__profiler__ = self
+            setattr(component, method_name, wrapper)
+
+    def _wrap(
+        self,
+        method: Callable,
+        name: str,
+        count: Optional[Callable[[Any, Dict[str, Any]], int]],
+    ) -> Callable:
+        """Wraps `method` to measure its calls as stage `name`."""
+
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                return self.iterate(name, method(*args, **kwargs), count=len)
+        else:
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                return self.measure(name, method, *args, count=count, **kwargs)
+
+        return wrapper
+
+    def report(self) -> Dict[str, Any]:
+        """Gets the profile report.
+
+        Returns:
+            The total wall time and process peak RSS, and the measurements
+            of each stage in the order they were first completed.
+        """
+
+        with self._lock:
+            stages = {
+                name: stats.to_dict() for name, stats in self.stats.items()}
+
+        memory = self.process.memory_info()
+        peak_rss = getattr(memory, 'peak_wset', None)
+        if peak_rss is None:
+            # Linux and macOS report the peak resident size in getrusage
+            import resource
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            peak_rss *= 1 if sys.platform == 'darwin' else 1024
+
+        peak_rss = max([peak_rss, *(
+            stats.peak_rss for stats in self.stats.values())])
+
+        return {
+            'total_seconds': time.perf_counter() - self.started,
+            'peak_rss_mb': peak_rss / 2 ** 20,
+            'stages': stages,
+        }
+
+    def write(self, path: str | pathlib.Path):
+        """Writes the profile report to a JSON file.
+
+        Arguments:
+            path: The path of the JSON file.
+        """
+
+        with open(path, 'w') as outfile:
+            json.dump(self.report(), outfile, indent=2)
+
+
+class _Stage:
+    """Context manager measuring a block of code as a profiler stage."""
+
+    def __init__(self, profiler: Profiler, name: str, items: int = 0):
+        """Constructor."""
+
+        self.profiler = profiler
+        self.name = name
+        self.items = items
+        self._start_rss = None
+        self._start = 0.0
+
+    def __enter__(self) -> '_Stage':
+        """Starts measuring the stage."""
+
+        self._start_rss = self.profiler._enter(self.name)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stops measuring the stage."""
+
+        seconds = time.perf_counter() - self._start
+        self.profiler._exit(self.name, self._start_rss, seconds, self.items)
@@ -0,0 +1,137 @@
+"""Defines MAL Haystack CPU inference optimizations.
+
+Models can be dynamically quantized, so that the weights of their linear
+layers are stored as int8 and activations are quantized on the fly, or a
+reader can be exported to an ONNX graph run with ONNX Runtime. Both only
+apply to CPU inference.
+"""
+
+import importlib.util
+import logging
+import pathlib
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+def quantize_module(module: Any) -> Any:
+    """Dynamically quantizes the linear layers of a torch module to int8.
+
+    Arguments:
+        module: The :class:`torch.nn.Module` to quantize in place.
+
+    Returns:
+        The quantized module.
+    """
+
+    import torch
+
+    return torch.quantization.quantize_dynamic(
+        module,
+        {torch.nn.Linear},
+        dtype=torch.qint8,
+        inplace=True,
+    )
+
+
+def _check_cpu(component: Any):
+    """Raises a ValueError unless `component` runs on CPU only.
+
+    Arguments:
+        component: A haystack reader or retriever.
+    """
+
+    devices = getattr(component, 'devices', None) or []
+    if any(device.type != 'cpu' for device in devices):
+        raise ValueError(
+            f'Quantized {type(component).__name__} models only run on CPU!')
+
+
+def quantize_reader(reader: Any) -> Any:
+    """Dynamically quantizes a FARM reader's model to int8 in place.
+
+    Arguments:
+        reader: The :class:`~haystack.nodes.reader.FARMReader` to quantize.
+
+    Returns:
+        The quantized reader.
+    """
+
+    _check_cpu(reader)
+    model = getattr(getattr(reader, 'inferencer', None), 'model', None)
+    if model is None:
+        raise ValueError(f'Cannot quantize {type(reader).__name__} models!')
+
+    quantize_module(model)
+    logger.info('Quantized %s model to int8', type(reader).__name__)
+    return reader
+
+
+def quantize_retriever(retriever: Any) -> Any:
+    """Dynamically quantizes an embedding retriever's model to int8 in place.
+
+    Only ``sentence_transformers`` format embedding models are supported.
+
+    Arguments:
+        retriever: The :class:`~haystack.nodes.EmbeddingRetriever` to
+            quantize.
+
+    Returns:
+        The quantized retriever.
+    """
+
+    import torch
+
+    _check_cpu(retriever)
+    encoder = getattr(retriever, 'embedding_encoder', None)
+    model = getattr(encoder, 'embedding_model', None)
+    if not isinstance(model, torch.nn.Module):
+        raise ValueError(
+            f'Cannot quantize {type(encoder).__name__} embedding models!')
+
+    quantize_module(model)
+    logger.info('Quantized %s model to int8', type(retriever).__name__)
+    return retriever
+
+
+def export_onnx_reader(
+    model_name: str,
+    output_dir: str | pathlib.Path,
+    quantize: bool = False,
+) -> pathlib.Path:
+    """Exports a reader model to ONNX, reusing a previous export.
+
+    The exported model directory can be loaded with
+    :class:`~haystack.nodes.reader.FARMReader` to run it with ONNX Runtime.
+
+    .. note::
+
+       Requires the optional ``onnxruntime`` package.
+
+    Arguments:
+        model_name: The name or path of the reader model to export.
+        output_dir: The directory to store exported models in.
+        quantize: Whether to quantize the exported model to int8.
+
+    Returns:
+        The exported model directory.
+    """
+
+    if importlib.util.find_spec('onnxruntime') is None:
+        raise ImportError(
+            'ONNX readers require onnxruntime: pip install onnxruntime')
+
+    from haystack.nodes.reader import FARMReader
+
+    name = model_name.replace('/', '--') + ('-int8' if quantize else '')
+    path = pathlib.Path(output_dir) / name
+    if not (path / 'model.onnx').exists():
+        logger.info('Exporting %s to ONNX at %s', model_name, path)
+        FARMReader.convert_to_onnx(
+            model_name,
+            output_path=path,
+            quantize=quantize,
+            task_type='question_answering',
+        )
+
+    return path
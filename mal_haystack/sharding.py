@@ -0,0 +1,200 @@
+"""Defines MAL Haystack multi-process sharded answer extraction."""
+
+import collections
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+
+from .batching import batched
+from .extraction import group_passages, read_directly
+
+logger = logging.getLogger(__name__)
+
+# Per-process state of sharded reader workers
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(
+    reader_kwargs: Dict[str, Any],
+    threads: int,
+    quantize: bool,
+    answer_cache: Optional[Dict[str, str]],
+    batch_size: int,
+):
+    """Loads a worker's reader once, pinning its torch thread count.
+
+    Arguments:
+        reader_kwargs: Keyword arguments to construct the reader with.
+        threads: The number of torch threads the worker may use.
+        quantize: Whether to dynamically quantize the reader to int8.
+        answer_cache: If specified, the ``path`` and ``model`` of the
+            answer cache to use.
+        batch_size: The number of documents to read per reader call.
+    """
+
+    import torch
+    from haystack.nodes.reader import FARMReader
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+    reader = FARMReader(**reader_kwargs)
+    if quantize:
+        from .quantization import quantize_reader
+        quantize_reader(reader)
+
+    cache = None
+    if answer_cache is not None:
+        from .answer_cache import AnswerCache
+        cache = AnswerCache(**answer_cache)
+
+    _worker.update(
+        reader=reader,
+        answer_cache=cache,
+        batch_size=batch_size,
+    )
+
+
+def _read_shard(shard: List, queries: List[str]) -> Dict[str, Any]:
+    """Reads a shard of documents in a worker.
+
+    Arguments:
+        shard: The documents or passages to read, in stored order.
+        queries: The queries to answer per document.
+
+    Returns:
+        The metadata ``records`` of the shard's documents in order, and the
+        worker's answer cache ``hits`` and ``misses`` for the shard.
+    """
+
+    cache = _worker['answer_cache']
+    hits, misses = (cache.hits, cache.misses) if cache else (0, 0)
+    records = list(read_directly(
+        _worker['reader'],
+        shard,
+        queries,
+        _worker['batch_size'],
+        logging.getLogger('mal-haystack'),
+        answer_cache=cache,
+    ))
+
+    return {
+        'records': records,
+        'hits': cache.hits - hits if cache else 0,
+        'misses': cache.misses - misses if cache else 0,
+    }
+
+
+class ShardedReader:
+    """Reads documents in shards across a pool of worker processes.
+
+    Each worker loads its own reader once, limited to `threads` torch
+    threads so that workers do not oversubscribe the CPU cores, and reads
+    whole shards of documents directly. Shards are submitted as documents
+    arrive, with at most two per worker in flight, and their records are
+    returned in the original document order. Workers are spawned rather
+    than forked, as forking a process that already uses torch threads can
+    deadlock.
+
+    Parameters:
+        num_workers: The number of worker processes.
+        reader_kwargs: Keyword arguments to construct each worker's
+            :class:`~haystack.nodes.reader.FARMReader` with.
+        threads: The number of torch threads per worker. Defaults to the
+            number of CPUs divided among the workers.
+        quantize: Whether workers dynamically quantize their reader to int8.
+        answer_cache: If specified, the ``path`` and ``model`` of an
+            :class:`~mal_haystack.answer_cache.AnswerCache` shared by the
+            workers.
+        shard_size: The number of documents per shard.
+        batch_size: The number of documents to read per reader call.
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        reader_kwargs: Dict[str, Any],
+        threads: Optional[int] = None,
+        quantize: bool = False,
+        answer_cache: Optional[Dict[str, str]] = None,
+        shard_size: int = 128,
+        batch_size: int = 16,
+    ):
+        """Constructor."""
+
+        if num_workers < 1 or shard_size < 1:
+            raise ValueError(
+                '`num_workers` and `shard_size` must be positive!')
+
+        self.num_workers = num_workers
+        self.reader_kwargs = reader_kwargs
+        self.threads = threads or max(1, (os.cpu_count() or 1) // num_workers)
+        self.quantize = quantize
+        self.answer_cache = answer_cache
+        self.shard_size = shard_size
+        self.batch_size = batch_size
+
+        self.hits = 0
+        self.misses = 0
+
+    def map(
+        self,
+        documents: Iterable,
+        queries: Optional[List[str]],
+    ) -> Iterator[Dict[str, Any]]:
+        """Extracts metadata from documents across the worker pool.
+
+        Arguments:
+            documents: The documents or passages to extract metadata from,
+                in stored order.
+            queries: The queries to answer per document.
+
+        Returns:
+            An iterator of metadata records, one per document, in order.
+        """
+
+        logger.info(
+            'Reading with %s workers of %s torch threads each',
+            self.num_workers, self.threads)
+
+        executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(
+                self.reader_kwargs,
+                self.threads,
+                self.quantize,
+                self.answer_cache,
+                self.batch_size,
+            ),
+        )
+        with executor:
+            pending: Deque[Future] = collections.deque()
+            # Shards hold whole documents, so passages are not split apart
+            for shard in batched(group_passages(documents), self.shard_size):
+                passages = [passage for group in shard for passage in group]
+                pending.append(
+                    executor.submit(_read_shard, passages, queries))
+                if len(pending) >= 2 * self.num_workers:
+                    yield from self._collect(pending.popleft())
+
+            while pending:
+                yield from self._collect(pending.popleft())
+
+    def _collect(self, future: Future) -> List[Dict[str, Any]]:
+        """Waits for a shard's records, accumulating answer cache stats.
+
+        Arguments:
+            future: The future of the shard.
+
+        Returns:
+            The shard's metadata records.
+        """
+
+        result = future.result()
+        self.hits += result['hits']
+        self.misses += result['misses']
+        return result['records']
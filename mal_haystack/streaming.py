@@ -0,0 +1,249 @@
+"""Defines the MAL Haystack overlapped stage executor."""
+
+import queue
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+)
+
+#: Marks the end of a stage's output
+_DONE = object()
+
+#: The seconds blocked queue operations wait between checking for stops
+_POLL_SECONDS = 0.1
+
+
+class _StageStats:
+    """Measurements of one stage."""
+
+    __slots__ = ('name', 'items', 'busy', 'starved', 'blocked')
+
+    def __init__(self, name: str):
+        """Constructor."""
+
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Gets the measurements as a dict."""
+
+        return {
+            'name': self.name,
+            'items': self.items,
+            'busy_seconds': self.busy,
+            'starved_seconds': self.starved,
+            'blocked_seconds': self.blocked,
+        }
+
+
+class StagedExecutor:
+    """Runs a chain of stages concurrently, connected by bounded queues.
+
+    Items are produced by iterating a source in one thread, and each stage
+    maps every item of the previous stage to one item in its own thread, in
+    order. Each stage hands its items to the next through a queue of at most
+    `maxsize` items, so a stage running ahead of a slower one blocks instead
+    of buffering without bound. Work that releases the GIL, such as CSV
+    parsing and model inference, thus overlaps, and the first items come
+    out as soon as they pass through every stage.
+
+    If a stage raises, every stage is stopped and the exception is raised
+    where the items are consumed.
+
+    Parameters:
+        stages: The (name, callable) pairs of the stages, in order.
+        maxsize: The maximum number of items queued between two stages.
+        source_name: The name to measure iterating the source as.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[Tuple[str, Callable[[Any], Any]]],
+        maxsize: int = 4,
+        source_name: str = 'Source',
+    ):
+        """Constructor."""
+
+        if maxsize < 1:
+            raise ValueError('`maxsize` must be positive!')
+
+        self.stages = list(stages)
+        self.maxsize = maxsize
+        self.source_name = source_name
+
+        self._stats: List[_StageStats] = []
+        self._stop = threading.Event()
+        self._error = None
+        self._started = 0.0
+        self._first_output = None
+        self._finished = None
+
+    def _put(self, output: queue.Queue, item: Any, stats: _StageStats):
+        """Queues `item`, unless stopped first.
+
+        Returns:
+            Whether the item was queued.
+        """
+
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    output.put(item, timeout=_POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        finally:
+            stats.blocked += time.perf_counter() - start
+
+    def _get(self, source: queue.Queue, stats: _StageStats) -> Any:
+        """Gets the next queued item, or `_DONE` if stopped first."""
+
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    return source.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    pass
+            return _DONE
+        finally:
+            stats.starved += time.perf_counter() - start
+
+    def _fail(self, error: BaseException):
+        """Records the first error raised and stops every stage."""
+
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _produce(
+        self,
+        items: Iterable[Any],
+        output: queue.Queue,
+        stats: _StageStats,
+    ):
+        """Iterates the source, queueing its items."""
+
+        try:
+            iterator = iter(items)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stats.busy += time.perf_counter() - start
+                stats.items += 1
+                if not self._put(output, item, stats):
+                    return
+        except BaseException as error:
+            self._fail(error)
+        self._put(output, _DONE, stats)
+
+    def _work(
+        self,
+        func: Callable[[Any], Any],
+        source: queue.Queue,
+        output: queue.Queue,
+        stats: _StageStats,
+    ):
+        """Maps queued items with `func`, queueing its results."""
+
+        try:
+            while (item := self._get(source, stats)) is not _DONE:
+                start = time.perf_counter()
+                result = func(item)
+                stats.busy += time.perf_counter() - start
+                stats.items += 1
+                if not self._put(output, result, stats):
+                    return
+        except BaseException as error:
+            self._fail(error)
+        self._put(output, _DONE, stats)
+
+    def map(self, items: Iterable[Any]) -> Iterator[Any]:
+        """Passes items through every stage.
+
+        Arguments:
+            items: The source items.
+
+        Returns:
+            An iterator of the last stage's results, in source order.
+        """
+
+        self._stop.clear()
+        self._error = None
+        self._first_output = self._finished = None
+        self._stats = [_StageStats(self.source_name)]
+        self._stats.extend(_StageStats(name) for name, _ in self.stages)
+        queues = [
+            queue.Queue(self.maxsize) for _ in range(len(self.stages) + 1)]
+
+        threads = [threading.Thread(
+            target=self._produce,
+            args=(items, queues[0], self._stats[0]),
+            name=f'stage-{self.source_name}',
+            daemon=True,
+        )]
+        for num, (name, func) in enumerate(self.stages):
+            stats = self._stats[num + 1]
+            threads.append(threading.Thread(
+                target=self._work,
+                args=(func, queues[num], queues[num + 1], stats),
+                name=f'stage-{name}',
+                daemon=True,
+            ))
+
+        self._started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        # The consumer is measured as waiting on the last stage
+        consumer = _StageStats('Consumer')
+        try:
+            while (result := self._get(queues[-1], consumer)) is not _DONE:
+                if self._first_output is None:
+                    self._first_output = time.perf_counter()
+                yield result
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self._finished = time.perf_counter()
+
+        if self._error is not None:
+            raise self._error
+
+    def report(self) -> Dict[str, Any]:
+        """Reports where each stage spent its time in the last run.
+
+        Returns:
+            The ``seconds`` the run took, the ``first_output_seconds`` until
+            its first result, and the ``stages``: the items each processed
+            and the seconds each was busy, ``starved`` waiting on the
+            previous stage and ``blocked`` waiting on the next. The busiest
+            stage bounds the run's throughput.
+        """
+
+        finished = self._finished or time.perf_counter()
+        return {
+            'seconds': finished - self._started,
+            'first_output_seconds': (
+                None if self._first_output is None
+                else self._first_output - self._started),
+            'stages': [stats.to_dict() for stats in self._stats],
+        }
@@ -0,0 +1,168 @@
+"""Defines MAL Haystack extraction result writers."""
+
+import csv
+import io
+import os
+import pathlib
+from typing import Any, Dict, List, Optional
+
+
+class CSVResultWriter:
+    """Streams extracted metadata records to an output CSV file.
+
+    Records are written as soon as they are produced and flushed to disk
+    periodically, so an interrupted run keeps everything written before the
+    interruption. With `resume`, records already in the output file are kept
+    and their indices can be skipped with :meth:`is_processed`.
+
+    Parameters:
+        path: The output CSV file path.
+        flush_every: The number of records to write between flushes.
+        resume: Whether to keep and append to records already in `path`
+            rather than overwriting it.
+        index_column: The record column identifying processed documents.
+
+    Attributes:
+        processed: Indices of the records kept from a previous run.
+    """
+
+    def __init__(
+        self,
+        path: str | pathlib.Path,
+        flush_every: int = 256,
+        resume: bool = False,
+        index_column: str = 'index',
+    ):
+        """Constructor."""
+
+        self.path = pathlib.Path(path)
+        self.flush_every = flush_every
+        self.resume = resume
+        self.index_column = index_column
+        self.processed = set()
+        self.written = 0
+
+        self._fieldnames = None
+        self._outfile = None
+        self._writer = None
+
+    def __enter__(self) -> 'CSVResultWriter':
+        """Opens the writer."""
+
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Closes the writer."""
+
+        self.close()
+
+    def _recover(self) -> Optional[List[str]]:
+        """Reads complete records already in the output file.
+
+        A trailing record cut short by an interruption is dropped, and the
+        file is rewritten without it. A record is cut short if the file
+        ends inside one of its quoted fields, which may contain line
+        endings themselves, or before its line ending, or if it has fewer
+        fields than the header.
+
+        Returns:
+            The existing header, or ``None`` if there are no records.
+
+        Raises:
+            ValueError: If the file has no `index_column`.
+        """
+
+        with open(self.path, newline='') as infile:
+            text = infile.read()
+
+        rows = []
+        dropped = truncated = not text.endswith('\n')
+        try:
+            for row in csv.reader(io.StringIO(text), strict=True):
+                rows.append(row)
+        except csv.Error:
+            # The file ended inside a quoted field, whose record is lost
+            dropped, truncated = True, False
+        if truncated and rows:
+            rows.pop()
+        if not rows:
+            return None
+
+        header, records = rows[0], rows[1:]
+        if self.index_column not in header:
+            raise ValueError(
+                f'Cannot resume from {self.path}: it has no '
+                f'{self.index_column!r} column in {header}')
+
+        complete = [record for record in records if len(record) == len(header)]
+        if dropped or len(complete) != len(records):
+            tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+            with open(tmp_path, 'w', newline='') as outfile:
+                writer = csv.writer(outfile)
+                writer.writerow(header)
+                writer.writerows(complete)
+            os.replace(tmp_path, self.path)
+
+        column = header.index(self.index_column)
+        self.processed = {record[column] for record in complete}
+        return header
+
+    def open(self):
+        """Opens the output file, recovering existing records if resuming."""
+
+        if self.resume and self.path.exists():
+            self._fieldnames = self._recover()
+
+        if self._fieldnames is None:
+            self._outfile = open(self.path, 'w', newline='')
+        else:
+            self._outfile = open(self.path, 'a', newline='')
+            self._writer = csv.DictWriter(self._outfile, self._fieldnames)
+
+    def close(self):
+        """Flushes and closes the output file."""
+
+        if self._outfile is not None:
+            self.flush()
+            self._outfile.close()
+            self._outfile = None
+
+    def flush(self):
+        """Flushes written records to disk."""
+
+        self._outfile.flush()
+        os.fsync(self._outfile.fileno())
+
+    def is_processed(self, index: Any) -> bool:
+        """Checks whether a document's record is already in the output.
+
+        Arguments:
+            index: The document index.
+
+        Returns:
+            Whether the document was processed by a previous run.
+        """
+
+        return str(index) in self.processed
+
+    def write(self, record: Dict[str, Any]):
+        """Writes a metadata record to the output file.
+
+        Arguments:
+            record: The metadata record to write.
+        """
+
+        if self._writer is None:
+            self._fieldnames = list(record.keys())
+            self._writer = csv.DictWriter(self._outfile, self._fieldnames)
+            self._writer.writeheader()
+        elif set(record) != set(self._fieldnames):
+            raise ValueError(
+                f'Record columns {list(record)} do not match output columns '
+                f'{self._fieldnames} of {self.path}')
+
+        self._writer.writerow(record)
+        self.written += 1
+        if self.written % self.flush_every == 0:
+            self.flush()
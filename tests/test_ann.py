@@ -0,0 +1,95 @@
+"""Tests the MAL Haystack approximate nearest neighbour index."""
+
+import numpy as np
+import pytest
+
+from mal_haystack.ann import IVFIndex, default_nlist
+from mal_haystack.embedding_matrix import normalize, recall_at_k
+
+
+@pytest.fixture
+def embeddings():
+    """Gets clustered random embeddings, with queries in the same clusters."""
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((16, 32))
+    labels = rng.integers(16, size=1000)
+    noise = 0.5 * rng.standard_normal((1000, 32))
+    return (centers[labels] + noise).astype(np.float32)
+
+
+def ids(count):
+    """Gets string ids of `count` embeddings."""
+
+    return [str(num) for num in range(count)]
+
+
+def test_default_nlist():
+    assert default_nlist(1) == 1
+    assert default_nlist(10_000) == 400
+
+
+def test_build_and_search(embeddings):
+    index = IVFIndex(32, nprobe=8)
+    index.build(ids(900), embeddings[:900])
+    queries = embeddings[900:]
+    found, scores = index.search(queries, top_k=10)
+
+    exact = normalize(queries) @ normalize(embeddings[:900]).T
+    expected = np.argsort(-exact, axis=1)[:, :10]
+    rows = [np.array(row, dtype=np.int64) for row in found]
+    assert len(index) == 900 and index.nlist == default_nlist(900)
+    assert recall_at_k(rows, expected) >= 0.9
+    assert all(np.all(np.diff(row) <= 0) for row in scores)
+
+
+def test_probing_every_list_is_exact(embeddings):
+    index = IVFIndex(32, nlist=8)
+    index.build(ids(1000), embeddings)
+    found, scores = index.search(embeddings[:5], top_k=3, nprobe=8)
+
+    assert [row[0] for row in found] == ids(5)
+    np.testing.assert_allclose([row[0] for row in scores], 1.0, atol=1e-3)
+
+
+def test_save_and_load(tmp_path, embeddings):
+    index = IVFIndex(32, nlist=8, nprobe=2)
+    index.build(ids(1000), embeddings)
+    path = tmp_path / 'index.npz'
+    index.save(path)
+    loaded = IVFIndex.load(path)
+
+    assert (loaded.nlist, loaded.nprobe, loaded.dtype) == (8, 2, 'float16')
+    assert loaded.model is None
+    assert loaded.matches(ids(1000)) and not loaded.matches(ids(999))
+    assert loaded.search(embeddings[:3], 5)[0] == index.search(
+        embeddings[:3], 5)[0]
+
+
+def test_save_and_load_model(tmp_path, embeddings):
+    path = tmp_path / 'index.npz'
+    index = IVFIndex(32, nlist=8, model='all-MiniLM-L6-v2+int8')
+    index.build(ids(1000), embeddings)
+    index.save(path)
+    assert IVFIndex.load(path).model == 'all-MiniLM-L6-v2+int8'
+
+    index = IVFIndex(32, nlist=8)
+    index.build(ids(1000), embeddings)
+    index.save(path)
+    assert IVFIndex.load(path).model is None
+
+
+def test_search_empty():
+    found, scores = IVFIndex(4).search(np.ones((2, 4)), top_k=3)
+
+    assert found == [[], []]
+    assert [len(row) for row in scores] == [0, 0]
+
+
+def test_rejects_invalid_arguments(embeddings):
+    with pytest.raises(ValueError, match='dtype'):
+        IVFIndex(32, dtype='int8')
+    with pytest.raises(ValueError, match='positive'):
+        IVFIndex(32, nprobe=0)
+    with pytest.raises(ValueError, match='Expected 2 embeddings'):
+        IVFIndex(32).build(ids(2), embeddings[:3])
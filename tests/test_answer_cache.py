@@ -0,0 +1,52 @@
+"""Tests the MAL Haystack persistent answer cache."""
+
+import pytest
+
+haystack = pytest.importorskip('haystack')
+
+from mal_haystack.answer_cache import AnswerCache  # noqa: E402
+
+QUERY = 'What did the reviewer like?'
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Gets an answer cache in a temporary directory."""
+
+    cache = AnswerCache(tmp_path / 'answers.sqlite', model='reader@1')
+    yield cache
+    cache.close()
+
+
+def test_get_and_put(cache):
+    keys = [cache.key('Great show'), cache.key('Too long')]
+    answer = haystack.Answer(answer='show', score=0.9, context='Great show')
+    cache.put([(keys[0], QUERY, [answer]), (keys[1], QUERY, [])])
+
+    cached = cache.get(keys + [cache.key('Unread')], [QUERY])
+
+    assert len(cache) == 2
+    assert cached[keys[1], QUERY] == []
+    top = cached[keys[0], QUERY][0]
+    assert (top.answer, top.score, top.context) == (
+        'show', 0.9, 'Great show')
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_entries_are_per_model(cache, tmp_path):
+    key = cache.key('Great show')
+    cache.put([(key, QUERY, [])])
+
+    other = AnswerCache(cache.path, model='reader@2')
+    try:
+        assert len(other) == 0
+        assert other.get([key], [QUERY]) == {}
+    finally:
+        other.close()
+
+
+def test_many_keys(cache):
+    keys = [cache.key(str(num)) for num in range(2000)]
+    cache.put((key, QUERY, []) for key in keys)
+
+    assert len(cache.get(keys, [QUERY])) == 2000
@@ -0,0 +1,7 @@
+"""Tests the MAL Haystack batching utilities."""
+
+from mal_haystack.batching import batched
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,63 @@
+"""Tests the MAL Haystack compact review table."""
+
+import pytest
+
+from mal_haystack.compact import ReviewTable, _Column
+
+
+def column(values):
+    """Creates a column of `values`."""
+
+    column = _Column()
+    for value in values:
+        column.append(value)
+    return column
+
+
+@pytest.mark.parametrize('values, typecode', [
+    ([1, 2, -3], 'q'),
+    ([0.5, 2.0], 'd'),
+    (['TV', 'Movie', 'TV'], 'l'),
+    ([True, False], 'l'),
+])
+def test_column_types(values, typecode):
+    values_column = column(values)
+
+    assert values_column.values.typecode == typecode
+    assert [values_column[row] for row in range(len(values))] == values
+
+
+def test_column_keeps_types_of_equal_values():
+    values = [1, True, 1.0, 'a', None, 2**70]
+    mixed = column(values)
+    stored = [mixed[row] for row in range(len(values))]
+
+    assert stored == values
+    assert [type(value) for value in stored] == list(map(type, values))
+
+
+def test_column_switches_to_dictionary_encoding():
+    mixed = column([1, 2, 'unknown', 2])
+
+    assert mixed.values.typecode == 'l'
+    assert [mixed[row] for row in range(4)] == [1, 2, 'unknown', 2]
+    assert len(mixed.categories) == 3
+
+
+def test_table():
+    table = ReviewTable()
+    table.append('Great show', {'index': 0, 'score': 9.0})
+    table.append('Ünïcode review', {'index': 1, 'type': 'TV'})
+
+    assert len(table) == 2
+    assert table.columns == ['index', 'score', 'type']
+    assert table.content(1) == 'Ünïcode review'
+    assert table.meta(0) == {'index': 0, 'score': 9.0, 'type': None}
+    assert table.meta(1) == {'index': 1, 'score': None, 'type': 'TV'}
+    assert table[-1].meta['type'] == 'TV'
+    assert [record.content for record in table] == [
+        'Great show', 'Ünïcode review']
+    assert table.nbytes > 0
+
+    with pytest.raises(IndexError):
+        table[2]
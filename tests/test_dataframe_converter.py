@@ -0,0 +1,82 @@
+"""Tests the MAL Haystack DataFrame to document converter node."""
+
+import json
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('haystack')
+pytest.importorskip('langdetect')
+
+from mal_haystack.nodes.dataframe_converter import (  # noqa: E402
+    DataFrameConverter,
+)
+
+REVIEWS = [
+    'The animation is beautiful and the story kept me watching.',
+    'Die Geschichte ist spannend und die Figuren sind gut geschrieben.',
+    'The soundtrack is wonderful, but the ending felt rushed to me.',
+]
+
+
+def dataframe(start=0, suffix=''):
+    """Creates a dataframe of reviews, indexed from `start`."""
+
+    return pd.DataFrame(
+        {
+            'Review': [review + suffix for review in REVIEWS],
+            'Score': [9, 7, 8],
+        },
+        index=range(start, start + len(REVIEWS)),
+    )
+
+
+def test_convert():
+    converter = DataFrameConverter(
+        document_column='Review', meta_columns=['Score'], progress_bar=False)
+    documents = converter.convert(dataframe(start=10))
+
+    assert [document.content for document in documents] == REVIEWS
+    assert documents[1].meta == {'index': 11, 'Score': 7}
+
+
+def test_reject_invalid_languages(tmp_path):
+    converter = DataFrameConverter(
+        document_column='Review',
+        valid_languages=['en'],
+        language_workers=1,
+        progress_bar=False,
+    )
+    documents = converter.convert(dataframe())
+
+    assert [document.meta['index'] for document in documents] == [0, 2]
+    assert converter.rejected_count == 1
+
+
+def test_language_cache_flushed_in_batches(tmp_path):
+    path = tmp_path / 'languages.json'
+    converter = DataFrameConverter(
+        document_column='Review',
+        valid_languages=['en'],
+        language_workers=2,
+        language_cache_path=path,
+        language_cache_flush_every=4,
+        progress_bar=False,
+    )
+    converter.convert(dataframe())
+    pool = converter._language_pool
+
+    # Three new languages are not yet persisted, and the pool is kept
+    assert not path.exists()
+    converter.convert(dataframe(suffix=' Really.'))
+    assert converter._language_pool is pool
+    assert len(json.loads(path.read_text())) == 6
+
+    converter.convert(dataframe(suffix=' Truly.'))
+    assert len(json.loads(path.read_text())) == 6
+    converter.close()
+    assert converter._language_pool is None
+    assert len(json.loads(path.read_text())) == 9
+
+    cached = DataFrameConverter(language_cache_path=path)
+    assert cached.detect_languages(REVIEWS) == ['en', 'de', 'en']
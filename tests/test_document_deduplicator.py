@@ -0,0 +1,140 @@
+"""Tests the MAL Haystack duplicate document detection node."""
+
+import csv
+
+import pytest
+
+haystack = pytest.importorskip('haystack')
+
+from mal_haystack.nodes.document_deduplicator import (  # noqa: E402
+    DocumentDeduplicator,
+    normalize,
+)
+from mal_haystack.writers import CSVResultWriter  # noqa: E402
+
+CONTENTS = ['Great show', 'Too long', 'great  SHOW', 'Fine', 'too long']
+
+
+def documents():
+    """Gets documents, the third and fifth duplicating earlier ones."""
+
+    return [
+        haystack.Document(content=content, meta={'index': index})
+        for index, content in enumerate(CONTENTS)
+    ]
+
+
+def read(documents):
+    """Extracts a metadata record per document."""
+
+    return [
+        document.meta | {'answer': normalize(document.content)}
+        for document in documents
+    ]
+
+
+def run(path, resume=False, interrupt_after=None, overlap=False):
+    """Deduplicates, reads and writes documents as the CLI does.
+
+    With `overlap`, documents are deduplicated after the writer opens, as
+    overlapped stages do, rather than before.
+    """
+
+    writer = CSVResultWriter(path, flush_every=1, resume=resume)
+    deduplicator = DocumentDeduplicator(is_processed=writer.is_processed)
+    if overlap:
+        writer.open()
+        unique = deduplicator.deduplicate(documents())
+        readable = [
+            document for document in unique
+            if not writer.is_processed(document.meta['index'])
+        ]
+    else:
+        unique = deduplicator.deduplicate(documents())
+        writer.open()
+        readable = [
+            document for document in unique
+            if not deduplicator.is_group_processed(document.meta['index'])
+        ]
+
+    try:
+        for num, record in enumerate(deduplicator.fan_out(read(readable))):
+            if num == interrupt_after:
+                break
+            writer.write(record)
+    finally:
+        writer.close()
+
+
+def test_normalize():
+    assert normalize('  Great　\nSHOW ') == 'great show'
+
+
+def test_deduplicate():
+    deduplicator = DocumentDeduplicator()
+    unique = deduplicator.deduplicate(documents())
+
+    assert [document.meta['index'] for document in unique] == [0, 1, 3]
+    assert deduplicator.group_count == 3
+    assert deduplicator.duplicate_count == 2
+    assert deduplicator.summary(num_queries=2)['reader_calls'] == 4
+
+
+def test_fan_out_keeps_stored_order():
+    deduplicator = DocumentDeduplicator()
+    unique = deduplicator.deduplicate(documents())
+    records = list(deduplicator.fan_out(read(unique)))
+
+    assert [record['index'] for record in records] == [0, 1, 2, 3, 4]
+    assert records[2]['answer'] == records[0]['answer']
+    assert records[4]['answer'] == records[1]['answer']
+
+
+def test_fan_out_tied_positions():
+    # Indexes repeated across CSVs give their duplicates tied positions
+    contents = ['Fine', 'Good', 'fine', 'good']
+    deduplicator = DocumentDeduplicator()
+    unique = deduplicator.deduplicate([
+        haystack.Document(content=content, meta={'index': num % 2})
+        for num, content in enumerate(contents)
+    ])
+    records = list(deduplicator.fan_out(read(unique)))
+
+    assert [record['answer'] for record in records] == [
+        'fine', 'good', 'fine', 'good']
+
+
+def test_fan_out_late_duplicates():
+    # Overlapped stages deduplicate each chunk as the previous chunk's
+    # records are fanned out
+    chunks = [['Great show', 'Too long'], ['Fine', 'great  SHOW']]
+    deduplicator = DocumentDeduplicator()
+
+    def interleave():
+        for num, chunk in enumerate(chunks):
+            unique = deduplicator.deduplicate([
+                haystack.Document(
+                    content=content, meta={'index': 2 * num + offset})
+                for offset, content in enumerate(chunk)
+            ])
+            yield from read(unique)
+
+    records = list(deduplicator.fan_out(interleave(), keep_records=True))
+
+    assert [record['index'] for record in records] == [0, 1, 2, 3]
+    assert records[3]['answer'] == records[0]['answer']
+
+
+@pytest.mark.parametrize('overlap', [False, True])
+def test_resume_interrupted_run(tmp_path, overlap):
+    path = tmp_path / 'output.csv'
+    run(path, interrupt_after=2, overlap=overlap)
+    run(path, resume=True, overlap=overlap)
+
+    with open(path, newline='') as infile:
+        records = list(csv.DictReader(infile))
+
+    assert [record['index'] for record in records] == [
+        '0', '1', '2', '3', '4']
+    assert records[2]['answer'] == 'great show'
+    assert records[4]['answer'] == 'too long'
@@ -0,0 +1,108 @@
+"""Tests the MAL Haystack persistent document embedding cache."""
+
+import numpy as np
+import pytest
+
+from mal_haystack.embedding_cache import EmbeddingCache
+
+MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+
+def embeddings(count, dim=4, seed=0):
+    """Generates random float32 embeddings."""
+
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((count, dim)).astype(np.float32)
+
+
+def test_get_and_put(tmp_path):
+    cache = EmbeddingCache(tmp_path, MODEL)
+    keys = [cache.key(content) for content in ('a', 'b', 'c')]
+    values = embeddings(3)
+
+    assert cache.get(keys) == [None] * 3
+    cache.put(keys[:2], values[:2])
+
+    cached = cache.get(keys)
+    assert len(cache) == 2
+    np.testing.assert_array_equal(cached[0], values[0])
+    np.testing.assert_array_equal(cached[1], values[1])
+    assert cached[2] is None
+    assert (tmp_path / MODEL.replace('/', '--')).is_dir()
+
+
+def test_persists_across_instances(tmp_path):
+    keys = [EmbeddingCache.key(content) for content in ('a', 'b')]
+    values = embeddings(2)
+    cache = EmbeddingCache(tmp_path, MODEL)
+    cache.put(keys, values)
+    cache.flush()
+
+    cached = EmbeddingCache(tmp_path, MODEL).get(keys)
+    np.testing.assert_array_equal(np.vstack(cached), values)
+
+
+def test_put_replaces_existing(tmp_path):
+    cache = EmbeddingCache(tmp_path, MODEL)
+    key = cache.key('a')
+    old, new = embeddings(2)
+    cache.put([key], old[None])
+    cache.put([key], new[None])
+
+    assert len(cache) == 1
+    np.testing.assert_array_equal(cache.get([key])[0], new)
+
+
+@pytest.mark.parametrize('eviction, evicted', [('lru', 'b'), ('fifo', 'a')])
+def test_eviction(tmp_path, eviction, evicted):
+    cache = EmbeddingCache(tmp_path, MODEL, max_entries=2, eviction=eviction)
+    keys = {content: cache.key(content) for content in 'abc'}
+    values = embeddings(3)
+    cache.put([keys['a'], keys['b']], values[:2])
+    cache.get([keys['a']])
+    cache.put([keys['c']], values[2:])
+
+    assert len(cache) == 2
+    assert cache.get([keys[evicted]]) == [None]
+    np.testing.assert_array_equal(cache.get([keys['c']])[0], values[2])
+
+
+def test_index_written_in_batches(tmp_path):
+    cache = EmbeddingCache(tmp_path, MODEL, flush_every=3)
+    keys = [cache.key(content) for content in 'abcd']
+    values = embeddings(4)
+    cache.put(keys[:2], values[:2])
+
+    assert len(EmbeddingCache(tmp_path, MODEL)) == 0
+    cache.put(keys[2:3], values[2:3])
+    assert len(EmbeddingCache(tmp_path, MODEL)) == 3
+    cache.put(keys[3:], values[3:])
+    assert len(EmbeddingCache(tmp_path, MODEL)) == 3
+    cache.flush()
+    assert len(EmbeddingCache(tmp_path, MODEL)) == 4
+
+
+def test_unflushed_eviction_keeps_index_valid(tmp_path):
+    cache = EmbeddingCache(tmp_path, MODEL, max_entries=2, flush_every=4)
+    keys = [cache.key(content) for content in 'abcd']
+    values = embeddings(4)
+    cache.put(keys[:2], values[:2])
+    cache.flush()
+    cache.put(keys[2:], values[2:])
+
+    # The index on disk still maps the evicted entries to their embeddings
+    cached = EmbeddingCache(tmp_path, MODEL).get(keys[:2])
+    np.testing.assert_array_equal(np.vstack(cached), values[:2])
+    cache.flush()
+    cached = EmbeddingCache(tmp_path, MODEL).get(keys)
+    assert cached[:2] == [None, None]
+    np.testing.assert_array_equal(np.vstack(cached[2:]), values[2:])
+
+
+def test_rejects_invalid_arguments(tmp_path):
+    with pytest.raises(ValueError, match='eviction'):
+        EmbeddingCache(tmp_path, MODEL, eviction='random')
+    with pytest.raises(ValueError, match='max_entries'):
+        EmbeddingCache(tmp_path, MODEL, max_entries=0)
+    with pytest.raises(ValueError, match='flush_every'):
+        EmbeddingCache(tmp_path, MODEL, flush_every=0)
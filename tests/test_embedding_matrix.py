@@ -0,0 +1,112 @@
+"""Tests the MAL Haystack reduced-precision embedding matrix."""
+
+import numpy as np
+import pytest
+
+from mal_haystack.embedding_matrix import (
+    DTYPES,
+    EmbeddingMatrix,
+    normalize,
+    recall_at_k,
+)
+
+
+@pytest.fixture
+def embeddings():
+    """Gets random float32 embeddings."""
+
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((200, 16)).astype(np.float32)
+
+
+def ids(count):
+    """Gets string ids of `count` embeddings."""
+
+    return [str(num) for num in range(count)]
+
+
+def test_normalize():
+    normalized = normalize(np.array([[3.0, 4.0], [0.0, 0.0]]))
+
+    np.testing.assert_allclose(normalized, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_recall_at_k():
+    assert recall_at_k([[1, 2], [3, 4]], [[1, 2], [3, 5]]) == 0.75
+    assert recall_at_k([], []) == 1.0
+
+
+@pytest.mark.parametrize('dtype, atol', [
+    ('float32', 1e-6), ('float16', 1e-3), ('int8', 2e-2)])
+def test_put_and_get(embeddings, dtype, atol):
+    matrix = EmbeddingMatrix(16, dtype=dtype)
+    matrix.put(ids(200), embeddings)
+
+    assert len(matrix) == 200 and '7' in matrix and 'x' not in matrix
+    np.testing.assert_allclose(
+        matrix.get('7'), normalize(embeddings[7]), atol=atol)
+    assert matrix.get('x') is None
+
+
+def test_memory_per_dtype(embeddings):
+    sizes = {}
+    for dtype in DTYPES:
+        matrix = EmbeddingMatrix(16, dtype=dtype)
+        matrix.put(ids(200), embeddings)
+        sizes[dtype] = matrix.nbytes
+
+    assert sizes['float16'] < sizes['float32']
+    assert sizes['int8'] < sizes['float16']
+
+
+@pytest.mark.parametrize('dtype', DTYPES)
+def test_search_matches_exact_search(embeddings, dtype):
+    queries = embeddings[:10] + 0.1
+    # Chunks smaller than the matrix merge the top rows across chunks
+    matrix = EmbeddingMatrix(16, dtype=dtype, chunk_rows=64)
+    matrix.put(ids(200), embeddings)
+    rows, scores = matrix.search(queries, top_k=5)
+
+    exact = normalize(queries) @ normalize(embeddings).T
+    expected = np.argsort(-exact, axis=1)[:, :5]
+    assert rows.shape == scores.shape == (10, 5)
+    assert recall_at_k(rows, expected) >= 0.9
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+
+def test_search_rows(embeddings):
+    matrix = EmbeddingMatrix(16, dtype='float32')
+    matrix.put(ids(200), embeddings)
+    allowed = matrix.rows(['3', '5', 'missing'])
+    rows, scores = matrix.search(embeddings[5], top_k=10, rows=allowed)
+
+    assert allowed.tolist() == [3, 5]
+    assert rows.tolist() == [[5, 3]]
+    assert scores[0, 0] == pytest.approx(1.0)
+
+
+def test_put_replaces_and_retain_compacts(embeddings):
+    matrix = EmbeddingMatrix(16, dtype='float32')
+    matrix.put(ids(3), embeddings[:3])
+    matrix.put(['1'], embeddings[3:4])
+    np.testing.assert_allclose(
+        matrix.get('1'), normalize(embeddings[3]), atol=1e-6)
+
+    matrix.retain(['2', '1', 'missing'])
+    assert matrix.ids == ['2', '1'] and len(matrix) == 2
+    assert matrix.get('0') is None
+    np.testing.assert_allclose(
+        matrix.get('2'), normalize(embeddings[2]), atol=1e-6)
+
+
+def test_search_empty():
+    rows, scores = EmbeddingMatrix(4).search(np.ones((2, 4)), top_k=3)
+
+    assert rows.shape == scores.shape == (2, 0)
+
+
+def test_rejects_invalid_arguments(embeddings):
+    with pytest.raises(ValueError, match='dtype'):
+        EmbeddingMatrix(16, dtype='bfloat16')
+    with pytest.raises(ValueError, match='Expected 2 embeddings'):
+        EmbeddingMatrix(16).put(ids(2), embeddings[:3])
@@ -0,0 +1,86 @@
+"""Tests the MAL Haystack similarity-gated reading."""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from mal_haystack.gating import SimilarityGate
+
+QUERIES = ['plot', 'music']
+
+
+def passage(*embedding):
+    """Creates a passage with an embedding."""
+
+    return SimpleNamespace(embedding=np.array(embedding, dtype=np.float32))
+
+
+def answer(score):
+    """Creates an answer with a score."""
+
+    return SimpleNamespace(score=score)
+
+
+def gate(**kwargs):
+    """Creates a gate of queries along the first two axes."""
+
+    return SimilarityGate(QUERIES, [[1, 0, 0], [0, 1, 0]], **kwargs)
+
+
+def test_similarities_take_best_passage():
+    similarities = gate(threshold=0.5).similarities(
+        [passage(2, 0, 0), passage(1, 1, 0)])
+
+    assert similarities == pytest.approx(
+        {'plot': 1.0, 'music': np.sqrt(0.5)})
+
+
+def test_screen_skips_dissimilar_queries():
+    screen = gate(threshold=0.5)
+    similarities, skipped = screen.screen([passage(1, 0, 0)], QUERIES)
+
+    assert skipped == {'music'}
+    assert similarities['plot'] == pytest.approx(1.0)
+    report = screen.report()
+    assert (report['pairs'], report['skipped']) == (2, 1)
+    assert report['skipped_fraction'] == 0.5
+    assert 'calibration' not in report
+
+
+def test_calibration_reads_every_pair():
+    screen = gate(threshold=0.5, calibrate=True, min_score=0.5)
+    for embedding, scores in [
+        ((1, 0, 0), {'plot': 0.9, 'music': 0.1}),
+        ((1, 1, 0), {'plot': 0.8, 'music': 0.7}),
+    ]:
+        similarities, skipped = screen.screen([passage(*embedding)], QUERIES)
+        assert skipped == set()
+        screen.observe(similarities, {
+            query: [answer(score)] for query, score in scores.items()})
+
+    calibration = {
+        point['threshold']: point
+        for point in screen.report(thresholds=[0.0, 0.5, 0.8])['calibration']
+    }
+    assert calibration[0.0] == {
+        'threshold': 0.0, 'skipped_fraction': 0.0, 'recall': 1.0}
+    assert calibration[0.5] == {
+        'threshold': 0.5, 'skipped_fraction': 0.25, 'recall': 1.0}
+    assert calibration[0.8]['skipped_fraction'] == 0.75
+    assert calibration[0.8]['recall'] == pytest.approx(1 / 3)
+
+
+def test_from_retriever():
+    retriever = SimpleNamespace(
+        embed_queries=lambda queries: [np.eye(3)[num] for num in range(2)])
+    screen = SimilarityGate.from_retriever(retriever, QUERIES, 0.5)
+
+    assert screen.queries == QUERIES
+
+
+def test_rejects_missing_embeddings():
+    with pytest.raises(ValueError, match='one embedding per query'):
+        SimilarityGate(QUERIES, [[1, 0, 0]], threshold=0.5)
+    with pytest.raises(ValueError, match='stored document embeddings'):
+        gate(threshold=0.5).similarities([SimpleNamespace(embedding=None)])
@@ -0,0 +1,72 @@
+"""Tests the MAL Haystack token-aware passage splitter node."""
+
+import pytest
+
+haystack = pytest.importorskip('haystack')
+
+from mal_haystack.nodes.passage_splitter import (  # noqa: E402
+    PassageSplitter,
+)
+
+
+def document(words, index=0):
+    """Creates a document of `words` numbered words."""
+
+    content = ' '.join(f'w{num}' for num in range(words))
+    return haystack.Document(content=content, meta={'index': index})
+
+
+def test_short_documents_pass_unchanged():
+    splitter = PassageSplitter(max_tokens=10, overlap=2)
+    short = document(10)
+
+    assert splitter.split(short) == [short]
+    assert (splitter.document_count, splitter.passage_count) == (1, 1)
+
+
+def test_split_with_overlap():
+    splitter = PassageSplitter(max_tokens=4, overlap=1)
+    passages = splitter.split(document(10, index=7))
+
+    assert [passage.content for passage in passages] == [
+        'w0 w1 w2 w3', 'w3 w4 w5 w6', 'w6 w7 w8 w9']
+    assert all(passage.meta == {'index': 7} for passage in passages)
+    assert len({passage.id for passage in passages}) == 3
+    assert splitter.passage_count == 3
+
+
+def test_identical_passages_keep_distinct_ids():
+    splitter = PassageSplitter(max_tokens=2, overlap=0)
+    repeated = haystack.Document(content='a b a b', meta={'index': 0})
+    passages = splitter.split(repeated)
+
+    assert [passage.content for passage in passages] == ['a b', 'a b']
+    assert passages[0].id != passages[1].id
+
+
+def test_token_budget():
+    splitter = PassageSplitter(max_tokens=4, overlap=0, token_budget=6)
+    passages = splitter.split(document(10))
+
+    assert [passage.content for passage in passages] == [
+        'w0 w1 w2 w3', 'w4 w5']
+    assert splitter.truncated_count == 1
+
+
+def test_run():
+    splitter = PassageSplitter(max_tokens=4, overlap=0)
+    result, edge = splitter.run(documents=[document(2), document(8, 1)])
+
+    assert edge == 'output_1'
+    assert [passage.meta['index'] for passage in result['documents']] == [
+        0, 1, 1]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'max_tokens': 0},
+    {'max_tokens': 4, 'overlap': 4},
+    {'token_budget': 0},
+])
+def test_rejects_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        PassageSplitter(**kwargs)
@@ -0,0 +1,82 @@
+"""Tests the MAL Haystack overlapped stage executor."""
+
+import threading
+import time
+
+import pytest
+
+from mal_haystack.streaming import StagedExecutor
+
+
+def test_map_keeps_order():
+    executor = StagedExecutor(
+        [('Double', lambda item: 2 * item), ('Add', lambda item: item + 1)],
+        maxsize=2,
+    )
+
+    assert list(executor.map(range(100))) == [
+        2 * item + 1 for item in range(100)]
+
+    report = executor.report()
+    assert [stage['name'] for stage in report['stages']] == [
+        'Source', 'Double', 'Add']
+    assert all(stage['items'] == 100 for stage in report['stages'])
+    assert report['first_output_seconds'] <= report['seconds']
+
+
+def test_stages_overlap():
+    def wait(item):
+        time.sleep(0.05)
+        return item
+
+    executor = StagedExecutor([('A', wait), ('B', wait), ('C', wait)])
+    start = time.perf_counter()
+    assert list(executor.map(range(8))) == list(range(8))
+
+    # Serially, the stages would take 8 * 3 * 0.05 seconds
+    assert time.perf_counter() - start < 0.9
+
+
+def test_stage_error_is_raised():
+    def fail(item):
+        if item == 3:
+            raise RuntimeError('bad item')
+        return item
+
+    executor = StagedExecutor([('Fail', fail), ('Pass', lambda item: item)])
+    results = []
+    with pytest.raises(RuntimeError, match='bad item'):
+        for result in executor.map(range(100)):
+            results.append(result)
+
+    # Items ahead of the failing one may be dropped once stages stop
+    assert results == list(range(len(results))) and len(results) <= 3
+    assert not [
+        thread for thread in threading.enumerate()
+        if thread.name.startswith('stage-')]
+
+
+def test_source_error_is_raised():
+    def items():
+        yield 1
+        raise OSError('unreadable')
+
+    executor = StagedExecutor([('Pass', lambda item: item)])
+    with pytest.raises(OSError, match='unreadable'):
+        list(executor.map(items()))
+
+
+def test_closing_early_stops_stages():
+    executor = StagedExecutor([('Pass', lambda item: item)], maxsize=1)
+    results = executor.map(iter(range(10**9)))
+
+    assert next(results) == 0
+    results.close()
+    assert not [
+        thread for thread in threading.enumerate()
+        if thread.name.startswith('stage-')]
+
+
+def test_rejects_invalid_maxsize():
+    with pytest.raises(ValueError, match='maxsize'):
+        StagedExecutor([], maxsize=0)
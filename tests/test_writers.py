@@ -0,0 +1,107 @@
+"""Tests the MAL Haystack extraction result writers."""
+
+import csv
+
+import pytest
+
+from mal_haystack.writers import CSVResultWriter
+
+RECORDS = [
+    {'index': 0, 'score': 0.9, 'context': 'Loved it.\n\nWould watch again.'},
+    {'index': 1, 'score': 0.4, 'context': 'Too slow'},
+    {'index': 2, 'score': 0.7, 'context': 'Great cast.\n\nWeak ending.'},
+]
+
+
+def write(path, records, **kwargs):
+    """Writes `records` to `path` with a result writer."""
+
+    with CSVResultWriter(path, **kwargs) as writer:
+        for record in records:
+            writer.write(record)
+    return writer
+
+
+def read(path):
+    """Reads the records of an output file."""
+
+    with open(path, newline='') as infile:
+        return list(csv.DictReader(infile))
+
+
+def test_write(tmp_path):
+    path = tmp_path / 'output.csv'
+    writer = write(path, RECORDS)
+
+    assert writer.written == 3
+    assert [record['context'] for record in read(path)] == [
+        record['context'] for record in RECORDS]
+
+
+def test_write_rejects_other_columns(tmp_path):
+    with pytest.raises(ValueError, match='do not match'):
+        write(tmp_path / 'output.csv', [RECORDS[0], {'index': 1}])
+
+
+def test_overwrite_without_resume(tmp_path):
+    path = tmp_path / 'output.csv'
+    write(path, RECORDS)
+    writer = write(path, RECORDS[2:])
+
+    assert writer.processed == set()
+    assert [record['index'] for record in read(path)] == ['2']
+
+
+def test_resume(tmp_path):
+    path = tmp_path / 'output.csv'
+    write(path, RECORDS[:2])
+    writer = CSVResultWriter(path, resume=True)
+    with writer:
+        assert writer.is_processed(0) and writer.is_processed(1)
+        assert not writer.is_processed(2)
+        writer.write(RECORDS[2])
+
+    assert [record['index'] for record in read(path)] == ['0', '1', '2']
+
+
+@pytest.mark.parametrize('cut', [
+    # Right after a line ending inside the last record's quoted field
+    lambda text: text[:text.rindex('\n\nWeak') + 2],
+    # Inside an unquoted field, before the line ending
+    lambda text: text[:-4],
+    # Before the last record's remaining fields
+    lambda text: text[:text.rindex(',"Great')] + '\r\n',
+])
+def test_resume_drops_truncated_record(tmp_path, cut):
+    path = tmp_path / 'output.csv'
+    write(path, RECORDS)
+    with open(path, newline='') as infile:
+        text = infile.read()
+    with open(path, 'w', newline='') as outfile:
+        outfile.write(cut(text))
+
+    writer = CSVResultWriter(path, resume=True)
+    with writer:
+        assert writer.processed == {'0', '1'}
+        writer.write(RECORDS[2])
+
+    records = read(path)
+    assert [record['index'] for record in records] == ['0', '1', '2']
+    assert records[2]['context'] == RECORDS[2]['context']
+
+
+def test_resume_truncated_header(tmp_path):
+    path = tmp_path / 'output.csv'
+    path.write_text('index,cont')
+    writer = write(path, RECORDS[:1], resume=True)
+
+    assert writer.processed == set()
+    assert [record['index'] for record in read(path)] == ['0']
+
+
+def test_resume_without_index_column(tmp_path):
+    path = tmp_path / 'output.csv'
+    write(path, RECORDS)
+
+    with pytest.raises(ValueError, match="no 'id' column"):
+        write(path, RECORDS, resume=True, index_column='id')